@@ -0,0 +1,122 @@
+# imports
+import argparse
+import os
+import pygame
+
+
+# GLOBALS
+ASSET_FOLDER = "./assets/"
+# tile sprites packed into the atlas, by name and image file
+TILES = (("crate", "crate"), ("wall", "wall"), ("player", "player"), ("goal", "red_overlay"))
+# generated tiles: tints for dead squares and the crate that caused a deadlock
+TINTS = (("dead", (0, 0, 0, 90)), ("stuck", (255, 0, 0, 200)))
+# size the tile images are drawn at
+TILE = 36
+
+
+class Assets:
+    """loads every image once, on first use, and converts it to the pixel
+    format of the display so blits don't convert pixels every frame
+
+    tile sprites of each tile size are packed into one atlas surface and
+    handed out as subsurfaces of it"""
+    def __init__(self, folder=ASSET_FOLDER):
+        self.folder = folder
+        self.images = {}
+        self.atlases = {}
+
+    def image(self, name):
+        """returns an image of the asset folder by file name without extension"""
+        image = self.images.get(name)
+        if image is None:
+            image = pygame.image.load(os.path.join(self.folder, name + ".png"))
+            if pygame.display.get_surface() is None:
+                # can't convert before the window exists, load it again later
+                return image
+            image = convert(image)
+            self.images[name] = image
+        return image
+
+    def sprites(self, tile):
+        """returns the tile sprites scaled to a tile size, as a dict of
+        subsurfaces of the atlas of that size"""
+        sprites = self.atlases.get(tile)
+        if sprites is None:
+            names = [name for name, _ in TILES] + [name for name, _ in TINTS]
+            atlas = pygame.Surface((tile * len(names), tile), pygame.SRCALPHA)
+            for index, (name, file) in enumerate(TILES):
+                image = self.image(file)
+                if image.get_size() != (tile, tile):
+                    image = pygame.transform.smoothscale(image, (tile, tile))
+                atlas.blit(image, (index * tile, 0))
+            for index, (name, color) in enumerate(TINTS, len(TILES)):
+                atlas.fill(color, pygame.Rect(index * tile, 0, tile, tile))
+
+            atlas = convert(atlas)
+            sprites = {name: atlas.subsurface(pygame.Rect(index * tile, 0, tile, tile))
+                       for index, name in enumerate(names)}
+            if pygame.display.get_surface() is not None:
+                self.atlases[tile] = sprites
+        return sprites
+
+    def footprint(self, surface):
+        """memory used by the pixels of a surface in bytes"""
+        return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+    def stats(self):
+        """loaded images and atlases with their memory use in bytes"""
+        stats = {name: self.footprint(image) for name, image in self.images.items()}
+        for tile, sprites in self.atlases.items():
+            stats["atlas {}".format(tile)] = self.footprint(sprites["crate"].get_parent())
+        return stats
+
+    def report(self):
+        """lines listing the loaded assets and their memory use"""
+        stats = self.stats()
+        lines = ["{:<20} {:>8.1f} KB".format(name, size / 1024) for name, size in sorted(stats.items())]
+        lines.append("{:<20} {:>8.1f} KB".format("total", sum(stats.values()) / 1024))
+        return lines
+
+
+def convert(image):
+    """converts a surface to the display format, keeping per pixel alpha"""
+    if pygame.display.get_surface() is None:
+        return image
+    if image.get_flags() & pygame.SRCALPHA:
+        return image.convert_alpha()
+    return image.convert()
+
+
+# the shared manager every screen loads its images through
+manager = Assets()
+
+
+def image(name):
+    """returns an image through the shared manager"""
+    return manager.image(name)
+
+
+def sprites(tile):
+    """returns the tile sprites of a tile size through the shared manager"""
+    return manager.sprites(tile)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="load every asset and report its memory use")
+    parser.add_argument("--folder", default=ASSET_FOLDER, help="folder of the images")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    manager.folder = args.folder
+    for entry in sorted(os.scandir(args.folder), key=lambda entry: entry.name):
+        if entry.is_file() and entry.name.endswith(".png"):
+            manager.image(entry.name[:-4])
+    manager.sprites(TILE)
+    print("\n".join(manager.report()))
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+# imports
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from engine import Engine, read_xsb, list_levels
+from solver import Solver
+
+
+def solve_task(path, timeout, memory, weight):
+    """solves one level in a worker process, returns a result record"""
+    start = time.perf_counter()
+    result = Solver(read_xsb(path), max_memory=memory, time_limit=timeout, weight=weight).solve()
+    return {"level": path, "status": result.status, "moves": result.moves, "pushes": result.pushes,
+            "nodes": result.nodes, "time": round(time.perf_counter() - start, 3),
+            "solution": result.solution}
+
+
+def verify_task(path, solution):
+    """replays a LURD solution in a worker process, returns a result record"""
+    start = time.perf_counter()
+    engine = Engine(read_xsb(path))
+    valid = engine.play(solution) and engine.finished
+    return {"level": path, "status": "verified" if valid else "invalid", "moves": engine.counter,
+            "pushes": engine.pushes, "nodes": 0, "time": round(time.perf_counter() - start, 3)}
+
+
+def read_records(path):
+    """reads a JSON lines result file, skipping a half written last line"""
+    records = []
+    try:
+        with open(path, "rt") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def truncate_partial(path):
+    """cuts a half written last line off a results file, so records appended
+    on resume start on a line of their own"""
+    try:
+        with open(path, "r+b") as f:
+            data = f.read()
+            f.truncate(data.rfind(b"\n") + 1)
+    except FileNotFoundError:
+        pass
+
+
+def drop_errors(path):
+    """rewrites a results file without its error records, so the levels
+    tried again on resume end up with one record each, returns the levels
+    of the records kept"""
+    records = read_records(path)
+    kept = [record for record in records if record.get("status") != "error"]
+    if len(kept) < len(records):
+        temporary = path + ".tmp"
+        with open(temporary, "wt") as f:
+            f.writelines(json.dumps(record) + "\n" for record in kept)
+        os.replace(temporary, path)
+    return {record["level"] for record in kept}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="solve or verify every level of a folder in parallel")
+    parser.add_argument("folder", nargs="?", default="./assets/levels/", help="folder of .xsb level files")
+    parser.add_argument("--verify", metavar="FILE", help="verify the solutions of a previous results file instead of solving")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--timeout", type=float, default=60, help="time limit per level in seconds")
+    parser.add_argument("--memory", type=float, default=64, help="memory cap of the search per worker in MB")
+    parser.add_argument("--weight", type=float, default=1, help="heuristic weight, above 1 is faster but not optimal")
+    parser.add_argument("--output", default="-", help="JSON lines output file, - for stdout")
+    parser.add_argument("--resume", action="store_true", help="skip levels already in the output file")
+    args = parser.parse_args()
+
+    levels = sorted(list_levels(args.folder))
+
+    # levels finished in a previous run are skipped
+    done = set()
+    if args.resume and args.output != "-":
+        # the level of a line cut off by a killed run is solved again
+        truncate_partial(args.output)
+        # failed levels are tried again too, in place of their old records
+        done = drop_errors(args.output)
+    levels = [level for level in levels if level not in done]
+
+    if args.verify:
+        solutions = {record["level"]: record["solution"] for record in read_records(args.verify)
+                     if record.get("solution")}
+        levels = [level for level in levels if level in solutions]
+
+    if args.output == "-":
+        out = sys.stdout
+    else:
+        out = open(args.output, "at" if args.resume else "wt")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        if args.verify:
+            futures = {pool.submit(verify_task, level, solutions[level]): level for level in levels}
+        else:
+            # every level stops itself at the timeout, so no worker gets stuck
+            futures = {pool.submit(solve_task, level, args.timeout, args.memory, args.weight): level
+                       for level in levels}
+
+        # stream the results in the order they finish
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as error:
+                # a level that doesn't parse, or a worker that died, doesn't end the run
+                record = {"level": futures[future], "status": "error", "reason": repr(error)}
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+
+    if out is not sys.stdout:
+        out.close()
+
+
+if __name__ == '__main__':
+    main()
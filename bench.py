@@ -0,0 +1,252 @@
+# imports
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# benchmarks run without a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+import scores
+import workers
+import levelindex
+import level_selector
+from engine import list_levels
+from game import Game
+from level_selector import Selector
+from highscores import Highscores
+
+
+# GLOBALS
+LEVEL_FOLDER = "./assets/levels/"
+WINDOW = 720
+# level counts and highscore file sizes the scaling benchmarks run with
+SELECTOR_SIZES = (10, 100, 1000)
+SCORE_SIZES = (10, 1000, 100000)
+# relative change that counts as a regression when comparing
+THRESHOLD = 0.10
+
+
+class Results:
+    """named measurements, each with a unit and which direction is better"""
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name, value, unit, higher_is_better=False):
+        self.metrics[name] = {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+        print("{:<40} {:>12.3f} {}".format(name, value, unit))
+
+    def save(self, path):
+        data = {"python": platform.python_version(), "pygame": pygame.version.ver,
+                "machine": platform.machine(), "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "metrics": self.metrics}
+        with open(path, "wt") as f:
+            json.dump(data, f, indent=1)
+
+
+def timed(function, repeat):
+    """median time of a function call in milliseconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def wait(done, timeout=60):
+    """runs the main loop's part of background tasks until done() is true"""
+    end = time.perf_counter() + timeout
+    while not done():
+        if time.perf_counter() > end:
+            raise TimeoutError("background task did not finish")
+        for event in pygame.event.get(workers.TASK_DONE):
+            workers.handle(event)
+        time.sleep(0.0005)
+
+
+def bench_moves(results, levels, moves):
+    """moves per second through Game.validate_and_move with random moves"""
+    directions = [(-1, 0), (0, -1), (1, 0), (0, 1)]
+    total_moves = 0
+    total_time = 0
+    for path in levels:
+        game = Game(path)
+        # the same moves on every run
+        rng = random.Random(path)
+        sequence = [rng.choice(directions) for _ in range(moves)]
+
+        start = time.perf_counter()
+        for direction in sequence:
+            game.validate_and_move(direction)
+            if game.engine.finished:
+                game.restart()
+        elapsed = time.perf_counter() - start
+
+        total_moves += moves
+        total_time += elapsed
+        results.add("moves_per_sec/" + os.path.basename(path), moves / elapsed, "moves/s", True)
+    results.add("moves_per_sec/all", total_moves / total_time, "moves/s", True)
+
+
+def bench_draw(results, window, levels, frames):
+    """frame time of Game.draw, for a full redraw and for a frame after a move"""
+    full = []
+    moved = []
+    for path in levels:
+        game = Game(path)
+        game.draw(window)
+
+        def draw_full():
+            game.redraw = True
+            game.draw(window)
+        full.append(timed(draw_full, frames))
+
+        rng = random.Random(path)
+        directions = [(-1, 0), (0, -1), (1, 0), (0, 1)]
+        times = []
+        for _ in range(frames):
+            game.validate_and_move(rng.choice(directions))
+            if game.engine.finished:
+                game.restart()
+            times.append(timed(lambda: game.draw(window), 1))
+        moved.append(statistics.median(times))
+
+    results.add("draw/full", statistics.median(full), "ms")
+    results.add("draw/after_move", statistics.median(moved), "ms")
+
+
+def bench_selector(results, window, level, folder, sizes):
+    """Selector.load and Selector.draw time as the number of levels grows"""
+    for size in sizes:
+        levels = os.path.join(folder, "levels{}".format(size))
+        os.makedirs(levels)
+        for index in range(size):
+            shutil.copyfile(level, os.path.join(levels, "{:05}.xsb".format(index)))
+
+        start = time.perf_counter()
+        selector = Selector(levels)
+        wait(lambda: not selector.loading)
+        results.add("selector/load/{}".format(size), (time.perf_counter() - start) * 1000, "ms")
+
+        # the first draw asks for the thumbnails of the page, at the first
+        # size this includes starting the worker processes
+        start = time.perf_counter()
+        selector.draw(window)
+        wait(lambda: all(unit.thumb is not None for unit in selector.pages[selector.pagenum]))
+        selector.draw(window)
+        results.add("selector/first_draw/{}".format(size), (time.perf_counter() - start) * 1000, "ms")
+        results.add("selector/draw/{}".format(size), timed(lambda: selector.draw(window), 50), "ms")
+
+        # paging to the last page makes units for it only
+        def last_page():
+            selector.pagenum = len(selector.pages) - 1
+            selector.draw(window)
+            selector.pagenum = 0
+        results.add("selector/last_page/{}".format(size), timed(last_page, 1), "ms")
+
+
+def bench_highscores(results, folder, sizes):
+    """Highscores.find_top latency against old style score files of growing
+    size, the first read imports the file"""
+    os.makedirs(os.path.join(folder, "levels"))
+    os.makedirs(os.path.join(folder, "highscores"))
+    rng = random.Random(0)
+    for size in sizes:
+        levelfile = os.path.join(folder, "levels", "bench{}.xsb".format(size))
+        with open(scores.legacy_file(levelfile), "wt") as f:
+            for index in range(size):
+                f.write("player{} {}\n".format(index, rng.randrange(50, 5000)))
+
+        def loaded():
+            return highscores.top[0][0] != "Loading highscores..."
+
+        start = time.perf_counter()
+        highscores = Highscores(levelfile)
+        wait(loaded)
+        results.add("highscores/import/{}".format(size), (time.perf_counter() - start) * 1000, "ms")
+
+        def find_top():
+            highscores.find_top()
+            wait(loaded)
+        results.add("highscores/find_top/{}".format(size), timed(find_top, 20), "ms")
+
+
+def compare(metrics, baseline, threshold):
+    """prints the change of every metric against a baseline, returns the
+    names of the metrics that got worse by more than the threshold"""
+    regressions = []
+    for name, metric in metrics.items():
+        old = baseline.get(name)
+        if old is None or not old["value"]:
+            continue
+        change = metric["value"] / old["value"] - 1
+        worse = -change if metric["higher_is_better"] else change
+        flag = ""
+        if worse > threshold:
+            flag = "REGRESSION"
+            regressions.append(name)
+        elif -worse > threshold:
+            flag = "improved"
+        print("{:<40} {:>12.3f} -> {:>12.3f} {:>+7.1%} {}".format(name, old["value"], metric["value"], change, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark the engine, rendering, level selector and highscores")
+    parser.add_argument("--levels", default=LEVEL_FOLDER, help="folder of the levels to benchmark")
+    parser.add_argument("--moves", type=int, default=2000, help="random moves made on each level")
+    parser.add_argument("--frames", type=int, default=50, help="frames drawn on each level")
+    parser.add_argument("--quick", action="store_true", help="fewer levels and smaller sizes, for a quick check")
+    parser.add_argument("--output", default="bench.json", help="JSON file the results are written to")
+    parser.add_argument("--compare", metavar="BASELINE", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    pygame.init()
+    window = pygame.display.set_mode((WINDOW, WINDOW))
+    levels = sorted(path for path in list_levels(args.levels) if path.endswith(".xsb"))
+    selector_sizes = SELECTOR_SIZES
+    score_sizes = SCORE_SIZES
+    if args.quick:
+        levels = levels[:5]
+        selector_sizes = selector_sizes[:2]
+        score_sizes = score_sizes[:2]
+
+    results = Results()
+    folder = tempfile.mkdtemp(prefix="sokoban-bench-")
+    # the benchmarks must not touch the real caches and highscores
+    level_selector.THUMBNAIL_CACHE = os.path.join(folder, "thumbnails", "")
+    scores.store = scores.ScoreStore(os.path.join(folder, "highscores.db"))
+    levelindex.index = levelindex.LevelIndex(os.path.join(folder, "levels.json"))
+    try:
+        bench_moves(results, levels, args.moves)
+        bench_draw(results, window, levels, args.frames)
+        bench_selector(results, window, levels[0], folder, selector_sizes)
+        bench_highscores(results, folder, score_sizes)
+    finally:
+        workers.shutdown()
+        pygame.quit()
+        shutil.rmtree(folder, ignore_errors=True)
+
+    results.save(args.output)
+
+    if args.compare:
+        with open(args.compare, "rt") as f:
+            baseline = json.load(f)["metrics"]
+        print()
+        regressions = compare(results.metrics, baseline, args.threshold)
+        if regressions:
+            print("{} regressions".format(len(regressions)))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# imports
+import hashlib
+
+
+# GLOBALS
+# floor symbols some level packs use instead of a space
+FLOOR = {"-": " ", "_": " "}
+# the 8 rotations and mirror images of the square, as functions of (x, y)
+SYMMETRIES = (lambda x, y: (x, y), lambda x, y: (-x, y), lambda x, y: (x, -y), lambda x, y: (-x, -y),
+              lambda x, y: (y, x), lambda x, y: (-y, x), lambda x, y: (y, -x), lambda x, y: (-y, -x))
+STEPS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+def flood(start, passable):
+    """cells connected to start through passable cells"""
+    seen = {start}
+    stack = [start]
+    while stack:
+        x, y = stack.pop()
+        for dx, dy in STEPS:
+            cell = (x + dx, y + dy)
+            if cell not in seen and passable(cell):
+                seen.add(cell)
+                stack.append(cell)
+    return seen
+
+
+def parse(rows):
+    """the playable region of a level, the floor cells the player's area
+    joins, with its goals, crates and player. None without a player"""
+    cells = {}
+    for y, row in enumerate(rows):
+        for x, symbol in enumerate(row):
+            cells[(x, y)] = FLOOR.get(symbol, symbol)
+    player = next((cell for cell, symbol in cells.items() if symbol in "@+"), None)
+    if player is None:
+        return None
+    # walls, and the void past the end of short rows, bound the region
+    region = flood(player, lambda cell: cells.get(cell, "#") != "#")
+    goals = {cell for cell in region if cells[cell] in ".+*"}
+    crates = {cell for cell in region if cells[cell] in "$*"}
+    return region, goals, crates, player
+
+
+def render(region, goals, crates, player):
+    """the region as rows, inside one layer of wall"""
+    left = min(x for x, _ in region)
+    top = min(y for _, y in region)
+    width = max(x for x, _ in region) - left + 3
+    height = max(y for _, y in region) - top + 3
+    grid = [["#"] * width for _ in range(height)]
+    for x, y in region:
+        cell = (x, y)
+        if cell == player:
+            symbol = "+" if cell in goals else "@"
+        elif cell in crates:
+            symbol = "*" if cell in goals else "$"
+        else:
+            symbol = "." if cell in goals else " "
+        grid[y - top + 1][x - left + 1] = symbol
+    return ["".join(row) for row in grid]
+
+
+def canonical_rows(rows):
+    """the level in a form every copy of it shares: decoration and padding
+    outside the playable region dropped, the walls reduced to the ones
+    around it, the player moved to the first cell of the area it can walk
+    to, and the smallest text of the 8 rotations and mirror images taken.
+    A level without a player is only trimmed"""
+    parsed = parse(rows)
+    if parsed is None:
+        return ["".join(row).rstrip() for row in rows if "".join(row).strip()]
+    region, goals, crates, player = parsed
+    # the player stands anywhere it can walk to without pushing
+    area = flood(player, lambda cell: cell in region and cell not in crates)
+
+    best = None
+    for symmetry in SYMMETRIES:
+        turned = {cell: symmetry(*cell) for cell in region}
+        start = min((turned[cell] for cell in area), key=lambda cell: (cell[1], cell[0]))
+        text = render(set(turned.values()), {turned[cell] for cell in goals}, {turned[cell] for cell in crates}, start)
+        if best is None or text < best:
+            best = text
+    return best
+
+
+def level_hash(rows):
+    """stable hash of a level, the same for every copy of a puzzle however
+    it is turned, mirrored or padded"""
+    return hashlib.sha1("\n".join(canonical_rows(rows)).encode()).hexdigest()
@@ -0,0 +1,206 @@
+# imports
+import asyncio
+import json
+import os
+import threading
+import time
+
+
+# GLOBALS
+# "host:port" of the highscore server, scores stay local when it isn't set
+ENV_VAR = "SOKOBAN_SERVER"
+# open connections kept for reuse
+CONNECTIONS = 4
+# seconds a top list is served from the cache
+TTL = 30
+# seconds submissions wait for others to share their batch
+BATCH_DELAY = 0.05
+# seconds before a request to the server is given up
+TIMEOUT = 5
+# seconds before a failed batch is sent again
+RETRY = 5
+# submissions kept while the server can't be reached
+MAX_PENDING = 10000
+# cache key of the best scores of all levels
+BEST = None
+
+
+class HighscoreClient:
+    """client of the highscore server, callable from any thread
+
+    the network runs on an asyncio loop in a thread of its own:
+    - submit() only queues the entry and returns, the entries queued
+      within BATCH_DELAY go to the server as one batch
+    - top() answers from a cache of top lists that expire after TTL
+      seconds, and asks the server otherwise, sending the level's queued
+      scores first so a player sees their own
+    - best_scores() does the same for the best score of every level
+    - requests reuse up to CONNECTIONS persistent connections"""
+    def __init__(self, host, port, connections=CONNECTIONS, ttl=TTL, delay=BATCH_DELAY, timeout=TIMEOUT):
+        self.host = host
+        self.port = port
+        self.connections = connections
+        self.ttl = ttl
+        self.delay = delay
+        self.timeout = timeout
+
+        # level file -> (time read, top list), BEST -> (time read, best scores)
+        self.cache = {}
+        # these are only touched on the loop's thread
+        self.pending = []
+        self.flushing = None
+        self.idle = []
+        self.rejected = []
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def submit(self, entry):
+        """queues a score with its replay, without waiting for the network"""
+        self.cache.pop(entry.get("level"), None)
+        self.cache.pop(BEST, None)
+        self.loop.call_soon_threadsafe(self.queue, entry)
+
+    def queue(self, entry):
+        self.pending.append(entry)
+        self.cache.pop(entry.get("level"), None)
+        self.cache.pop(BEST, None)
+        if self.flushing is None:
+            self.flushing = self.loop.create_task(self.flush_later(self.delay))
+
+    async def flush_later(self, delay):
+        await asyncio.sleep(delay)
+        self.flushing = None
+        await self.flush()
+
+    async def flush(self):
+        """sends the queued submissions as one batch"""
+        entries, self.pending = self.pending, []
+        if not entries:
+            return
+        try:
+            reply = await self.request({"op": "submit", "entries": entries})
+        except (OSError, asyncio.TimeoutError, ValueError):
+            # the server is away, keep the scores for a later batch
+            self.pending = (entries + self.pending)[-MAX_PENDING:]
+            if self.flushing is None:
+                self.flushing = self.loop.create_task(self.flush_later(RETRY))
+            return
+        for entry, reason in zip(entries, reply.get("results", [])):
+            if reason is not None:
+                self.rejected.append((entry, reason))
+
+    def top(self, level):
+        """the top list of a level, blocks the calling thread on a cache miss,
+        so call it from a background worker. Gives the last known list, or
+        an empty one, when the server can't be reached"""
+        cached = self.cache.get(level)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+        future = asyncio.run_coroutine_threadsafe(self.fetch_top(level), self.loop)
+        try:
+            return future.result(self.timeout * 2)
+        except (OSError, asyncio.TimeoutError, TimeoutError, ValueError):
+            return cached[1] if cached is not None else []
+
+    async def fetch_top(self, level):
+        if any(entry.get("level") == level for entry in self.pending):
+            await self.flush()
+        reply = await self.request({"op": "top", "level": level})
+        top = reply.get("top", [])
+        self.cache[level] = (time.monotonic(), top)
+        return top
+
+    def best_scores(self):
+        """the best score of every level by level name, blocks like top().
+        None when the server can't be reached and nothing is cached"""
+        cached = self.cache.get(BEST)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+        future = asyncio.run_coroutine_threadsafe(self.fetch_best(), self.loop)
+        try:
+            return future.result(self.timeout * 2)
+        except (OSError, asyncio.TimeoutError, TimeoutError, ValueError):
+            return cached[1] if cached is not None else None
+
+    async def fetch_best(self):
+        if self.pending:
+            await self.flush()
+        reply = await self.request({"op": "best"})
+        best = reply.get("best", {})
+        self.cache[BEST] = (time.monotonic(), best)
+        return best
+
+    async def request(self, message):
+        """sends a request over a pooled connection and returns the answer,
+        a pooled connection the server has closed is replaced once"""
+        data = (json.dumps(message) + "\n").encode()
+        for attempt in range(2):
+            pooled = bool(self.idle)
+            if pooled:
+                reader, writer = self.idle.pop()
+            else:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+            try:
+                writer.write(data)
+                await writer.drain()
+                line = await asyncio.wait_for(reader.readline(), self.timeout)
+                if not line:
+                    raise ConnectionError("the server closed the connection")
+            except (OSError, asyncio.TimeoutError):
+                writer.close()
+                if pooled and attempt == 0:
+                    continue
+                raise
+
+            if len(self.idle) < self.connections:
+                self.idle.append((reader, writer))
+            else:
+                writer.close()
+            return json.loads(line)
+
+    def close(self):
+        """sends what is still queued and closes the connections"""
+        async def finish():
+            if self.flushing is not None:
+                self.flushing.cancel()
+            await self.flush()
+            for _, writer in self.idle:
+                writer.close()
+            self.idle = []
+        try:
+            asyncio.run_coroutine_threadsafe(finish(), self.loop).result(self.timeout * 2)
+        except (OSError, asyncio.TimeoutError, TimeoutError):
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+# server address and client, the client is made on first use
+address = os.environ.get(ENV_VAR)
+client = None
+
+
+def configure(server):
+    """sets the "host:port" of the highscore server, None keeps scores local"""
+    global address
+    address = server
+
+
+def get_client():
+    """returns the shared client, or None when no server is configured"""
+    global client
+    if client is None and address:
+        host, _, port = address.rpartition(":")
+        client = HighscoreClient(host or "127.0.0.1", int(port))
+    return client
+
+
+def shutdown():
+    """sends the queued scores before the program exits"""
+    global client
+    if client is not None:
+        client.close()
+        client = None
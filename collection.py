@@ -0,0 +1,216 @@
+# imports
+import mmap
+import os
+import struct
+
+
+# GLOBALS
+# file extensions of multi level collections
+EXTENSIONS = (".sok", ".txt")
+# characters a level row may consist of, - and _ are floor in some packs
+LEVEL_CHARS = b" #@+$*.-_"
+# sidecar index: header (magic, source mtime, source size, level count)
+# followed by (level start, level end, meta start, meta end) per level
+MAGIC = b"SOKIDX02"
+HEADER = struct.Struct("<8sQQQ")
+ENTRY = struct.Struct("<QQQQ")
+
+
+def is_collection(path):
+    return path.lower().endswith(EXTENSIONS)
+
+
+def make_ref(path, index):
+    """name of one level inside a collection file"""
+    return "{}#{}".format(path, index)
+
+
+def split_ref(ref):
+    """splits a level name into (file, index in collection or None)"""
+    path, sep, index = ref.rpartition("#")
+    if sep and index.isdigit() and is_collection(path):
+        return path, int(index)
+    return ref, None
+
+
+def level_name(ref):
+    """short display name of a level file or of a level in a collection"""
+    path, index = split_ref(ref)
+    name = os.path.basename(path)
+    if index is None:
+        return name
+    return "{} {}: {}".format(name, index + 1, open_collection(path).title(index))
+
+
+def is_level_line(line):
+    """a row of a level, as opposed to a title, comment or blank line"""
+    stripped = line.rstrip(b"\r\n")
+    return b"#" in stripped and not stripped.translate(None, LEVEL_CHARS)
+
+
+class Collection:
+    """a multi level file read through a memory map and a sidecar offset
+    index, so one level can be sliced out without parsing the others"""
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + ".idx"
+
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            # an empty file can't be memory mapped
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+        self.opened = self.stamp()
+        self.entries = self.load_index()
+        if self.entries is None:
+            self.entries = self.build_index()
+            self.save_index()
+
+    def __len__(self):
+        return len(self.entries) // 4
+
+    def stamp(self):
+        """modification time and size of the collection file"""
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def load_index(self):
+        """reads the sidecar index, None if it is missing or out of date"""
+        try:
+            with open(self.index_path, "rb") as f:
+                raw = f.read()
+        except OSError:
+            return None
+        if len(raw) < HEADER.size:
+            return None
+        magic, mtime, size, count = HEADER.unpack_from(raw)
+        if magic != MAGIC or (mtime, size) != self.opened or len(raw) != HEADER.size + count * ENTRY.size:
+            return None
+        return memoryview(raw)[HEADER.size:].cast("Q")
+
+    def lines(self):
+        """yields (start, end, line) for every line of the file"""
+        data = self.data
+        pos = 0
+        size = len(data)
+        while pos < size:
+            end = data.find(b"\n", pos)
+            end = size if end == -1 else end + 1
+            yield pos, end, data[pos:end]
+            pos = end
+
+    def build_index(self):
+        """scans the file once for the byte ranges of levels and their
+        metadata: text lines right below a level belong to it, other text
+        belongs to the level that follows"""
+        entries = []
+        level_start = None
+        # text waiting for the next level
+        pending = None
+        # whether we are in the text right below a level
+        below = False
+        for start, end, line in self.lines():
+            if is_level_line(line):
+                if level_start is None:
+                    level_start = start
+                    meta = pending or (0, 0)
+                    pending = None
+                continue
+
+            if level_start is not None:
+                # the level just ended
+                entries.append([level_start, start, meta[0], meta[1]])
+                level_start = None
+                below = True
+                # text below a level joins the text above it, the level's
+                # rows in between are skipped when the metadata is read
+                below_start = meta[0] if meta[1] else None
+
+            if not line.strip():
+                below = False
+            elif below:
+                if below_start is None:
+                    below_start = start
+                entries[-1][2:] = [below_start, end]
+            elif pending is None:
+                pending = (start, end)
+            else:
+                pending = (pending[0], end)
+
+        if level_start is not None:
+            entries.append([level_start, len(self.data), meta[0], meta[1]])
+
+        return [value for entry in entries for value in entry]
+
+    def save_index(self):
+        """writes the sidecar index, skipped when the folder is read only"""
+        mtime, size = self.opened
+        count = len(self)
+        try:
+            with open(self.index_path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, mtime, size, count))
+                f.write(struct.pack("<{}Q".format(count * 4), *self.entries))
+        except OSError:
+            pass
+
+    def text(self, start, end):
+        return bytes(self.data[start:end]).decode("utf-8", "replace")
+
+    def level(self, index):
+        """the level as a list of rows of symbols, like read_xsb"""
+        start, end = self.entries[index * 4], self.entries[index * 4 + 1]
+        rows = self.text(start, end).replace("-", " ").replace("_", " ").splitlines()
+        return [list(row.rstrip("\r\n")) for row in rows]
+
+    def metadata(self, index):
+        """the metadata lines of a level, as a dict for 'key: value' lines
+        and under 'text' for the rest"""
+        start, end = self.entries[index * 4 + 2], self.entries[index * 4 + 3]
+        meta = {}
+        for raw in bytes(self.data[start:end]).splitlines():
+            if is_level_line(raw):
+                continue
+            line = raw.decode("utf-8", "replace").strip().lstrip(";").strip()
+            key, sep, value = line.partition(":")
+            if sep and key and " " not in key.strip():
+                meta[key.strip().lower()] = value.strip()
+            elif line:
+                meta.setdefault("text", line)
+        return meta
+
+    def title(self, index):
+        meta = self.metadata(index)
+        return meta.get("title") or meta.get("text") or "Level {}".format(index + 1)
+
+    def close(self):
+        """releases the memory map, the levels can't be read after this"""
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+# collections opened so far
+opened = {}
+
+
+def open_collection(path):
+    """returns the collection of a file, reopening it when the file changed"""
+    collection = opened.get(path)
+    if collection is None or collection.stamp() != collection.opened:
+        old = collection
+        collection = Collection(path)
+        opened[path] = collection
+        # the old map would keep the replaced file's pages alive
+        if old is not None:
+            old.close()
+    return collection
+
+
+def read_level(ref):
+    """reads one level of a collection by its name"""
+    path, index = split_ref(ref)
+    return open_collection(path).level(index)
+
+
+def level_refs(path):
+    """names of all levels of a collection, without reading the levels"""
+    return [make_ref(path, index) for index in range(len(open_collection(path)))]
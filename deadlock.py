@@ -0,0 +1,102 @@
+# imports
+from collections import deque
+
+
+# GLOBALS
+# cell codes, same as the engine's
+WALL = 1
+GOAL = 2
+
+
+class Deadlocks:
+    """per level static analysis used to spot pushes that lose the game
+
+    built once when a level is parsed:
+    - dead: bytearray with 1 for every cell from which a crate can never be
+      pushed to any goal, so the check on each push is a single lookup
+    after each push only the pushed crate and its neighbours are examined
+    for freeze deadlocks (crates that can't move on either axis) and 2x2
+    blocks of walls and crates"""
+    def __init__(self, grid, goals, width):
+        self.grid = grid
+        self.goals = goals
+        self.width = width
+        self.steps = (-1, 1, -width, width)
+
+        self.dead = self.find_dead_squares()
+
+    def find_dead_squares(self):
+        """marks the cells a crate can't be pulled to from any goal"""
+        grid = self.grid
+        alive = bytearray(len(grid))
+        queue = deque(self.goals)
+        for goal in self.goals:
+            alive[goal] = 1
+        while queue:
+            cell = queue.popleft()
+            for step in self.steps:
+                # pull the crate one step, the player stands behind it
+                to = cell + step
+                if not alive[to] and grid[to] != WALL and grid[to + step] != WALL:
+                    alive[to] = 1
+                    queue.append(to)
+
+        return bytearray(grid[i] != WALL and not alive[i] for i in range(len(grid)))
+
+    def check(self, crates, cell):
+        """checks whether the crate just pushed to cell caused a deadlock"""
+        if self.dead[cell]:
+            return True
+        if self.square(crates, cell):
+            return True
+
+        group = []
+        if self.frozen(crates, cell, set(), group):
+            # a frozen group is only fine if every crate in it is on a goal
+            goals = self.goals
+            return any(crate not in goals for crate in group)
+        return False
+
+    def square(self, crates, cell):
+        """2x2 block of walls and crates with a crate that isn't on a goal"""
+        grid = self.grid
+        width = self.width
+        for corner in (cell, cell - 1, cell - width, cell - width - 1):
+            block = (corner, corner + 1, corner + width, corner + width + 1)
+            if all(grid[i] == WALL or i in crates for i in block):
+                if any(i in crates and grid[i] != GOAL for i in block):
+                    return True
+        return False
+
+    def frozen(self, crates, cell, checked, group):
+        """a crate is frozen when it is blocked on both axes, crates next to
+        it count as blocking if they are frozen themselves"""
+        # while checking, the crate counts as a wall for its neighbours
+        checked.add(cell)
+        size = len(group)
+        if self.blocked(crates, cell, 1, checked, group) and \
+                self.blocked(crates, cell, self.width, checked, group):
+            group.append(cell)
+            return True
+        # neighbours found frozen against this crate aren't frozen after all
+        checked.discard(cell)
+        del group[size:]
+        return False
+
+    def blocked(self, crates, cell, step, checked, group):
+        """checks whether a crate can't be moved along one axis"""
+        grid = self.grid
+        before, after = cell - step, cell + step
+        # wall on either side
+        if grid[before] == WALL or grid[after] == WALL:
+            return True
+        if before in checked or after in checked:
+            return True
+        # both sides are dead squares
+        if self.dead[before] and self.dead[after]:
+            return True
+        # a frozen crate on either side
+        for side in (before, after):
+            if side in crates and self.frozen(crates, side, checked, group):
+                return True
+        return False
@@ -0,0 +1,108 @@
+# imports
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import collection
+import scores
+from canonical import level_hash
+from engine import read_xsb, list_levels
+
+
+# GLOBALS
+LEVEL_FOLDER = "./assets/levels/"
+# merged copies are moved here, inside the level folder, rather than deleted
+DUPLICATES = "duplicates"
+# levels hashed per worker task
+CHUNK = 256
+
+
+def hash_chunk(paths):
+    """hashes a list of levels in a worker process, None for unreadable ones"""
+    hashes = []
+    for path in paths:
+        try:
+            hashes.append(level_hash(read_xsb(path)))
+        except (OSError, ValueError):
+            hashes.append(None)
+    return hashes
+
+
+def find_duplicates(paths, workers=None):
+    """groups levels by their canonical hash, returns the groups of copies,
+    each in the order of paths"""
+    chunks = [paths[i:i + CHUNK] for i in range(0, len(paths), CHUNK)]
+    groups = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk, hashes in zip(chunks, pool.map(hash_chunk, chunks)):
+            for path, key in zip(chunk, hashes):
+                if key is not None:
+                    groups.setdefault(key, []).append(path)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def keep_order(path):
+    """copies are kept in this order: levels of collections first, they
+    can't be moved out of their file, then by path"""
+    return collection.split_ref(path)[1] is None, path
+
+
+def merge(group, folder, store):
+    """keeps the first level of a group of copies, moves the other level
+    files to the duplicates folder and their highscores, old text files
+    included, to the kept level. Copies inside collection files stay with
+    their scores. Returns (files moved, scores moved)"""
+    kept = group[0]
+    target = scores.level_key(kept)
+    store.import_txt(scores.legacy_file(kept), target)
+    files = moved = 0
+    for path in group[1:]:
+        if collection.split_ref(path)[1] is not None:
+            continue
+        source = scores.level_key(path)
+        store.import_txt(scores.legacy_file(path), source)
+        moved += store.move_scores(source, target)
+
+        os.makedirs(os.path.join(folder, DUPLICATES), exist_ok=True)
+        stem, extension = os.path.splitext(os.path.basename(path))
+        destination = os.path.join(folder, DUPLICATES, stem + extension)
+        # copies of different packs can share a file name
+        copy = 1
+        while os.path.exists(destination):
+            copy += 1
+            destination = os.path.join(folder, DUPLICATES, "{}~{}{}".format(stem, copy, extension))
+        os.replace(path, destination)
+        files += 1
+    return files, moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="find levels that are copies of each other, turned, mirrored or padded")
+    parser.add_argument("folder", nargs="?", default=LEVEL_FOLDER, help="folder of levels")
+    parser.add_argument("--merge", action="store_true",
+                        help="move the copies to a duplicates folder and their highscores to the kept level")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    paths = sorted(list_levels(args.folder), key=keep_order)
+    groups = find_duplicates(paths, args.workers)
+    for group in groups:
+        print("{} has copies: {}".format(group[0], ", ".join(group[1:])))
+    copies = sum(len(group) - 1 for group in groups)
+    print("{} levels, {} copies in {} groups, {:.1f}s".format(
+        len(paths), copies, len(groups), time.perf_counter() - start))
+
+    if args.merge:
+        store = scores.get_store()
+        files = moved = 0
+        for group in groups:
+            result = merge(group, args.folder, store)
+            files += result[0]
+            moved += result[1]
+        print("moved {} level files to {} and {} scores to the kept levels".format(
+            files, os.path.join(args.folder, DUPLICATES), moved))
+
+
+if __name__ == '__main__':
+    main()
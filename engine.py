@@ -0,0 +1,259 @@
+# imports
+# (pure python on purpose: the engine must import without pygame)
+import os
+import collection
+from deadlock import Deadlocks
+
+
+# GLOBALS
+# cell codes of the flat static grid
+FLOOR = 0
+WALL = 1
+GOAL = 2
+
+# move results
+BLOCKED = 0
+WALK = 1
+PUSH = 2
+
+# LURD letters and their direction vectors
+DIRECTIONS = {"l": (-1, 0), "u": (0, -1), "r": (1, 0), "d": (0, 1)}
+LETTERS = {vector: letter for letter, vector in DIRECTIONS.items()}
+# journal bytes of a walk and a push in each direction
+TOKENS = {vector: (ord(letter), ord(letter.upper())) for vector, letter in LETTERS.items()}
+
+
+def read_xsb(path):
+    """reads the level file, or one level of a collection file when the
+    path is a 'file#index' level name"""
+    if collection.split_ref(path)[1] is not None:
+        return collection.read_level(path)
+    with open(path, "r") as f:
+        lines = [list(x.rstrip("\n")) for x in f.readlines()]
+
+    return lines
+
+
+def list_levels(folder):
+    """paths of the level files in a folder, in the order the selector lists
+    them, levels of collection files are listed by their 'file#index' names"""
+    paths = []
+    for entry in os.scandir(folder):
+        # only load xsb files and collections
+        if entry.is_file() and entry.name.endswith(".xsb"):
+            paths.append(entry.path)
+        elif entry.is_file() and collection.is_collection(entry.name):
+            paths.extend(collection.level_refs(entry.path))
+    return paths
+
+
+class Engine:
+    """pure python game rules: parse, move, push and win check
+
+    the level is stored as a flat grid padded with a wall border, so every
+    position is a single int and every move is a couple of lookups"""
+    def __init__(self, level):
+        self.level = level
+
+        # parse the level on creation
+        self.reset()
+
+    def reset(self):
+        """builds the static grid and the starting state from the parsed level"""
+        level = self.level
+        # determine level size, add one cell of padding on each side
+        self.w = max([len(i) for i in level]) if level else 0
+        self.h = len(level)
+        width = self.width = self.w + 2
+
+        # flat static grid, everything outside the level counts as wall
+        grid = bytearray([WALL]) * (width * (self.h + 2))
+        goals = set()
+        crates = set()
+        player = None
+        for y, row in enumerate(level):
+            for x, symbol in enumerate(row):
+                i = (y + 1) * width + x + 1
+                if symbol == "#":
+                    continue
+                grid[i] = FLOOR
+                if symbol in ".+*":
+                    grid[i] = GOAL
+                    goals.add(i)
+                if symbol in "@+":
+                    player = i
+                elif symbol in "$*":
+                    crates.add(i)
+
+        if player is None:
+            raise ValueError("Level has no player.")
+
+        self.grid = grid
+        self.goals = frozenset(goals)
+        self.start_crates = frozenset(crates)
+        self.start_player = player
+        # direction vectors as flat offsets
+        self.offsets = {vector: vector[0] + vector[1] * width for vector in LETTERS}
+        # static deadlock analysis of the level
+        self.deadlocks = Deadlocks(grid, self.goals, width)
+
+        self.restart()
+
+    def restart(self):
+        """puts the player and crates back to the start, without parsing again"""
+        self.crates = set(self.start_crates)
+        self.player = self.start_player
+        # running count of crates sitting on goals
+        self.on_goal = len(self.goals & self.crates)
+        # cell of the crate whose push lost the game, None while solvable
+        self.deadlock = None
+        # move number of that push, so undoing it clears the flag
+        self.deadlock_move = None
+
+        # move and push counters
+        self.counter = 0
+        self.pushes = 0
+        # one LURD byte per move, uppercase for pushes, moves after the
+        # counter are the ones that can be redone
+        self.journal = bytearray()
+
+    def index(self, pos):
+        """converts an (x, y) level position to a flat grid index"""
+        return (pos[1] + 1) * self.width + pos[0] + 1
+
+    def pos(self, index):
+        """converts a flat grid index to an (x, y) level position"""
+        return (index % self.width - 1, index // self.width - 1)
+
+    @property
+    def player_pos(self):
+        return self.pos(self.player)
+
+    @property
+    def crate_positions(self):
+        return [self.pos(i) for i in self.crates]
+
+    @property
+    def lurd(self):
+        """the moves made so far as a LURD string"""
+        return self.journal[:self.counter].decode()
+
+    @property
+    def deadlocked(self):
+        return self.deadlock is not None
+
+    @property
+    def dead_squares(self):
+        """(x, y) positions of the cells inside the level a crate can never
+        be pushed out of alive"""
+        dead = self.deadlocks.dead
+        grid = self.grid
+        steps = self.offsets.values()
+        # flood fill from the player so floor outside the walls is left out
+        inside = {self.player}
+        stack = [self.player]
+        while stack:
+            cell = stack.pop()
+            for step in steps:
+                to = cell + step
+                if to not in inside and grid[to] != WALL:
+                    inside.add(to)
+                    stack.append(to)
+        return [self.pos(i) for i in sorted(inside) if dead[i]]
+
+    @property
+    def goal_count(self):
+        return len(self.goals)
+
+    @property
+    def finished(self):
+        """all crates are on target, constant time thanks to the on goal count"""
+        return self.on_goal == len(self.goals)
+
+    def move(self, direction):
+        """makes the move if it is valid, returns BLOCKED, WALK or PUSH"""
+        result = self.step(direction)
+        if result:
+            # a new move drops the moves that could have been redone
+            journal = self.journal
+            if len(journal) >= self.counter:
+                del journal[self.counter - 1:]
+            journal.append(TOKENS[direction][result == PUSH])
+        return result
+
+    def step(self, direction):
+        """applies the rules for one move without touching the journal"""
+        step = self.offsets[direction]
+        goal = self.player + step
+        crates = self.crates
+
+        # simple move
+        if goal not in crates:
+            if self.grid[goal] == WALL:
+                return BLOCKED
+            self.player = goal
+            self.counter += 1
+            return WALK
+
+        # push crate
+        behind = goal + step
+        if behind in crates or self.grid[behind] == WALL:
+            return BLOCKED
+        crates.remove(goal)
+        crates.add(behind)
+        # only a push can change the goal occupancy
+        grid = self.grid
+        if grid[goal] == GOAL:
+            self.on_goal -= 1
+        if grid[behind] == GOAL:
+            self.on_goal += 1
+        # flag the first push that makes the level unsolvable
+        if self.deadlock is None and self.deadlocks.check(crates, behind):
+            self.deadlock = behind
+            self.deadlock_move = self.counter + 1
+        self.player = goal
+        self.counter += 1
+        self.pushes += 1
+        return PUSH
+
+    def undo(self):
+        """takes back the last move, returns its LURD letter or None"""
+        if self.counter == 0:
+            return None
+        letter = chr(self.journal[self.counter - 1])
+        step = self.offsets[DIRECTIONS[letter.lower()]]
+        player = self.player
+
+        # uppercase means the move pushed a crate, pull it back
+        if letter.isupper():
+            crate = player + step
+            self.crates.remove(crate)
+            self.crates.add(player)
+            grid = self.grid
+            if grid[crate] == GOAL:
+                self.on_goal -= 1
+            if grid[player] == GOAL:
+                self.on_goal += 1
+            if self.deadlock_move == self.counter:
+                self.deadlock = None
+                self.deadlock_move = None
+            self.pushes -= 1
+
+        self.player = player - step
+        self.counter -= 1
+        return letter
+
+    def redo(self):
+        """makes the last undone move again, returns its LURD letter or None"""
+        if self.counter >= len(self.journal):
+            return None
+        letter = chr(self.journal[self.counter])
+        self.step(DIRECTIONS[letter.lower()])
+        return letter
+
+    def play(self, lurd):
+        """plays a LURD string, returns False at the first blocked move"""
+        for letter in lurd:
+            if self.move(DIRECTIONS[letter.lower()]) == BLOCKED:
+                return False
+        return True
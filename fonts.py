@@ -0,0 +1,70 @@
+# imports
+from collections import OrderedDict
+import pygame
+
+
+# GLOBALS
+# font used by every screen
+FONT_NAME = '3ds'
+FONT_SIZE = 32
+# memory budget of the rendered text cache in bytes
+TEXT_CACHE_BUDGET = 8 * 1024 * 1024
+
+
+class TextCache:
+    """process wide font registry and LRU cache of rendered text surfaces"""
+    def __init__(self, budget=TEXT_CACHE_BUDGET):
+        self.budget = budget
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, size=FONT_SIZE, name=FONT_NAME):
+        """returns the font, looking it up in the system font list only once"""
+        key = (name, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pygame.font.SysFont(name, size)
+            self.fonts[key] = font
+        return font
+
+    def render(self, text, color, size=FONT_SIZE, name=FONT_NAME):
+        """renders a text, or returns the cached surface of an earlier render
+        the returned surface is shared, so it must not be drawn on"""
+        key = (text, tuple(color), size, name)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = self.font(size, name).render(text, True, color)
+        self.surfaces[key] = surface
+        self.size += self.footprint(surface)
+
+        # evict the least recently used texts until we are within budget
+        while self.size > self.budget and len(self.surfaces) > 1:
+            _, old = self.surfaces.popitem(last=False)
+            self.size -= self.footprint(old)
+        return surface
+
+    def footprint(self, surface):
+        """memory used by the pixels of a surface in bytes"""
+        return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+    def stats(self):
+        """hit and miss counters and memory use of the cache"""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.surfaces),
+                "bytes": self.size, "fonts": len(self.fonts)}
+
+
+# the shared cache every screen renders through
+cache = TextCache()
+
+
+def render(text, color, size=FONT_SIZE, name=FONT_NAME):
+    """renders a text through the shared cache"""
+    return cache.render(text, color, size, name)
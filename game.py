@@ -1,25 +1,37 @@
 #imports
 import pygame
+import fonts
+import assets
+import hint
+import workers
+from engine import Engine, read_xsb, PUSH, DIRECTIONS
+from pathfinding import Navigator
 
 
 # GLOBALS
 # colours
 WHITE = (255, 255, 255)
+YELLOW = (255, 220, 0)
+ORANGE = (255, 140, 0)
 
-# images
-crate = pygame.image.load("./assets/crate.png")
-wall = pygame.image.load("./assets/wall.png")
-player = pygame.image.load("./assets/player.png")
-ground_bg = pygame.image.load("./assets/ground_bg.png")
-ground_tile = pygame.image.load("./assets/ground_tile.png")
-red_overlay = pygame.image.load("./assets/red_overlay.png")
+# window size and the tile sizes of the zoom levels
+WINDOW = 720
+ZOOMS = (18, 24, 36, 48)
+# tiles kept between the player and the edge of the view before it scrolls
+MARGIN = 3
+
+
+# status line of each hint result
+HINT_TEXT = {"solved": "push the marked crate", "partial": "best guess, no solution found in time",
+             "stuck": "no solution from here, undo"}
 
 
 class Game:
     """class that handles game logic and graphics"""
-    def __init__(self, path, finished=False):
+    def __init__(self, path, finished=False, tile=36):
         self.path = path
         self.finished = finished
+        self.tile = tile
 
         # load the level on creation
         self.load()
@@ -27,28 +39,49 @@ class Game:
     def load(self):
         # read a level from file
         level = self.read_xsb(self.path)
-        # separate static and dynamic parts of the level
-        self.static_level, self.player_pos, self.crate_positions = self.extract_static_level(level)
+        # the engine handles the rules, this class only draws it
+        self.engine = Engine(level)
+        # static part of the level for drawing
+        self.static_level = self.extract_static_level(level)[0]
+        # cells a crate must never be pushed to
+        self.dead_squares = set(self.engine.dead_squares)
+        # plans the moves of mouse clicks, and the crate being dragged
+        self.navigator = Navigator(self.engine)
+        self.dragging = None
+        # the hint on display, and whether a hint search is running
+        self.hint = None
+        self.hinting = False
+        # set while a planned walk or push is played, the hint restarts after it
+        self.planning = False
+
+        # a new level needs a full redraw, after that only changed tiles
+        self.redraw = True
+        self.dirty = set()
 
-        # determine level size
-        w = max([len(i) for i in level])
-        h = len(level)
+        # bake the walls into one surface and point the camera at the level
+        self.bake_static_level()
+        self.camera = None
+        self.follow()
 
-        # position the playing field in middle of window
-        left = (720/36 - w) // 2
-        top = (720/36 - h) // 2
-        self.topleft = (left, top)
+    @property
+    def player_pos(self):
+        return self.engine.player_pos
 
-        # reset move counter
-        self.counter = 0
+    @property
+    def crate_positions(self):
+        return self.engine.crate_positions
 
+    @property
+    def counter(self):
+        return self.engine.counter
+
+    @property
+    def on_goal(self):
+        return self.engine.on_goal
 
     def read_xsb(self, path):
         """reads the level file"""
-        with open(path, "r") as f:
-            lines = [list(x.rstrip("\n")) for x in f.readlines()]
-
-        return lines
+        return read_xsb(path)
 
     def extract_static_level(self, level):
         """separates the static and dynamic parts of the level"""
@@ -72,66 +105,304 @@ class Game:
                     stat[y][x] = "."
         return stat, player_pos, crate_positions
 
-    def draw_static_level(self, window):
-        """draws the static level on the screen"""
-        left, top = self.topleft[0], self.topleft[1]
+    def bake_static_level(self):
+        """draws the walls of the whole level on a cached surface"""
+        tile = self.tile
+        wall_tile = assets.sprites(tile)["wall"]
+        layer = pygame.Surface((max(1, self.engine.w) * tile, max(1, self.engine.h) * tile), pygame.SRCALPHA)
         for y, row in enumerate(self.static_level):
             for x, symbol in enumerate(row):
                 if symbol == "#":
-                    window.blit(wall, ((left + x)*36, (top + y)*36))
-                elif symbol == ".":
-                    window.blit(red_overlay, ((left + x)*36, (top + y)*36))
-
-        # draw instructions
-        font = pygame.font.SysFont('3ds', 32)
-        text_string = "ESC - return to menu | R - restart | MOVES:" + str(self.counter)
-        text = font.render(text_string, True, WHITE)
+                    layer.blit(wall_tile, (x*tile, y*tile))
+        self.level_layer = layer
+
+    def bake_view(self):
+        """draws the background and the visible part of the walls on a
+        cached window sized surface"""
+        background = pygame.Surface((WINDOW, WINDOW))
+        background.blit(assets.image("ground_bg"), (0, 0))
+        # blitting clips the layer to the window, so off screen walls cost nothing
+        background.blit(self.level_layer, self.screen_pos((0, 0)))
+        self.background = background
+
+    def view_size(self):
+        """number of tiles that fit in the window"""
+        return WINDOW // self.tile
+
+    def follow(self):
+        """moves the camera so the player stays in view, small levels are
+        centred and don't scroll"""
+        size = self.view_size()
+        w, h = self.engine.w, self.engine.h
+        x, y = self.player_pos
+        camera = []
+        for pos, length, current in ((x, w, None if self.camera is None else self.camera[0]),
+                                     (y, h, None if self.camera is None else self.camera[1])):
+            if length <= size:
+                # position the playing field in middle of window
+                camera.append(-((size - length) // 2))
+                continue
+            margin = min(MARGIN, (size - 1) // 2)
+            if current is None or pos < current + margin or pos >= current + size - margin:
+                # recentre on the player, without showing space beyond the level
+                current = min(max(pos - size // 2, 0), length - size)
+            camera.append(current)
+
+        camera = tuple(camera)
+        if camera != self.camera:
+            self.camera = camera
+            self.bake_view()
+            self.redraw = True
+
+    def zoom(self, direction):
+        """changes the tile size to the next zoom level in a direction"""
+        index = ZOOMS.index(self.tile) if self.tile in ZOOMS else ZOOMS.index(36)
+        index = min(max(index + direction, 0), len(ZOOMS) - 1)
+        if ZOOMS[index] != self.tile:
+            self.tile = ZOOMS[index]
+            self.bake_static_level()
+            self.camera = None
+            self.follow()
+
+    def screen_pos(self, pos):
+        """window position of the top left corner of a level tile"""
+        return ((pos[0] - self.camera[0]) * self.tile, (pos[1] - self.camera[1]) * self.tile)
+
+    def visible(self, pos):
+        """whether a level tile is inside the window"""
+        size = self.view_size()
+        return 0 <= pos[0] - self.camera[0] < size and 0 <= pos[1] - self.camera[1] < size
+
+    def cell_at(self, point):
+        """level position of the tile under a window point, None outside the level"""
+        x = point[0] // self.tile + self.camera[0]
+        y = point[1] // self.tile + self.camera[1]
+        if 0 <= x < self.engine.w and 0 <= y < self.engine.h:
+            return (x, y)
+        return None
+
+    def draw_static_level(self, window):
+        """draws the static overlays and the instructions on the screen"""
+        images = assets.sprites(self.tile)
+        for index in self.engine.goals:
+            pos = self.engine.pos(index)
+            if self.visible(pos):
+                window.blit(images["goal"], self.screen_pos(pos))
+        for pos in self.dead_squares:
+            if self.visible(pos):
+                window.blit(images["dead"], self.screen_pos(pos))
+
+        # mark the crate that made the level unsolvable
+        if self.engine.deadlocked:
+            window.blit(images["stuck"], self.screen_pos(self.engine.pos(self.engine.deadlock)))
+
+        for pos in self.hint_cells():
+            if self.visible(pos):
+                self.draw_hint(window, pos, pygame.Rect(self.screen_pos(pos), (self.tile, self.tile)))
+
+        self.draw_instructions(window)
+
+    def draw_instructions(self, window):
+        """draws the instructions line, returns its rect"""
+        text_string = "ESC menu | R restart | U/Y undo | H hint | MOVES:" + str(self.counter) + " | GOALS:" + str(self.on_goal) + "/" + str(self.engine.goal_count)
+        if self.engine.deadlocked:
+            text_string = "DEADLOCK! | ESC - return to menu | R - restart | U - undo"
+        elif self.hinting:
+            text_string = "HINT: searching... | MOVES:" + str(self.counter)
+        elif self.hint is not None:
+            text_string = "HINT: " + HINT_TEXT[self.hint["status"]] + " | MOVES:" + str(self.counter)
+        text = fonts.render(text_string, WHITE)
+        # clear the whole line, the previous text may have been longer
+        rect = pygame.Rect(0, 0, WINDOW, text.get_height())
+        window.blit(self.background, rect, rect)
         window.blit(text, (0, 0))
+        return rect
+
+    def draw_tile(self, window, pos):
+        """redraws everything on one tile of the level, returns its rect"""
+        images = assets.sprites(self.tile)
+        rect = pygame.Rect(self.screen_pos(pos), (self.tile, self.tile))
+        window.blit(self.background, rect, rect)
+
+        engine = self.engine
+        index = engine.index(pos)
+        if index == engine.player:
+            window.blit(images["player"], rect)
+        elif index in engine.crates:
+            window.blit(images["crate"], rect)
+        if index in engine.goals:
+            window.blit(images["goal"], rect)
+        if pos in self.dead_squares:
+            window.blit(images["dead"], rect)
+        if index == engine.deadlock:
+            window.blit(images["stuck"], rect)
+        if pos in self.hint_cells():
+            self.draw_hint(window, pos, rect)
+        return rect
+
+    def hint_cells(self):
+        """the crate the hint pushes and the cell it goes to"""
+        if self.hint is None or self.hint["crate"] is None:
+            return ()
+        return self.hint["crate"], self.hint["target"]
+
+    def draw_hint(self, window, pos, rect):
+        """outlines the hinted crate, and marks the cell to push it to"""
+        colour = YELLOW if self.hint["status"] == "solved" else ORANGE
+        if pos == self.hint["crate"]:
+            pygame.draw.rect(window, colour, rect, max(2, self.tile // 12))
+        else:
+            pygame.draw.circle(window, colour, rect.center, self.tile // 6)
 
     def draw_dynamic(self, window):
-        """draws the player and crates"""
+        """draws the player and the crates in view"""
+        images = assets.sprites(self.tile)
         # player
-        x, y = self.player_pos[0], self.player_pos[1]
-        window.blit(player, ((self.topleft[0] + x)*36, (self.topleft[1] + y)*36))
+        window.blit(images["player"], self.screen_pos(self.player_pos))
 
         # crates
         for pos in self.crate_positions:
-            x, y = pos[0], pos[1]
-            window.blit(crate, ((self.topleft[0] + x)*36, (self.topleft[1] + y)*36))
+            if self.visible(pos):
+                window.blit(images["crate"], self.screen_pos(pos))
 
     def draw(self, window):
-        """draws the screen"""
+        """draws the screen, returns the list of changed rects
+        or None when the whole screen was redrawn"""
         # exists so all screen objects have a standard draw method
-        window.blit(ground_bg, (0, 0))
-        self.draw_dynamic(window)
-        self.draw_static_level(window)
+        if self.redraw:
+            window.blit(self.background, (0, 0))
+            self.draw_dynamic(window)
+            self.draw_static_level(window)
+            self.redraw = False
+            self.dirty.clear()
+            return None
+
+        # only redraw the tiles that changed since the last draw
+        rects = [self.draw_tile(window, pos) for pos in self.dirty if self.visible(pos)]
+        rects.append(self.draw_instructions(window))
+        self.dirty.clear()
+        return rects
 
     def validate_and_move(self, direction):
         """checks if a move is valid and makes the move if it is,
         also checks if the game is finished after a valid move"""
-        goal = (self.player_pos[0] + direction[0], self.player_pos[1] + direction[1])
-        behind = (self.player_pos[0] + 2*direction[0], self.player_pos[1] + 2*direction[1])
+        before = self.player_pos
+        result = self.engine.move(direction)
+        if result:
+            # the tiles the player left and entered changed
+            self.dirty.add(before)
+            self.dirty.add(self.player_pos)
+            # and the one the crate was pushed to
+            if result == PUSH:
+                self.dirty.add((before[0] + 2*direction[0], before[1] + 2*direction[1]))
+            self.follow()
+            self.check_finished()
+            self.moved()
+
+    def request_hint(self):
+        """starts searching the next push in the background"""
+        if self.finished or self.engine.deadlocked:
+            return
+        self.hinting = True
+        hint.get_engine().request(self.hint_found, self.path, self.engine.player, self.engine.crates)
+
+    def hint_found(self, result):
+        """shows the result of a hint search"""
+        self.hinting = False
+        if isinstance(result, workers.Failed) or result["status"] == "cancelled":
+            return
+        self.dirty.update(self.hint_cells())
+        self.hint = result
+        self.dirty.update(self.hint_cells())
+
+    def moved(self):
+        """drops the hint on display, and restarts a running hint search
+        from the new position"""
+        self.dirty.update(self.hint_cells())
+        self.hint = None
+        if self.hinting and not self.planning:
+            if self.finished or self.engine.deadlocked:
+                self.hinting = False
+                hint.get_engine().cancel()
+            else:
+                self.request_hint()
+
+    def hover(self, point):
+        """whether clicking a window point would move the player or pick up a crate"""
+        pos = self.cell_at(point)
+        if pos is None or self.finished:
+            return False
+        index = self.engine.index(pos)
+        return index in self.engine.crates or self.navigator.reachable(index)
 
-        # simple move
-        if goal not in self.crate_positions and (self.static_level[goal[1]][goal[0]] == " " or self.static_level[goal[1]][goal[0]] == "."):
-            self.player_pos = (self.player_pos[0] + direction[0], self.player_pos[1] + direction[1])
-            self.counter += 1
+    def click(self, point):
+        """walks to the clicked tile, or picks up the clicked crate for dragging"""
+        pos = self.cell_at(point)
+        if pos is None or self.finished:
+            return
+        index = self.engine.index(pos)
+        if index in self.engine.crates:
+            self.dragging = index
+            return
+        moves = self.navigator.walk_to(index)
+        if moves:
+            self.play_moves(moves)
+
+    def release(self, point):
+        """pushes the dragged crate to the tile it was dropped on"""
+        crate = self.dragging
+        self.dragging = None
+        pos = self.cell_at(point)
+        if crate is None or pos is None or self.finished:
+            return
+        moves = self.navigator.push_to(crate, self.engine.index(pos))
+        if moves:
+            self.play_moves(moves)
+
+    def play_moves(self, moves):
+        """makes a planned sequence of moves, drawn together on the next frame"""
+        self.planning = True
+        for direction in moves:
+            self.validate_and_move(direction)
+            if self.finished:
+                break
+        self.planning = False
+        self.moved()
+
+    def restart(self):
+        """resets the level from the parsed level in memory"""
+        self.engine.restart()
+        self.finished = False
+        self.redraw = True
+        self.follow()
+        self.moved()
+
+    def undo(self):
+        """takes back the last move"""
+        before = self.player_pos
+        letter = self.engine.undo()
+        if letter is not None:
+            self.mark_move(before, letter)
+            self.follow()
             self.check_finished()
-        # push crate
-        elif goal in self.crate_positions and behind not in self.crate_positions and self.static_level[behind[1]][behind[0]] != "#":
-            self.player_pos = (self.player_pos[0] + direction[0], self.player_pos[1] + direction[1])
-            self.crate_positions[self.crate_positions.index(goal)] = behind
-            self.counter += 1
+            self.moved()
+
+    def redo(self):
+        """makes the last undone move again"""
+        before = self.player_pos
+        letter = self.engine.redo()
+        if letter is not None:
+            self.mark_move(before, letter)
+            self.follow()
             self.check_finished()
+            self.moved()
+
+    def mark_move(self, pos, letter):
+        """marks the tiles an undone or redone move may have changed"""
+        dx, dy = DIRECTIONS[letter.lower()]
+        for k in (-1, 0, 1, 2):
+            self.dirty.add((pos[0] + k*dx, pos[1] + k*dy))
 
     def check_finished(self):
         """checks whether the game is finished = all crates are on target"""
-        finished = True
-        for y, row in enumerate(self.static_level):
-            for x, symbol in enumerate(row):
-                if symbol == ".":
-                    if (x, y) not in self.crate_positions:
-                        finished = False
-                        break
-
-        self.finished = finished
+        self.finished = self.engine.finished
@@ -0,0 +1,317 @@
+# imports
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from canonical import level_hash
+from engine import Engine, list_levels, read_xsb, DIRECTIONS, LETTERS, WALL
+from solver import Solver
+
+
+# GLOBALS
+OUTPUT = "./assets/levels/"
+# record of every generated level with its solution, readable by batch.py --verify
+MANIFEST = "generated.jsonl"
+# candidates dropped or duplicated in a row before a run gives up, the
+# settings can't make more new levels then
+MAX_FAILURES = 200
+# wall blocks dropped into an empty room, as (dx, dy) cells
+BLOCKS = (((0, 0),), ((0, 0), (1, 0)), ((0, 0), (0, 1)), ((0, 0), (1, 0), (0, 1)),
+          ((0, 0), (1, 0), (1, 1)), ((0, 0), (1, 0), (0, 1), (1, 1)))
+# weights of the difficulty score
+WEIGHTS = {"pushes": 1.0, "moves": 0.1, "switches": 3.0, "branching": 2.0}
+
+
+def make_room(rng, w, h, density):
+    """a w x h room with random wall blocks, as a set of (x, y) floor cells,
+    every floor cell stays connected to the others"""
+    floor = {(x, y) for x in range(1, w + 1) for y in range(1, h + 1)}
+    for _ in range(int(w * h * density)):
+        block = rng.choice(BLOCKS)
+        x, y = rng.randint(1, w), rng.randint(1, h)
+        cells = {(x + dx, y + dy) for dx, dy in block} & floor
+        rest = floor - cells
+        if len(rest) >= w * h // 2 and connected(rest):
+            floor = rest
+    return floor
+
+
+def connected(floor):
+    start = next(iter(floor))
+    seen = {start}
+    stack = [start]
+    while stack:
+        x, y = stack.pop()
+        for dx, dy in LETTERS:
+            cell = (x + dx, y + dy)
+            if cell in floor and cell not in seen:
+                seen.add(cell)
+                stack.append(cell)
+    return len(seen) == len(floor)
+
+
+def render(w, h, floor, goals, crates, player):
+    """the level as .xsb rows, with the room's wall border"""
+    rows = []
+    for y in range(h + 2):
+        row = ""
+        for x in range(w + 2):
+            cell = (x, y)
+            if cell not in floor:
+                symbol = "#"
+            elif cell == player:
+                symbol = "+" if cell in goals else "@"
+            elif cell in crates:
+                symbol = "*" if cell in goals else "$"
+            else:
+                symbol = "." if cell in goals else " "
+            row += symbol
+        rows.append(row)
+    return rows
+
+
+def walk_path(player, target, free):
+    """shortest walk over free cells as direction vectors, None if there is none"""
+    parents = {player: None}
+    queue = deque([player])
+    while queue:
+        cell = queue.popleft()
+        if cell == target:
+            break
+        for dx, dy in LETTERS:
+            to = (cell[0] + dx, cell[1] + dy)
+            if to in free and to not in parents:
+                parents[to] = (cell, (dx, dy))
+                queue.append(to)
+    if target not in parents:
+        return None
+    path = []
+    while parents[target] is not None:
+        target, vector = parents[target]
+        path.append(vector)
+    path.reverse()
+    return path
+
+
+def reverse_play(rng, floor, goals, player, pulls):
+    """starts with every crate on a goal and pulls crates away at random,
+    keeping the state whose crates are furthest from the goals
+
+    returns (crates, player, solution). The solution is the pulls played
+    backwards as pushes, so every level made this way is solvable"""
+    crates = set(goals)
+    # reverse moves as (direction, pulled)
+    moves = []
+    best = None
+    best_score = (0, 0)
+    for _ in range(pulls):
+        free = floor - crates
+        options = []
+        for cx, cy in crates:
+            for dx, dy in LETTERS:
+                # the player stands next to the crate and steps away from it
+                stand = (cx + dx, cy + dy)
+                back = (cx + 2 * dx, cy + 2 * dy)
+                if stand in free and back in free:
+                    options.append((stand, (dx, dy), (cx, cy)))
+        rng.shuffle(options)
+        for stand, vector, crate in options:
+            path = walk_path(player, stand, free)
+            if path is not None:
+                break
+        else:
+            break
+
+        moves += [(step, False) for step in path]
+        moves.append((vector, True))
+        crates.remove(crate)
+        crates.add(stand)
+        player = (stand[0] + vector[0], stand[1] + vector[1])
+
+        off = len(crates - goals)
+        distance = sum(min(abs(x - gx) + abs(y - gy) for gx, gy in goals) for x, y in crates)
+        if (off, distance) > best_score:
+            best_score = (off, distance)
+            best = (set(crates), player, len(moves))
+
+    if best is None:
+        return None
+    crates, player, length = best
+    # undoing a pull in direction d is a push in direction -d
+    solution = ""
+    for (dx, dy), pulled in reversed(moves[:length]):
+        letter = LETTERS[(-dx, -dy)]
+        solution += letter.upper() if pulled else letter
+    return crates, player, solution
+
+
+def score(rows, solution):
+    """plays a solution and measures the level: moves, pushes, crate
+    switches (pushing another crate than the last one) and branching (the
+    average number of pushes open to the player before each push).
+    None if the solution doesn't solve the level"""
+    engine = Engine(rows)
+    pushes = switches = options = 0
+    last = None
+    for letter in solution:
+        direction = DIRECTIONS[letter.lower()]
+        if letter.isupper():
+            options += count_pushes(engine)
+            crate = engine.player + engine.offsets[direction]
+            if last is not None and crate != last:
+                switches += 1
+            last = crate + engine.offsets[direction]
+            pushes += 1
+        if not engine.move(direction):
+            return None
+    if not engine.finished:
+        return None
+    stats = {"moves": len(solution), "pushes": pushes, "switches": switches,
+             "branching": round(options / max(1, pushes), 2)}
+    stats["difficulty"] = round(sum(WEIGHTS[name] * stats[name] for name in WEIGHTS), 2)
+    return stats
+
+
+def count_pushes(engine):
+    """number of pushes the player can make from the current state that
+    don't move a crate to a dead square"""
+    grid = engine.grid
+    crates = engine.crates
+    steps = list(engine.offsets.values())
+    seen = {engine.player}
+    stack = [engine.player]
+    count = 0
+    while stack:
+        cell = stack.pop()
+        for step in steps:
+            to = cell + step
+            if to in crates:
+                behind = to + step
+                if grid[behind] != WALL and behind not in crates and not engine.deadlocks.dead[behind]:
+                    count += 1
+            elif grid[to] != WALL and to not in seen:
+                seen.add(to)
+                stack.append(to)
+    return count
+
+
+def generate(seed, width, height, crates, candidates, pulls, optimal):
+    """makes a number of candidate levels from one seed in a worker process,
+    returns the record of the most difficult one, or None"""
+    rng = random.Random(seed)
+    best = None
+    for _ in range(candidates):
+        floor = make_room(rng, width, height, rng.uniform(0.15, 0.35))
+        cells = sorted(floor)
+        if len(cells) < crates + 2:
+            continue
+        goals = set(rng.sample(cells, crates))
+        player = rng.choice([cell for cell in cells if cell not in goals])
+        result = reverse_play(rng, floor, goals, player, pulls)
+        if result is None:
+            continue
+        level_crates, level_player, solution = result
+        # a level that starts solved, or nearly, is no level
+        if len(level_crates - goals) < crates:
+            continue
+        rows = render(width, height, floor, goals, level_crates, level_player)
+        stats = score(rows, solution)
+        if stats is None:
+            continue
+        if best is None or stats["difficulty"] > best["difficulty"]:
+            best = dict(stats, rows=rows, solution=solution)
+
+    if best is not None and optimal:
+        # a shorter solution from the solver makes the difficulty honest
+        result = Solver([list(row) for row in best["rows"]], time_limit=optimal).solve()
+        if result.status == "solved":
+            stats = score(best["rows"], result.solution)
+            if stats is not None:
+                best.update(stats, solution=result.solution)
+    if best is not None:
+        best["seed"] = seed
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="generate solvable levels by pulling crates away from their goals")
+    parser.add_argument("--output", default=OUTPUT, help="folder the .xsb files are written to")
+    parser.add_argument("--count", type=int, default=10, help="number of new levels to write")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the run, the same seed makes the same levels")
+    parser.add_argument("--width", type=int, default=8, help="room width inside the walls")
+    parser.add_argument("--height", type=int, default=8, help="room height inside the walls")
+    parser.add_argument("--crates", type=int, default=3, help="crates per level")
+    parser.add_argument("--candidates", type=int, default=20, help="candidates made per level, the hardest is kept")
+    parser.add_argument("--pulls", type=int, default=60, help="random pulls played per candidate")
+    parser.add_argument("--min-difficulty", type=float, default=0, help="levels below this score are dropped")
+    parser.add_argument("--optimal", type=float, default=0,
+                        help="seconds the solver may spend shortening each solution, 0 to skip")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--max-failures", type=int, default=MAX_FAILURES,
+                        help="give up after this many dropped or duplicate levels in a row")
+    parser.add_argument("--prefix", default="gen", help="file name prefix of the levels")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    # levels already in the folder count as duplicates too, turned and
+    # mirrored copies hash alike
+    seen = {level_hash(["".join(row) for row in read_xsb(path)]) for path in list_levels(args.output)}
+    manifest = open(os.path.join(args.output, MANIFEST), "at")
+
+    written = duplicates = dropped = failures = 0
+    start = time.perf_counter()
+    task = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        # every task has its own seed, and results are taken in task order,
+        # so a run is the same however the tasks are spread over the workers
+        pending = deque()
+        while written < args.count and failures < args.max_failures:
+            while len(pending) < 2 * args.workers:
+                seed = args.seed * 1000003 + task
+                pending.append(pool.submit(generate, seed, args.width, args.height, args.crates,
+                                           args.candidates, args.pulls, args.optimal))
+                task += 1
+            record = pending.popleft().result()
+            if record is None or record["difficulty"] < args.min_difficulty:
+                dropped += 1
+                failures += 1
+                continue
+            key = level_hash(record["rows"])
+            if key in seen:
+                duplicates += 1
+                failures += 1
+                continue
+            seen.add(key)
+            failures = 0
+
+            path = os.path.join(args.output, "{}_{}_{:05}.xsb".format(args.prefix, args.seed, record["seed"] % 1000003))
+            with open(path, "wt") as f:
+                f.write("\n".join(record.pop("rows")) + "\n")
+            record["level"] = path
+            manifest.write(json.dumps(record) + "\n")
+            manifest.flush()
+            written += 1
+
+            rate = written / (time.perf_counter() - start) * 60
+            print("{} difficulty {} pushes {} ({:.1f} levels/min)".format(
+                path, record["difficulty"], record["pushes"], rate))
+        for future in pending:
+            future.cancel()
+    manifest.close()
+
+    elapsed = time.perf_counter() - start
+    rate = written / elapsed * 60
+    print("{} levels in {:.1f}s, {:.1f} levels/min, {} duplicates and {} weak candidates dropped".format(
+        written, elapsed, rate, duplicates, dropped))
+    if written < args.count:
+        print("gave up after {} dropped or duplicate levels in a row, try a bigger room, fewer crates "
+              "or a lower --min-difficulty".format(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
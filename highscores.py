@@ -1,8 +1,12 @@
 # imports
 import string
-from operator import itemgetter
-from time import sleep
 import pygame
+import fonts
+import assets
+import scores
+import workers
+import verifier
+import client
 from pygame import gfxdraw
 from pygame import font
 
@@ -12,15 +16,14 @@ from pygame import font
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 
-# images
-bg_img = pygame.image.load("./assets/docks_bg.png")
-
 
 class Register:
     """the screen where users can save their scores when they finish a level"""
-    def __init__(self, levelfile, score):
+    def __init__(self, levelfile, score, replay=""):
         self.levelfile = levelfile
         self.score = score
+        # LURD moves of the run, the proof of the score
+        self.replay = replay
 
         # start with empty name string
         self.name_str = ""
@@ -28,7 +31,7 @@ class Register:
     def draw(self, window):
         """draws the screen"""
         # set background
-        window.blit(bg_img, (0, 0))
+        window.blit(assets.image("docks_bg"), (0, 0))
 
         # create foreground surface
         fg = pygame.Surface((600, 600))
@@ -36,13 +39,12 @@ class Register:
         pygame.gfxdraw.rectangle(fg, pygame.Rect(0, 0, 600, 600), WHITE)
 
         # create texts and put them on foreground
-        font = pygame.font.SysFont('3ds', 32)
         texts = []
-        texts.append(font.render("FINISHED!", True, WHITE))
-        texts.append(font.render("Number of moves: " + str(self.score), True, WHITE))
-        texts.append(font.render("Enter your name:", True, WHITE))
-        texts.append(font.render("{:_<10}".format(self.name_str), True, WHITE))
-        texts.append(font.render("(Leave empty or press ESC to discard..)", True, WHITE))
+        texts.append(fonts.render("FINISHED!", WHITE))
+        texts.append(fonts.render("Number of moves: " + str(self.score), WHITE))
+        texts.append(fonts.render("Enter your name:", WHITE))
+        texts.append(fonts.render("{:_<10}".format(self.name_str), WHITE))
+        texts.append(fonts.render("(Leave empty or press ESC to discard..)", WHITE))
         for index, text in enumerate(texts):
             # align texts to centre
             fg.blit(text, (300 - text.get_width()/2, (index + 1) * 30))
@@ -51,14 +53,11 @@ class Register:
         window.blit(fg, (60, 60))
 
     def save_to_file(self):
-        """saves the score to a file corresponding to the level's file name"""
+        """saves the score to the highscore store under the level's name"""
         # make sure a name was given
         if len(self.name_str) > 0:
-            # file is saved in './assets/highscores/[levelname].txt'
-            # where each line is: '[name] [score]\n'
-            dest = self.levelfile.replace("levels", "highscores").replace(".xsb", ".txt")
-            with open(dest, "at") as f:
-                f.write(self.name_str + " " + str(self.score) + "\n")
+            # written in the background, before any later highscore read
+            workers.io(None, save_score, self.levelfile, self.name_str, self.score, self.replay)
 
     def key_press(self, event):
         """deal with text input, returns True when name is submitted"""
@@ -88,7 +87,7 @@ class Highscores:
     def draw(self, window):
         """draws the screen"""
         # set background
-        window.blit(bg_img, (0, 0))
+        window.blit(assets.image("docks_bg"), (0, 0))
 
         # create foreground surface
         fg = pygame.Surface((600, 600))
@@ -96,30 +95,52 @@ class Highscores:
         pygame.gfxdraw.rectangle(fg, pygame.Rect(0, 0, 600, 600), WHITE)
 
         # draw the topscores
-        font = pygame.font.SysFont('3ds', 32)
         for index, entry in enumerate(self.top):
             # render name and score separately beacause it doesn't handle string formatting
-            name_text = font.render(entry[0], True, WHITE)
+            name_text = fonts.render(entry[0], WHITE)
             fg.blit(name_text, (50, 50 + index*50))
-            score_text = font.render(str(entry[1]), True, WHITE)
+            score_text = fonts.render(str(entry[1]), WHITE)
             fg.blit(score_text, (400, 50 + index*50))
 
         # draw foreground to window
         window.blit(fg, (60, 60))
 
     def find_top(self):
-        """read highscore file and make a list w/ the top 10 scores and names"""
-        file = self.levelfile.replace("levels", "highscores").replace(".xsb", ".txt")
-        try:
-            with open(file, "rt") as f:
-                entries = [line.rstrip("\n").split(" ") for line in f.readlines()]
-            entries = [[entry[0], int(entry[1])] for entry in entries]
-            # sort the highscore entries by score ascending
-            entries = sorted(entries, key=itemgetter(1))
-        except FileNotFoundError:
-            # display when there is no highscore file for the level
+        """make a list w/ the top 10 scores and names in the background"""
+        # placeholder until the scores are read
+        self.top = [["Loading highscores...", ""]]
+        workers.io(self.set_top, read_top, self.levelfile)
+
+    def set_top(self, entries):
+        """receives the top scores read in the background"""
+        if isinstance(entries, workers.Failed):
+            entries = [["Highscores can't be read", ""]]
+        elif not entries:
+            # display when there is no highscore for the level
             # this is the easiest way to display it like it's a top score
             entries = [["No available highscores yet", ""]]
 
         #only show top 10 scores
         self.top = entries[:10]
+
+
+def save_score(levelfile, name, score, replay):
+    """adds a score of a level to the highscore store, once its replay
+    proves the level was solved in that many moves"""
+    entry = {"level": levelfile, "name": name, "score": score, "replay": replay}
+    # with a highscore server it checks the replay, the client returns at once
+    if client.get_client() is not None:
+        client.get_client().submit(entry)
+    elif verifier.check(entry) is None:
+        scores.get_store().add(scores.level_key(levelfile), name, score)
+
+
+def read_top(levelfile):
+    """reads the top scores of a level from the highscore store, or from
+    the highscore server when there is one"""
+    if client.get_client() is not None:
+        return client.get_client().top(levelfile)
+    store = scores.get_store()
+    # scores of the old '[name] [score]' text files are imported on first read
+    store.import_txt(scores.legacy_file(levelfile), scores.level_key(levelfile))
+    return store.top(scores.level_key(levelfile))
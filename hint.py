@@ -0,0 +1,299 @@
+# imports
+import heapq
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import workers
+from engine import read_xsb
+from solver import Solver, TranspositionTable, INF, ENTRY_SIZE, NODE_SIZE, CRATE_SIZE, MB
+
+
+# GLOBALS
+# seconds a hint search may take before it answers with its best effort
+TIME_LIMIT = 3.0
+# megabytes the search tables of the worker may use
+MAX_MEMORY = 64
+# share of the memory kept for the states of solutions found by earlier hints
+KNOWN_SHARE = 0.25
+# a known way to the goal is taken once it is at most this much longer than
+# the shortest solution could be, hints needn't be optimal to be useful
+SLACK = 1.25
+# rough size in bytes of one push in the stored solutions
+PUSH_SIZE = 72
+
+# search state of the worker process, kept between hints
+hinter = None
+# number of the newest hint request, shared with the worker process
+latest = None
+
+
+class Hinter(Solver):
+    """searches the next push from any state of one level, and keeps what
+    it learned between searches: the heuristic and deadlock caches of the
+    level, and every state on a solution found before with the pushes that
+    solve it from there. Following a hint, or straying from it and coming
+    back, answers at once, and a search from elsewhere stops as soon as it
+    reaches one of those states"""
+    def __init__(self, path, max_memory=MAX_MEMORY, time_limit=TIME_LIMIT):
+        super().__init__(read_xsb(path), max_memory * (1 - KNOWN_SHARE), time_limit)
+        self.path = path
+        self.megabytes = max_memory
+        # crates -> {player cell: (moves left, solution number, pushes made)},
+        # the states of a solution share its list of pushes
+        self.known = {}
+        # solution number -> [pushes, states using it]
+        self.solutions = {}
+        self.solution_count = 0
+        self.known_bytes = 0
+        self.max_known = max_memory * KNOWN_SHARE * MB
+
+    def search(self, player, crates, cancelled=lambda: False):
+        """A* from a state until it finds a solution, runs out of time or is
+        cancelled, returns a dict with the status ('solved', 'partial',
+        'stuck' or 'cancelled'), the moves towards the solution, or towards
+        the state closest to it for a partial answer, and the first push
+        as the positions of the crate and of the cell it goes to"""
+        start_time = time.perf_counter()
+        crates = frozenset(crates)
+        goals = self.engine.goals
+        weight = self.weight
+
+        # a state on a known solution answers without a search
+        entry = self.lookup(player, crates)
+        if entry is not None:
+            return self.answer("solved", player, crates, self.tail(entry), 0, start_time, True)
+        if goals <= crates:
+            return self.answer("solved", player, crates, [], 0, start_time)
+        if self.heuristic(crates) >= INF:
+            return self.answer("stuck", player, crates, [], 0, start_time)
+
+        table = TranspositionTable(len(self.engine.grid), self.max_memory)
+        key = table.hash(player, crates)
+        table.store(key, 0)
+        root = (player, crates, key, None, None)
+        heap = [(weight * self.heuristic(crates), 0, 0, root)]
+        seq = 0
+        nodes = 0
+        node_size = NODE_SIZE + CRATE_SIZE * len(crates)
+        best = (self.heuristic(crates), root)
+        # cheapest way found through a known state, as (moves, node, pushes left)
+        finish = None
+
+        while heap:
+            f, neg_g, _, node = heapq.heappop(heap)
+            g = -neg_g
+            # f only grows, so it bounds the length of any solution still to be found
+            if finish is not None and finish[0] <= f * SLACK:
+                break
+
+            node_player, node_crates, key, parent, push = node
+            if table.get(key, g) < g:
+                continue
+            if goals <= node_crates:
+                pushes = self.chain(node)[1]
+                self.remember(player, crates, pushes)
+                return self.answer("solved", player, crates, pushes, nodes, start_time)
+
+            # big levels expand few nodes a second, so the checks run on every one
+            nodes += 1
+            if cancelled():
+                return self.answer("cancelled", player, crates, [], nodes, start_time)
+            if (time.perf_counter() - start_time > self.time_limit
+                    or self.over_budget(table, heap, nodes, node_size) is None):
+                # the closest state found gives a direction to go in
+                return self.answer("partial", player, crates, self.chain(best[1])[1], nodes, start_time)
+
+            for cost, crate, behind in self.successors(node_player, node_crates):
+                new_g = g + cost
+                new_key = table.update(key, node_player, crate, behind)
+                if table.get(new_key, INF) <= new_g:
+                    continue
+                new_crates = node_crates.difference((crate,)).union((behind,))
+                if self.deadlocks.check(new_crates, behind):
+                    continue
+                h = self.heuristic(new_crates)
+                if h >= INF:
+                    continue
+                table.store(new_key, new_g)
+                seq += 1
+                child = (crate, new_crates, new_key, node, (crate, behind - crate))
+                if h < best[0]:
+                    best = (h, child)
+                heapq.heappush(heap, (new_g + weight * h, -new_g, seq, child))
+
+                known = self.known.get(new_crates, {}).get(crate)
+                if known is not None and (finish is None or new_g + known[0] < finish[0]):
+                    finish = (new_g + known[0], child, self.tail(known))
+
+        if finish is None:
+            return self.answer("stuck", player, crates, [], nodes, start_time)
+        pushes = self.chain(finish[1])[1] + finish[2]
+        self.remember(player, crates, pushes)
+        return self.answer("solved", player, crates, pushes, nodes, start_time, True)
+
+    def lookup(self, player, crates):
+        """the known solution of a state, from any cell its player can walk to"""
+        known = self.known.get(crates)
+        if not known:
+            return None
+        reach = self.reachable(player, crates)
+        cells = [cell for cell in known if cell in reach]
+        if not cells:
+            return None
+        return min((known[cell] for cell in cells), key=lambda entry: entry[0])
+
+    def tail(self, entry):
+        """the pushes left from a known state"""
+        return self.solutions[entry[1]][0][entry[2]:]
+
+    def remember(self, player, crates, pushes):
+        """stores every state along a solution with the pushes left from it,
+        counting the bytes it keeps against the known share of the memory"""
+        solution = self.lurd(player, crates, pushes)
+        # the player stands on the crate's old cell after each push
+        states = [(player, crates)]
+        current = set(crates)
+        for crate, step in pushes:
+            current.remove(crate)
+            current.add(crate + step)
+            states.append((crate, frozenset(current)))
+        ends = [index + 1 for index, letter in enumerate(solution) if letter.isupper()]
+        lefts = [len(solution)] + [len(solution) - end for end in ends]
+
+        number = self.solution_count
+        self.solution_count += 1
+        self.solutions[number] = [pushes, 0]
+        self.known_bytes += ENTRY_SIZE + PUSH_SIZE * len(pushes)
+        for index, (cell, state) in enumerate(states):
+            entries = self.known.get(state)
+            if entries is None:
+                entries = self.known[state] = {}
+                self.known_bytes += ENTRY_SIZE + CRATE_SIZE * len(state)
+            if cell in entries:
+                self.release(entries[cell][1])
+            else:
+                self.known_bytes += ENTRY_SIZE
+            entries[cell] = (lefts[index], number, index)
+            self.solutions[number][1] += 1
+
+        # the oldest states go first when the memory share is used up
+        while self.known_bytes > self.max_known and self.known:
+            state = next(iter(self.known))
+            entries = self.known.pop(state)
+            self.known_bytes -= ENTRY_SIZE + CRATE_SIZE * len(state) + ENTRY_SIZE * len(entries)
+            for entry in entries.values():
+                self.release(entry[1])
+
+    def release(self, number):
+        """drops a state's use of a solution, and the solution with its last"""
+        solution = self.solutions[number]
+        solution[1] -= 1
+        if solution[1] == 0:
+            del self.solutions[number]
+            self.known_bytes -= ENTRY_SIZE + PUSH_SIZE * len(solution[0])
+
+    def answer(self, status, player, crates, pushes, nodes, start_time, reused=False):
+        """the result of a search as a picklable dict"""
+        result = {"status": status, "moves": self.lurd(player, crates, pushes), "crate": None,
+                  "target": None, "pushes": len(pushes), "nodes": nodes,
+                  "time": round(time.perf_counter() - start_time, 3), "reused": reused}
+        # the first push as level positions, for drawing
+        if pushes:
+            crate, step = pushes[0]
+            result["crate"] = self.engine.pos(crate)
+            result["target"] = self.engine.pos(crate + step)
+        return result
+
+
+def start_worker(shared):
+    """initialises the hint worker process"""
+    global latest
+    latest = shared
+
+
+def hint_task(job, path, player, crates, max_memory, time_limit):
+    """runs a hint search in the worker process, reusing the search state of
+    the level from earlier hints. A request made after this one cancels it"""
+    global hinter
+    if latest.value != job:
+        return {"job": job, "status": "cancelled"}
+    if hinter is None or hinter.path != path or hinter.megabytes != max_memory:
+        hinter = Hinter(path, max_memory, time_limit)
+    hinter.time_limit = time_limit
+    result = hinter.search(player, crates, lambda: latest.value != job)
+    result["job"] = job
+    return result
+
+
+class HintEngine:
+    """runs hint searches in a worker process of its own, so the main loop
+    keeps handling events while one runs. Only the newest request counts:
+    making one cancels the search running before it"""
+    def __init__(self, max_memory=MAX_MEMORY, time_limit=TIME_LIMIT):
+        self.max_memory = max_memory
+        self.time_limit = time_limit
+        # forking a process with a display open is unsafe, start a fresh one
+        self.context = multiprocessing.get_context("spawn")
+        self.latest = self.context.Value("i", 0)
+        self.job = 0
+        self.pool = None
+
+    def request(self, callback, path, player, crates):
+        """starts searching the next push from a state of a level, the
+        result is handed to the callback by the main loop"""
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=1, mp_context=self.context,
+                                            initializer=start_worker, initargs=(self.latest,))
+        self.cancel()
+        job = self.job
+        workers.submit(self.pool, lambda result: self.done(callback, job, result),
+                       hint_task, (job, path, player, tuple(crates), self.max_memory, self.time_limit))
+
+    def done(self, callback, job, result):
+        """hands the result of the newest request to its callback, a worker
+        that died is replaced on the next request"""
+        if isinstance(result, workers.Failed) and isinstance(result.error, BrokenProcessPool):
+            self.pool = None
+        if job == self.job:
+            callback(result)
+
+    def cancel(self):
+        """stops the running search at its next check"""
+        self.job += 1
+        self.latest.value = self.job
+
+    def close(self):
+        if self.pool is not None:
+            self.cancel()
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+
+# the budget can be set before the engine is made on first use
+time_limit = TIME_LIMIT
+max_memory = MAX_MEMORY
+engine = None
+
+
+def configure(seconds=TIME_LIMIT, megabytes=MAX_MEMORY):
+    """sets the time budget and memory ceiling of hint searches"""
+    global time_limit, max_memory
+    time_limit = seconds
+    max_memory = megabytes
+
+
+def get_engine():
+    """returns the shared hint engine"""
+    global engine
+    if engine is None:
+        engine = HintEngine(max_memory, time_limit)
+    return engine
+
+
+def shutdown():
+    """stops the hint worker"""
+    global engine
+    if engine is not None:
+        engine.close()
+        engine = None
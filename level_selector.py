@@ -1,9 +1,16 @@
 # imports
 import os
+import hashlib
+import math
 import pygame
+import fonts
+import assets
+import workers
+import collection
+import levelindex
 from pygame import gfxdraw
 from pygame import font
-from game import Game
+from engine import read_xsb
 
 
 # GLOBALS
@@ -17,9 +24,16 @@ BROWN = (64, 19, 19)
 BLUE = (66, 135, 245)
 PURPLE = (255, 0, 193)
 
-# images
-bg_img = pygame.image.load("./assets/docks_bg.png")
-outline = pygame.image.load("./assets/selector_outline.png")
+# thumbnail colours of the level symbols
+PALETTE = {symbol: bytes(col) for symbol, col in
+           {" ": BROWN, "#": GREY, ".": RED, "@": BLUE, "+": PURPLE, "$": BLACK, "*": GREEN}.items()}
+
+# thumbnails are cached here between runs
+THUMBNAIL_CACHE = "./assets/cache/thumbnails/"
+# font size of the query line and the level details
+SMALL_FONT = 20
+# characters the query line accepts
+QUERY_CHARS = set("abcdefghijklmnopqrstuvwxyz0123456789<>=!:-_.# ≤≥")
 
 
 class Selector:
@@ -29,55 +43,104 @@ class Selector:
         self.current = current
         self.pagenum = pagenum
 
+        # no levels until the folder is read
+        self.pages = Pages([], {})
+        self.records = []
+        self.loading = True
+        # filter of the list, typed after pressing /
+        self.query = ""
+        self.editing = False
+
         # load up levels on creation
         self.load()
 
     def load(self):
-        """loads up the game level files from given folder"""
-        # create list of Unit objects from all level files in the folder
-        unitlist = []
-        dirlist = os.scandir(self.folder)
-        for entry in dirlist:
-            # only load xsb files
-            if entry.is_file() and entry.name.endswith(".xsb"):
-                unitlist.append(Unit(entry.path))
+        """loads up the game level files from given folder in the background,
+        their details come from the level index"""
+        workers.io(self.set_levels, levelindex.load, self.folder)
+
+    def set_levels(self, records):
+        """makes the pages of the level files once the folder is read"""
+        # a folder that can't be read lists no levels
+        if isinstance(records, workers.Failed):
+            records = []
+        self.records = records
+        self.loading = False
+        self.apply()
+
+    def apply(self):
+        """lists the levels the query lets through, in the query's order"""
+        records = levelindex.query(self.records, self.query)
+        # entries of an earlier load are reused so nothing is generated twice
+        units = self.pages.units
+        for unit in units.values():
+            unit.selected = False
 
         # separate the list into pages for easier display
-        pages = []
-        for i in range(len(unitlist) // 6 + 1):
-            page = []
-            for j in range(6):
-                try:
-                    page.append(unitlist[i * 6 + j])
-                except IndexError:
-                    break
-            pages.append(page)
+        pages = Pages([record["path"] for record in records], units,
+                      {record["path"]: details(record) for record in records})
         self.pages = pages
 
+        # the list may have shrunk since the last load
+        self.pagenum = min(self.pagenum, len(pages) - 1)
+        self.current = max(0, min(self.current, len(pages[self.pagenum]) - 1))
+
     def draw(self, window):
         """draws the screen"""
         # set background
-        window.blit(bg_img, (0, 0))
+        window.blit(assets.image("docks_bg"), (0, 0))
 
         # create foreground
         fg = pygame.Surface((600, 600))
         fg.fill(BLACK)
 
+        # placeholder until the level folder is read
+        if self.loading:
+            text = fonts.render("Loading levels...", WHITE)
+            fg.blit(text, (20, 20))
+        elif not self.pages.paths:
+            text = fonts.render("No levels match", WHITE)
+            fg.blit(text, (20, 20))
+
         # draw each level file entry of the page
         for index, unit in enumerate(self.pages[self.pagenum]):
-            # entry surface needs to be regenerated for display
-            unit.surface_generator()
+            # entry surfaces are only generated for the page on display
+            fg.blit(unit.get_surface(), (0, index*100))
             # mark selected entry w/ black and yellow outline
             if index == self.current:
-                unit.surface.blit(outline, (0, 0))
-            fg.blit(unit.surface, (0, index*100))
+                fg.blit(assets.image("selector_outline"), (0, index*100))
 
         # draw foreground to window
         window.blit(fg, (60, 60))
 
+        # query line above the list
+        if self.editing or self.query:
+            line = "/" + self.query + ("_" if self.editing else "")
+        else:
+            line = "/ to filter, e.g. crates<=5 unsolved sort:size"
+        text = fonts.render(line, WHITE if self.editing or self.query else GREY, SMALL_FONT)
+        window.fill(BLACK, pygame.Rect(60, 20, 600, text.get_height() + 10))
+        window.blit(text, (70, 25))
+
+    def key_press(self, event):
+        """deal with typing the query, the list follows when it is applied
+        with enter"""
+        if event.key == pygame.K_RETURN:
+            self.editing = False
+            self.current = 0
+            self.pagenum = 0
+            self.apply()
+        elif event.key == pygame.K_BACKSPACE:
+            self.query = self.query[:-1]
+        elif event.unicode and event.unicode.lower() in QUERY_CHARS:
+            self.query += event.unicode.lower()
 
     def move(self, direction):
         """move the selection up/down"""
+        # nothing to move between while the levels are loading
+        if not self.pages.paths:
+            return
+
         # direction parameter: +1 -> down, -1 -> up
         to = self.current + direction
 
@@ -103,25 +166,100 @@ class Selector:
         self.current = to
 
     def select(self):
-        """confirm level selection and return the selected level file"""
+        """confirm level selection and return the selected level file,
+        None while the levels are loading"""
+        if not self.pages.paths:
+            return None
         # first unselect everything
-        for page in self.pages:
-            for unit in page:
-                unit.selected = False
+        for unit in self.pages.units.values():
+            unit.selected = False
         # then set selected flag of the entry for display purposes
         self.pages[self.pagenum][self.current].selected = True
         # return the selected level file
         return self.pages[self.pagenum][self.current]
 
+class Pages:
+    """the list of levels split into pages of 6 entries, the entries are
+    only made for the pages that are looked at, so even collections of tens
+    of thousands of levels page instantly"""
+    def __init__(self, paths, units, info=None):
+        self.paths = paths
+        # entries made so far by level path
+        self.units = units
+        # detail line of each entry by level path
+        self.info = info or {}
+
+    def __len__(self):
+        # one empty page while there are no levels, never an empty last page
+        return max(1, math.ceil(len(self.paths) / 6))
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        page = []
+        for path in self.paths[index * 6:index * 6 + 6]:
+            unit = self.units.get(path)
+            if unit is None:
+                unit = Unit(path)
+                self.units[path] = unit
+            unit.set_details(self.info.get(path, ""))
+            page.append(unit)
+        return page
+
+
 class Unit:
     """a menu entry for the level selector"""
     def __init__(self, file, selected=False):
         self.file = file
         self.selected = selected
 
-        # generate thumbnail and entry surface on creation
-        self.thumbnail_generator()
-        self.surface_generator()
+        # thumbnail and entry surface are generated when first displayed
+        self.thumb = None
+        self.requested = False
+        self.surface = None
+        self.details = ""
+
+    def set_details(self, text):
+        """sets the detail line, the surface is remade when it changed"""
+        if text != self.details:
+            self.details = text
+            self.surface = None
+
+    def get_surface(self):
+        """returns the entry surface, regenerating it only when needed"""
+        if self.thumb is None and not self.requested:
+            # the thumbnail arrives from the background workers
+            self.requested = True
+            workers.io(self.thumbnail_loaded, load_cached_thumbnail, self.file)
+        if self.surface is None or self.surface_selected != self.selected or self.surface_thumb is not self.thumb:
+            self.surface_generator()
+        return self.surface
+
+    def thumbnail_loaded(self, result):
+        """gets the thumbnail from the disk cache, or has the level read
+        to generate it when it isn't cached"""
+        # a level that can't be read keeps the blank thumbnail
+        if isinstance(result, workers.Failed):
+            return
+        self.cached, thumb = result
+        # loaded off the main loop, converted here where the display is safe to use
+        self.thumb = thumb and assets.convert(thumb)
+        if self.thumb is None:
+            workers.io(self.level_read, read_xsb, self.file)
+
+    def level_read(self, level):
+        """has the thumbnail of the read level rendered in a worker process"""
+        if not isinstance(level, workers.Failed):
+            workers.cpu(self.thumbnail_rendered, render_thumbnail, level)
+
+    def thumbnail_rendered(self, pixels):
+        """shows the rendered thumbnail and caches it on disk"""
+        if isinstance(pixels, workers.Failed):
+            return
+        self.thumb = assets.convert(thumbnail_surface(pixels))
+        workers.io(None, save_thumbnail, self.thumb, self.cached)
 
     def surface_generator(self):
         """generates complete menu entry surface"""
@@ -129,58 +267,88 @@ class Unit:
         # the selected entry gets blue background
         bg = BLUE if self.selected else BLACK
         surf.fill(bg)
-        # thumbnail on right edge
-        surf.blit(self.thumb, (500, 0))
+        # thumbnail on right edge, a blank one while it is loading
+        if self.thumb is not None:
+            surf.blit(self.thumb, (500, 0))
+        else:
+            surf.fill(BROWN, pygame.Rect(500, 0, 100, 100))
         pygame.gfxdraw.rectangle(surf, pygame.Rect(0, 0, 600, 100), WHITE)
 
         # level file name on left side
-        font = pygame.font.SysFont('3ds', 32)
-        text = font.render(self.file.split("/")[-1], True, WHITE)
+        text = fonts.render(collection.level_name(self.file), WHITE)
         surf.blit(text, (20, 20))
+        # size, crates and best score below it
+        text = fonts.render(self.details, WHITE, SMALL_FONT)
+        surf.blit(text, (20, 60))
 
         self.surface = surf
+        self.surface_selected = self.selected
+        self.surface_thumb = self.thumb
 
-    def thumbnail_generator(self):
-        """generates a preview thumbnail of a level as a surface"""
-        # create surface 100x100px thumbnail for 20x20 level at 5:1 scale
-        thumb = pygame.Surface((100, 100))
-        # set background
-        thumb.fill(BROWN)
-
-        # read the level file
-        level = Game.read_xsb(self, self.file)
-
-        # determine level size
-        w = max([len(i) for i in level])
-        h = len(level)
-
-        # check if the level is within the 20x20 level size limit
-        # beacause every level runs through this we don't need to check elsewhere
-        if w > 20 or h > 20:
-            raise Exception("Level at {} is too large.".format(self.file))
-
-        # position the playing field in middle of thumbnail
-        left = (20 - w) // 2
-        top = (20 - h) // 2
-
-        # draw the thumbnail
-        for y, row in enumerate(level):
-            for x, symbol in enumerate(row):
-                col = None
-                if symbol == "#":
-                    col = GREY
-                elif symbol == ".":
-                    col = RED
-                elif symbol == "@":
-                    col = BLUE
-                elif symbol == "+":
-                    col = PURPLE
-                elif symbol == "$":
-                    col = BLACK
-                elif symbol == "*":
-                    col = GREEN
-
-                if col != None:
-                    pygame.gfxdraw.box(thumb, pygame.Rect((left + x)*5, (top + y)*5, 5, 5), col)
-
-        self.thumb = thumb
+
+def render_thumbnail(level):
+    """draws the 100x100 preview thumbnail of a parsed level, returns its
+    RGB bytes, so it can run in a worker process"""
+    # create surface 100x100px thumbnail
+    thumb = pygame.Surface((100, 100))
+    # set background
+    thumb.fill(BROWN)
+
+    # determine level size
+    w = max([len(i) for i in level])
+    h = len(level)
+
+    # one pixel per cell, built from the bytes of the rows at once
+    pixels = b"".join(b"".join(PALETTE.get(symbol, PALETTE[" "]) for symbol in row)
+                      + PALETTE[" "] * (w - len(row)) for row in level)
+    small = pygame.image.frombuffer(pixels, (w, h), "RGB")
+
+    # scale it up 5:1, or down to fit the thumbnail for levels over 20x20
+    scale = min(5, 100 / max(w, h))
+    size = (max(1, int(w * scale)), max(1, int(h * scale)))
+    if scale >= 1:
+        small = pygame.transform.scale(small, size)
+    else:
+        small = pygame.transform.smoothscale(small, size)
+
+    # position the playing field in middle of thumbnail
+    thumb.blit(small, ((100 - size[0]) // 2, (100 - size[1]) // 2))
+    return pygame.image.tobytes(thumb, "RGB")
+
+
+def thumbnail_surface(pixels):
+    """the thumbnail surface of rendered RGB bytes"""
+    return pygame.image.frombuffer(pixels, (100, 100), "RGB")
+
+
+def details(record):
+    """detail line of a level entry from its index record"""
+    text = "{}x{}, {} crates".format(record["width"], record["height"], record["crates"])
+    if record["solution"] is not None:
+        text += ", solution {}".format(record["solution"])
+    if record["best"] is not None:
+        text += ", best {}".format(record["best"])
+    return text
+
+
+def load_cached_thumbnail(file):
+    """looks up the thumbnail of a level file in the disk cache, keyed by file
+    path, modification time and size, returns (cache file, surface or None)"""
+    # levels of a collection are keyed by the collection file
+    stat = os.stat(collection.split_ref(file)[0])
+    key = "{}|{}|{}".format(os.path.abspath(file), stat.st_mtime_ns, stat.st_size)
+    cached = THUMBNAIL_CACHE + hashlib.sha1(key.encode()).hexdigest() + ".png"
+    try:
+        return cached, pygame.image.load(cached)
+    except (FileNotFoundError, pygame.error):
+        return cached, None
+
+
+def save_thumbnail(thumb, cached):
+    """writes a thumbnail to the disk cache"""
+    try:
+        os.makedirs(THUMBNAIL_CACHE, exist_ok=True)
+        pygame.image.save(thumb, cached)
+    except (OSError, pygame.error):
+        # the cache is only an optimisation
+        pass
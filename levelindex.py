@@ -0,0 +1,205 @@
+# imports
+import argparse
+import json
+import os
+import re
+import threading
+import client
+import collection
+import scores
+from canonical import level_hash
+from engine import read_xsb, list_levels
+from batch import read_records
+
+
+# GLOBALS
+INDEX = "./assets/cache/levels.json"
+# format of the records, raised whenever what they hold changes (version 2
+# hashes levels with canonical.level_hash), an index of another version is
+# built again from the level files
+VERSION = 2
+# solver and generator results in the level folder are read for solution lengths
+RESULTS = ("generated.jsonl", "solutions.jsonl")
+# numeric fields a query can filter and sort on
+FIELDS = ("width", "height", "size", "crates", "goals", "solution", "best")
+# filter operators, the unicode ones are accepted too
+OPERATORS = {"<=": lambda a, b: a <= b, ">=": lambda a, b: a >= b, "<": lambda a, b: a < b,
+             ">": lambda a, b: a > b, "=": lambda a, b: a == b, "!=": lambda a, b: a != b}
+TERM = re.compile(r"^(\w+)(<=|>=|!=|<|>|=)(\d+)$")
+
+
+def stamp(path):
+    """modification time and size of a level's file, the collection file for
+    the levels of a collection"""
+    stat = os.stat(collection.split_ref(path)[0])
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def describe(path):
+    """the metadata of a level, read from its symbols without making an engine"""
+    rows = ["".join(row).rstrip() for row in read_xsb(path)]
+    while rows and not rows[-1]:
+        rows.pop()
+    text = "".join(rows)
+    width = max((len(row) for row in rows), default=0)
+    return {"name": collection.level_name(path), "width": width, "height": len(rows),
+            "size": width * len(rows), "crates": text.count("$") + text.count("*"),
+            "goals": text.count(".") + text.count("+") + text.count("*"),
+            "hash": level_hash(rows), "solution": None}
+
+
+class LevelIndex:
+    """metadata of every level of a folder, kept in a JSON file and brought
+    up to date incrementally: a level is only parsed again when its file
+    changed, and the best scores are read from the highscore store in one
+    query, so sorting and filtering never touch the level files"""
+    def __init__(self, path=INDEX):
+        self.path = path
+        try:
+            with open(path, "rt") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = None
+        if isinstance(saved, dict) and saved.get("version") == VERSION:
+            self.records = saved["levels"]
+        else:
+            self.records = {}
+
+    def refresh(self, folder):
+        """updates the records of a folder's levels, returns them in folder order"""
+        paths = list_levels(folder)
+        changed = False
+        # with a highscore server the scores are all on the server
+        store = None if client.get_client() is not None else scores.get_store()
+        for path in paths:
+            record = self.records.get(path)
+            current = stamp(path)
+            if record is None or record["stamp"] != current:
+                record = describe(path)
+                record["stamp"] = current
+                self.records[path] = record
+                changed = True
+                # old text highscores count once the level is known
+                if store is not None:
+                    store.import_txt(scores.legacy_file(path), scores.level_key(path))
+
+        # levels of the folder that are no longer listed are dropped, files
+        # that are gone and the last levels of a collection that shrank
+        listed = set(paths)
+        folder_path = os.path.normpath(folder)
+        for path in [path for path in self.records if path not in listed
+                     and os.path.dirname(os.path.normpath(collection.split_ref(path)[0])) == folder_path]:
+            del self.records[path]
+            changed = True
+
+        # solution lengths found by the solver or the generator
+        normalised = {os.path.normpath(path): path for path in paths}
+        for name in RESULTS:
+            for result in read_records(os.path.join(folder, name)):
+                record = self.records.get(normalised.get(os.path.normpath(str(result.get("level")))))
+                moves = result.get("moves") if result.get("solution") else None
+                if record is not None and moves and (record["solution"] is None or moves < record["solution"]):
+                    record["solution"] = moves
+                    changed = True
+
+        # scores change without the level files changing, so they are always
+        # read, no level has a best score while the server can't be reached
+        best = best_scores(store) or {}
+        records = []
+        for path in paths:
+            record = self.records[path]
+            record["path"] = path
+            record["best"] = best.get(scores.level_key(path))
+            records.append(record)
+
+        if changed:
+            self.save()
+        return records
+
+    def save(self):
+        """writes the index, it only replaces the old one once complete"""
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary = self.path + ".tmp"
+        with open(temporary, "wt") as f:
+            json.dump({"version": VERSION, "levels": self.records}, f)
+        os.replace(temporary, self.path)
+
+
+def best_scores(store):
+    """the best score of every level by level name, from the highscore
+    server when there is one. None when the server can't be reached, the
+    local store doesn't hold the player's scores then"""
+    if store is None:
+        return client.get_client().best_scores()
+    return store.best_scores()
+
+
+def query(records, text):
+    """filters, searches and sorts records by a query like
+    'crates<=5 unsolved sort:size': field comparisons, 'solved' and
+    'unsolved', 'sort:field' ('sort:-field' for descending) and words
+    searched for in the level names"""
+    text = text.replace("≤", "<=").replace("≥", ">=").replace("≠", "!=")
+    tests = []
+    words = []
+    order = None
+    for term in text.lower().replace(",", " ").split():
+        match = TERM.match(term)
+        if match and match.group(1) in FIELDS:
+            field, operator, value = match.groups()
+            tests.append(lambda record, field=field, compare=OPERATORS[operator], value=int(value):
+                         record[field] is not None and compare(record[field], value))
+        elif term == "solved":
+            tests.append(lambda record: record["best"] is not None)
+        elif term == "unsolved":
+            tests.append(lambda record: record["best"] is None)
+        elif term.startswith("sort:"):
+            order = term[5:]
+        else:
+            words.append(term)
+
+    result = [record for record in records if all(test(record) for test in tests)
+              and all(word in record["name"].lower() for word in words)]
+
+    if order:
+        reverse = order.startswith("-")
+        field = order.lstrip("-")
+        if field in FIELDS:
+            # levels without the value go last either way
+            result.sort(key=lambda record: record[field] is None)
+            present = [record for record in result if record[field] is not None]
+            present.sort(key=lambda record: record[field], reverse=reverse)
+            result = present + result[len(present):]
+        elif field == "name":
+            result.sort(key=lambda record: record["name"].lower(), reverse=reverse)
+    return result
+
+
+# the index is read on first use, loads from background workers take turns
+index = None
+lock = threading.Lock()
+
+
+def load(folder):
+    """records of a folder's levels from the shared index, brought up to date"""
+    global index
+    with lock:
+        if index is None:
+            index = LevelIndex()
+        return index.refresh(folder)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="build the level index and query it")
+    parser.add_argument("folder", nargs="?", default="./assets/levels/", help="folder of levels")
+    parser.add_argument("query", nargs="?", default="", help="for example 'crates<=5 unsolved sort:size'")
+    args = parser.parse_args()
+    for record in query(load(args.folder), args.query):
+        print("{:<30} {:>3}x{:<3} crates={:<3} solution={} best={}".format(
+            record["name"], record["width"], record["height"], record["crates"],
+            record["solution"] or "-", record["best"] or "-"))
+
+
+if __name__ == '__main__':
+    main()
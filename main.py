@@ -1,6 +1,12 @@
 # imports
 import os
+import argparse
 import pygame
+import fonts
+import workers
+import profiling
+import client
+import hint
 from menu import Menu
 from game import Game
 from level_selector import Selector
@@ -17,6 +23,13 @@ class App:
         self.selector = selector
         self.register = register
 
+        # the screen object drawn last
+        self.drawn = None
+        # mouse cursor shown, a hand over tiles a click would move to
+        self.cursor = pygame.SYSTEM_CURSOR_ARROW
+        # stage timings, off unless profiling was asked for
+        self.profiler = profiling.Profiler()
+
     def pygame_init(self):
         """initialisation and window setup"""
         # set window position
@@ -27,9 +40,23 @@ class App:
         pygame.display.set_caption('Sokoban')
 
     def draw(self):
-        """draws the current screen"""
+        """draws the current screen, returns the changed rects
+        or None if the whole screen changed"""
         # each class has a standard draw method that draws the corresponding screen
-        [self.menu, self.game, self.register, self.selector, self.highscores][self.mode].draw(self.window)
+        screen = [self.menu, self.game, self.register, self.selector, self.highscores][self.mode]
+        # the game only redraws changed tiles, unless another screen was on top
+        if screen is self.game and self.drawn is not self.game:
+            self.game.redraw = True
+        self.drawn = screen
+        with self.profiler.stage("draw/" + type(screen).__name__.lower()):
+            rects = screen.draw(self.window)
+
+        # the timings go below the game's moves counter
+        if self.profiler.enabled:
+            rect = self.profiler.draw(self.window, fonts.cache.font().get_height())
+            if rects is not None:
+                rects.append(rect)
+        return rects
 
 
 class Mode:
@@ -41,10 +68,161 @@ class Mode:
     highscores = 4  # display highscores for loaded level
 
 
-def main():
+def key_press(app, event):
+    """keyboard interaction"""
+    # ESC returns to main menu from any part of the program,
+    # or stops typing the level selector's query
+    if event.key == pygame.K_ESCAPE:
+        if app.mode == Mode.selector and app.selector.editing:
+            app.selector.editing = False
+            return
+        app.mode = Mode.menu
+
+    # keyboard interaction in game mode
+    if app.mode == Mode.game:
+        # player movement with arrows or WASD
+        direction = None
+        if event.key == pygame.K_LEFT or event.key == pygame.K_a:
+            direction = (-1, 0)
+        elif event.key == pygame.K_RIGHT or event.key == pygame.K_d:
+            direction = (1, 0)
+        elif event.key == pygame.K_UP or event.key == pygame.K_w:
+            direction = (0, -1)
+        elif event.key == pygame.K_DOWN or event.key == pygame.K_s:
+            direction = (0, 1)
+
+        if direction is not None:
+            app.game.validate_and_move(direction)
+            check_finished(app)
+        # R resets the level
+        elif event.key == pygame.K_r:
+            app.game.restart()
+        # U takes back a move, Y makes it again
+        elif event.key == pygame.K_u:
+            app.game.undo()
+        elif event.key == pygame.K_y:
+            app.game.redo()
+        # + and - change the zoom level
+        elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+            app.game.zoom(+1)
+        elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+            app.game.zoom(-1)
+        # H searches the next push in the background
+        elif event.key == pygame.K_h:
+            app.game.request_hint()
+
+    # keyboard interaction in menu mode
+    elif app.mode == Mode.menu:
+        # option selection with arrows or WASD
+        if event.key == pygame.K_UP or event.key == pygame.K_w:
+            app.menu.move(-1)
+        elif event.key == pygame.K_DOWN or event.key == pygame.K_s:
+            app.menu.move(+1)
+        # confirm selection with space or enter
+        elif event.key == pygame.K_SPACE or event.key == pygame.K_RETURN:
+            if app.menu.current == 0 and app.menu.loaded:
+                app.mode = Mode.game
+            elif app.menu.current == 1 and app.menu.loaded:
+                app.mode = Mode.highscores
+            elif app.menu.current == 2:
+                app.mode = Mode.selector
+
+    # keyboard interaction in level selector mode
+    elif app.mode == Mode.selector:
+        # the keys type the query while it is edited
+        if app.selector.editing:
+            app.selector.key_press(event)
+        # / starts typing a query that filters and sorts the levels
+        elif event.key in (pygame.K_SLASH, pygame.K_KP_DIVIDE):
+            app.selector.editing = True
+        # level selection with arrows or WASD
+        elif event.key == pygame.K_UP or event.key == pygame.K_w:
+            app.selector.move(-1)
+        elif event.key == pygame.K_DOWN or event.key == pygame.K_s:
+            app.selector.move(+1)
+        # confirm selection with space or enter
+        elif event.key == pygame.K_SPACE or event.key == pygame.K_RETURN:
+            # call a method of selector that returns the selected level
+            # then create new game and highscores instance with that
+            level = app.selector.select()
+            if level is not None:
+                app.game = Game(level.file)
+                app.highscores = Highscores(level.file)
+                app.menu.loaded = True
+
+    #keyboard interaction in new highscore register mode
+    elif app.mode == Mode.register:
+        # returns True when name is submitted
+        if app.register.key_press(event):
+            # display the highscores
+            app.highscores.find_top()
+            app.mode = Mode.highscores
+
+
+def mouse_event(app, event):
+    """mouse interaction, clicks walk the player and dragging a crate
+    pushes it, returns whether the screen changed"""
+    if event.type == pygame.MOUSEMOTION:
+        # show what a click would do, the reachable area is cached per position
+        active = app.mode == Mode.game and app.game.hover(event.pos)
+        set_cursor(app, pygame.SYSTEM_CURSOR_HAND if active else pygame.SYSTEM_CURSOR_ARROW)
+        return False
+    if app.mode != Mode.game or event.button != 1:
+        return False
+
+    if event.type == pygame.MOUSEBUTTONDOWN:
+        app.game.click(event.pos)
+    else:
+        app.game.release(event.pos)
+    check_finished(app)
+    return True
+
+
+def set_cursor(app, cursor):
+    """changes the mouse cursor when it is a different one"""
+    if cursor != app.cursor:
+        app.cursor = cursor
+        try:
+            pygame.mouse.set_cursor(cursor)
+        except pygame.error:
+            # not every video driver has system cursors
+            pass
+
+
+def check_finished(app):
+    """records a new highscore if the last move finished the level"""
+    if app.game.finished:
+        app.register = Register(app.game.path, app.game.counter, app.game.engine.lurd)
+        app.mode = Mode.register
+        # unload the level
+        app.game = None
+        app.menu.loaded = False
+        app.selector.load()
+
+
+def main(batch=True, fps=None, repeat_delay=0, repeat_interval=0, profile=None, trace=profiling.TRACE_FILE,
+         server=client.address, hint_time=hint.TIME_LIMIT, hint_memory=hint.MAX_MEMORY):
+    """runs the program
+    batch: handle every queued event before rendering once, instead of
+    rendering after each key
+    fps: upper limit of renders per second, None for no limit
+    repeat_delay, repeat_interval: key repeat of held keys in ms, 0 is off
+    profile: None, or one of profiling.MODES to time the stages of the loop
+    trace: file the stage timings are written to on exit
+    server: "host:port" of a highscore server to share scores through,
+    None keeps them in the local store
+    hint_time, hint_memory: seconds and megabytes a hint search may use"""
+    client.configure(server)
+    hint.configure(hint_time, hint_memory)
     # create App instance in menu mode and make pygame window
     app = App(Mode.menu)
+    app.profiler = profiling.Profiler(profile, trace)
+    profiler = app.profiler
+    profiler.start()
     app.pygame_init()
+    # held keys (arrows and WASD included) repeat after the delay
+    pygame.key.set_repeat(repeat_delay, repeat_interval)
+    clock = pygame.time.Clock()
 
     # assign menu and level selector objects
     app.menu = Menu(["Continue", "Highscores", "Load"])
@@ -58,90 +236,64 @@ def main():
     # main loop for user interaction
     done = False
     while not done:
-        # event listener
-        event = pygame.event.wait()
-        # shut down program when window is closed
-        if event.type == pygame.QUIT:
-            done = True
-        # keyboard interaction TODO? move everything to class methods
-        elif event.type == pygame.KEYDOWN:
-            # ESC returns to main menu from any part of the program
-            if event.key == pygame.K_ESCAPE:
-                app.mode = Mode.menu
-
-            # keyboard interaction in game mode
-            if app.mode == Mode.game:
-                # player movement with arrows or WASD
-                direction = None
-                if event.key == pygame.K_LEFT or event.key == pygame.K_a:
-                    direction = (-1, 0)
-                elif event.key == pygame.K_RIGHT or event.key == pygame.K_d:
-                    direction = (1, 0)
-                elif event.key == pygame.K_UP or event.key == pygame.K_w:
-                    direction = (0, -1)
-                elif event.key == pygame.K_DOWN or event.key == pygame.K_s:
-                    direction = (0, 1)
-
-                if direction is not None:
-                    app.game.validate_and_move(direction)
-                    # if this was the finishing move, record new highscore
-                    if app.game.finished:
-                        app.register = Register(app.game.path, app.game.counter)
-                        app.mode = Mode.register
-                        # unload the level
-                        app.game = None
-                        app.menu.loaded = False
-                        app.selector.load()
-                # R resets the level
-                elif event.key == pygame.K_r:
-                    app.game.load()
-
-            # keyboard interaction in menu mode
-            elif app.mode == Mode.menu:
-                # option selection with arrows or WASD
-                if event.key == pygame.K_UP or event.key == pygame.K_w:
-                    app.menu.move(-1)
-                elif event.key == pygame.K_DOWN or event.key == pygame.K_s:
-                    app.menu.move(+1)
-                # confirm selection with space or enter
-                elif event.key == pygame.K_SPACE or event.key == pygame.K_RETURN:
-                    if app.menu.current == 0 and app.menu.loaded:
-                        app.mode = Mode.game
-                    elif app.menu.current == 1 and app.menu.loaded:
-                        app.mode = Mode.highscores
-                    elif app.menu.current == 2:
-                        app.mode = Mode.selector
-
-            # keyboard interaction in level selector mode
-            elif app.mode == Mode.selector:
-                # level selection with arrows or WASD
-                if event.key == pygame.K_UP or event.key == pygame.K_w:
-                    app.selector.move(-1)
-                elif event.key == pygame.K_DOWN or event.key == pygame.K_s:
-                    app.selector.move(+1)
-                # confirm selection with space or enter
-                elif event.key == pygame.K_SPACE or event.key == pygame.K_RETURN:
-                    # call a method of selector that returns the selected level
-                    # then create new game and highscores instance with that
-                    level = app.selector.select()
-                    app.game = Game(level.file)
-                    app.highscores = Highscores(level.file)
-                    app.menu.loaded = True
-
-            #keyboard interaction in new highscore register mode
-            elif app.mode == Mode.register:
-                # returns True when name is submitted
-                if app.register.key_press(event):
-                    # display the highscores
-                    app.highscores.find_top()
-                    app.mode = Mode.highscores
-
-            # update the screen on every keypress
-            app.draw()
-            pygame.display.update()
+        # event listener, waits for one event then takes all that queued up
+        with profiler.stage("wait"):
+            events = [pygame.event.wait()]
+            if batch:
+                events += pygame.event.get()
+
+        changed = False
+        with profiler.stage("logic"):
+            for event in events:
+                # shut down program when window is closed
+                if event.type == pygame.QUIT:
+                    done = True
+                    break
+                # a background task finished, hand its result to the screen that asked
+                elif event.type == workers.TASK_DONE:
+                    workers.handle(event)
+                    changed = True
+                # keyboard interaction
+                elif event.type == pygame.KEYDOWN:
+                    key_press(app, event)
+                    changed = True
+                # mouse interaction
+                elif event.type in (pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+                    changed = mouse_event(app, event) or changed
+
+        # update the changed parts of the screen once per batch
+        if changed and not done:
+            rects = app.draw()
+            with profiler.stage("update"):
+                pygame.display.update(rects)
+            if fps:
+                clock.tick(fps)
 
+    # let pending highscore writes finish
+    workers.shutdown()
+    client.shutdown()
+    hint.shutdown()
+    profiler.stop()
     pygame.quit()
 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description="Sokoban")
+    parser.add_argument("--no-batch", action="store_true", help="render after every event instead of once per batch")
+    parser.add_argument("--fps", type=int, default=None, help="frame rate cap")
+    parser.add_argument("--repeat-delay", type=int, default=0, help="ms before a held key repeats, 0 is off")
+    parser.add_argument("--repeat-interval", type=int, default=50, help="ms between repeats of a held key")
+    parser.add_argument("--profile", choices=profiling.MODES, default=profiling.from_environment(),
+                        help="time the stages of the main loop, optionally under cProfile or a sampling profiler "
+                             "(also set by the {} environment variable)".format(profiling.ENV_VAR))
+    parser.add_argument("--trace", default=profiling.TRACE_FILE, help="file the stage timings are written to on exit")
+    parser.add_argument("--server", default=client.address, metavar="HOST:PORT",
+                        help="highscore server to share scores with (also set by the {} environment variable)"
+                        .format(client.ENV_VAR))
+    parser.add_argument("--hint-time", type=float, default=hint.TIME_LIMIT,
+                        help="seconds a hint search may take before it shows its best guess")
+    parser.add_argument("--hint-memory", type=float, default=hint.MAX_MEMORY,
+                        help="megabytes the hint search may use")
+    args = parser.parse_args()
+    main(not args.no_batch, args.fps, args.repeat_delay, args.repeat_interval, args.profile, args.trace, args.server,
+         args.hint_time, args.hint_memory)
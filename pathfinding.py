@@ -0,0 +1,163 @@
+# imports
+import time
+from engine import WALL, LETTERS
+
+
+# GLOBALS
+# seconds a push search may take, about one frame
+BUDGET = 0.015
+
+
+class Navigator:
+    """plans the moves for mouse navigation: shortest walks over the region
+    the player can reach, and push sequences that take one crate to a cell
+
+    sets of cells are python integers with one bit per grid index, so one
+    breadth first search step grows the whole frontier at once with shifts
+    and masks instead of visiting the cells one by one"""
+    def __init__(self, engine):
+        self.engine = engine
+        self.width = engine.width
+        # bits of the cells that aren't wall
+        self.floor = int("".join("0" if cell == WALL else "1" for cell in reversed(engine.grid)), 2)
+        self.steps = [(vector, engine.offsets[vector]) for vector in LETTERS]
+
+        # search of the current state, reused until a move changes it
+        self.key = None
+        self.layers = None
+        self.region = 0
+
+    def crate_mask(self, crates):
+        mask = 0
+        for crate in crates:
+            mask |= 1 << crate
+        return mask
+
+    def search(self, start, free):
+        """breadth first search from a cell over the free cells, returns the
+        frontiers (layer d holds the cells d steps away) and their union"""
+        width = self.width
+        frontier = seen = 1 << start
+        layers = [frontier]
+        while True:
+            frontier = (frontier << 1 | frontier >> 1 | frontier << width | frontier >> width) & free & ~seen
+            if not frontier:
+                return layers, seen
+            seen |= frontier
+            layers.append(frontier)
+
+    def reach(self):
+        """the search from the player in the current state, made once per state"""
+        engine = self.engine
+        crates = self.crate_mask(engine.crates)
+        key = (engine.player, crates)
+        if key != self.key:
+            self.key = key
+            self.layers, self.region = self.search(engine.player, self.floor & ~crates)
+        return self.layers, self.region
+
+    def reachable(self, index):
+        """whether the player can walk to a cell without pushing"""
+        return bool(self.reach()[1] >> index & 1)
+
+    def path(self, layers, target):
+        """the walk to a cell found by search(), as direction vectors"""
+        distance = next((d for d, layer in enumerate(layers) if layer >> target & 1), None)
+        if distance is None:
+            return None
+        moves = []
+        cell = target
+        # step back through the layers, any neighbour one step closer will do
+        for d in range(distance, 0, -1):
+            previous = layers[d - 1]
+            for vector, step in self.steps:
+                if previous >> (cell - step) & 1:
+                    moves.append(vector)
+                    cell -= step
+                    break
+        moves.reverse()
+        return moves
+
+    def walk_to(self, index):
+        """shortest walk to a cell, None if it can't be reached without pushing"""
+        return self.path(self.reach()[0], index)
+
+    def push_to(self, crate, target, budget=BUDGET):
+        """moves that push a crate to a target cell with the fewest pushes,
+        the other crates stay where they are. None if there is no way or
+        the search ran out of its time budget"""
+        engine = self.engine
+        if crate not in engine.crates:
+            return None
+        if crate == target:
+            return []
+        deadline = time.perf_counter() + budget
+        dead = engine.deadlocks.dead
+        others = self.crate_mask(engine.crates) & ~(1 << crate)
+        free = self.floor & ~others
+
+        # regions of the player for each crate cell, a cell can split the
+        # level into several regions
+        regions = {}
+
+        def region(cell, player):
+            for mask in regions.setdefault(cell, []):
+                if mask >> player & 1:
+                    return mask
+            mask = self.search(player, free & ~(1 << cell))[1]
+            regions[cell].append(mask)
+            return mask
+
+        # breadth first over pushes, a node is a crate cell and the cell the
+        # player stands on, and the same node may be reached with any player
+        # cell of the same region
+        start = (crate, engine.player)
+        parents = {(crate, region(crate, engine.player)): None}
+        queue = [start]
+        found = None
+        while queue and found is None:
+            if time.perf_counter() > deadline:
+                return None
+            next_queue = []
+            for node in queue:
+                cell, player = node
+                mask = region(cell, player)
+                for vector, step in self.steps:
+                    stand = cell - step
+                    to = cell + step
+                    if not mask >> stand & 1 or not free >> to & 1:
+                        continue
+                    # dead cells can't be left again, unless they are where the crate should go
+                    if dead[to] and to != target:
+                        continue
+                    key = (to, region(to, cell))
+                    if key in parents:
+                        continue
+                    parents[key] = (node, vector, stand)
+                    if to == target:
+                        found = key
+                        break
+                    next_queue.append((to, cell))
+                if found is not None:
+                    break
+            queue = next_queue
+        if found is None:
+            return None
+
+        # the pushes from the start, then the walks between them
+        pushes = []
+        key = found
+        while parents[key] is not None:
+            node, vector, stand = parents[key]
+            pushes.append((node[0], vector, stand))
+            key = (node[0], region(*node))
+        pushes.reverse()
+
+        moves = []
+        player = engine.player
+        for cell, vector, stand in pushes:
+            layers = self.search(player, free & ~(1 << cell))[0]
+            moves += self.path(layers, stand)
+            moves.append(vector)
+            player = cell
+        return moves
@@ -0,0 +1,189 @@
+# imports
+import bisect
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import deque, Counter
+from contextlib import nullcontext
+import pygame
+import fonts
+
+
+# GLOBALS
+# environment variable that switches profiling on without the command line
+ENV_VAR = "SOKOBAN_PROFILE"
+MODES = ("stages", "cprofile", "sample")
+TRACE_FILE = "./sokoban-trace.json"
+# samples kept by each rolling histogram
+SAMPLES = 600
+# upper bounds of the histogram buckets in ms, the last one catches the rest
+BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 33, 66, float("inf"))
+# trace events kept for the trace file
+TRACE_EVENTS = 100000
+# interval of the sampling profiler in seconds
+SAMPLE_INTERVAL = 0.005
+# colours of the overlay
+BLACK = (0, 0, 0)
+YELLOW = (255, 255, 0)
+
+
+class Histogram:
+    """bucket counts and percentiles over the last SAMPLES timings"""
+    def __init__(self, samples=SAMPLES):
+        self.samples = deque(maxlen=samples)
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0
+
+    def add(self, ms):
+        # the oldest sample leaves the window when it is full
+        if len(self.samples) == self.samples.maxlen:
+            self.counts[bisect.bisect_left(BUCKETS, self.samples[0])] -= 1
+        self.samples.append(ms)
+        self.counts[bisect.bisect_left(BUCKETS, ms)] += 1
+        self.total += 1
+
+    def percentile(self, p):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def stats(self):
+        """summary of the window, with the bucket counts keyed by upper bound"""
+        return {"count": self.total, "mean": sum(self.samples) / max(1, len(self.samples)),
+                "p50": self.percentile(50), "p95": self.percentile(95), "max": max(self.samples, default=0.0),
+                "buckets": {str(bound): count for bound, count in zip(BUCKETS, self.counts)}}
+
+
+class Stage:
+    """context manager timing one stage into the profiler"""
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class Profiler:
+    """times the stages of the main loop, and optionally runs the whole
+    session under cProfile or a sampling profiler
+
+    stage timings go into rolling histograms shown by the overlay, and into
+    a trace file in the chrome://tracing format written on exit, along with
+    the counters of the text cache. When profiling is off, stage() hands
+    out a context manager that does nothing"""
+    def __init__(self, mode=None, trace=TRACE_FILE):
+        if mode is not None and mode not in MODES:
+            raise ValueError("unknown profiling mode {!r}, expected one of {}".format(mode, ", ".join(MODES)))
+        self.mode = mode
+        self.enabled = mode is not None
+        self.trace = trace
+        self.histograms = {}
+        self.events = deque(maxlen=TRACE_EVENTS)
+        self.origin = time.perf_counter()
+        self.off = nullcontext()
+
+        self.cprofile = None
+        self.sampler = None
+        self.running = False
+        self.stacks = Counter()
+
+    def stage(self, name):
+        """context manager timing a stage of the main loop"""
+        return Stage(self, name) if self.enabled else self.off
+
+    def record(self, name, start, end):
+        ms = (end - start) * 1000
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.add(ms)
+        self.events.append((name, start, end))
+
+    def start(self):
+        """starts the session profiler of the mode"""
+        if self.mode == "cprofile":
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        elif self.mode == "sample":
+            self.running = True
+            self.sampler = threading.Thread(target=self.sample, args=(threading.get_ident(),), daemon=True)
+            self.sampler.start()
+
+    def sample(self, thread_id):
+        """records the stack of the main thread at a fixed interval"""
+        while self.running:
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append("{} ({}:{})".format(code.co_name, os.path.basename(code.co_filename), frame.f_lineno))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+            time.sleep(SAMPLE_INTERVAL)
+
+    def stop(self):
+        """stops the session profiler and writes everything that was recorded"""
+        if not self.enabled:
+            return
+        base = os.path.splitext(self.trace)[0]
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(base + ".prof")
+            pstats.Stats(self.cprofile).sort_stats("cumulative").print_stats(25)
+        if self.sampler is not None:
+            self.running = False
+            self.sampler.join()
+            # folded stacks, the input format of flamegraph tools
+            with open(base + ".folded", "wt") as f:
+                for stack, count in self.stacks.most_common():
+                    f.write("{} {}\n".format(stack, count))
+        self.dump()
+        text = fonts.cache.stats()
+        print("text cache: {} hits, {} misses ({:.0%} hit rate), {} texts in {:.1f}MB".format(
+            text["hits"], text["misses"], text["hits"] / max(1, text["hits"] + text["misses"]),
+            text["entries"], text["bytes"] / (1024 * 1024)))
+
+    def dump(self):
+        """writes the trace events, the histograms and the text cache counters
+        to the trace file"""
+        events = [{"name": name, "ph": "X", "pid": 0, "tid": 0, "ts": (start - self.origin) * 1e6,
+                   "dur": (end - start) * 1e6} for name, start, end in self.events]
+        histograms = {name: histogram.stats() for name, histogram in self.histograms.items()}
+        with open(self.trace, "wt") as f:
+            json.dump({"traceEvents": events, "histograms": histograms, "text_cache": fonts.cache.stats()}, f)
+
+    def draw(self, window, y):
+        """draws the p95 of every stage on a line starting at y, returns its rect"""
+        parts = ["{} {:.1f}".format(name, histogram.percentile(95)) for name, histogram in self.histograms.items()]
+        text = fonts.render("p95 ms | " + " | ".join(parts), YELLOW, 20)
+        rect = pygame.Rect(0, y, window.get_width(), text.get_height())
+        window.fill(BLACK, rect)
+        window.blit(text, rect)
+        return rect
+
+
+def from_environment():
+    """profiling mode set in the environment, 1 means stage timings only,
+    an unknown mode is reported and profiling stays off"""
+    mode = os.environ.get(ENV_VAR, "").strip().lower()
+    if mode in ("", "0", "off"):
+        return None
+    if mode == "1":
+        return "stages"
+    if mode not in MODES:
+        print("ignoring {}={!r}, expected one of {}, 1 or off".format(ENV_VAR, mode, ", ".join(MODES)),
+              file=sys.stderr)
+        return None
+    return mode
@@ -0,0 +1,223 @@
+# imports
+import argparse
+import os
+import sqlite3
+import threading
+from collection import split_ref
+
+
+# GLOBALS
+# highscores of all levels live in one database
+DATABASE = "./assets/highscores/highscores.db"
+# number of best scores kept ready for each level
+TOP = 10
+
+
+def level_key(levelfile):
+    """name the scores of a level are stored under, 'pack.sok#12' for the
+    levels of a collection file, whose extension keeps pack.sok and
+    pack.txt apart"""
+    path, index = split_ref(levelfile)
+    if index is None:
+        return os.path.splitext(os.path.basename(path))[0]
+    return "{}#{}".format(os.path.basename(path), index)
+
+
+def legacy_file(levelfile):
+    """old style text highscore file of a level"""
+    return levelfile.replace("levels", "highscores").replace(".xsb", ".txt")
+
+
+class ScoreStore:
+    """sqlite backed highscore store
+
+    every score is kept in the scores table, and the best TOP of each level
+    are kept up to date on insert in the top table, so reading a leaderboard
+    never touches more than TOP rows. WAL mode and immediate transactions
+    make concurrent writers from several threads or processes safe"""
+    def __init__(self, path=DATABASE, top=TOP):
+        self.path = path
+        self.k = top
+        # sqlite connections can't be shared between threads
+        self.local = threading.local()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.transaction() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS scores (id INTEGER PRIMARY KEY, level TEXT, name TEXT, score INTEGER)")
+            db.execute("CREATE TABLE IF NOT EXISTS top (level TEXT, score INTEGER, id INTEGER, name TEXT, "
+                       "PRIMARY KEY (level, score, id)) WITHOUT ROWID")
+            db.execute("CREATE TABLE IF NOT EXISTS imported (level TEXT PRIMARY KEY)")
+
+    def connection(self):
+        """returns the connection of the current thread"""
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+    def transaction(self):
+        return Transaction(self.connection())
+
+    def add(self, level, name, score):
+        """stores one score"""
+        self.add_many([(level, name, score)])
+
+    def add_many(self, entries):
+        """stores (level, name, score) entries in a single transaction"""
+        with self.transaction() as db:
+            for level, name, score in entries:
+                self.insert(db, level, name, score)
+
+    def insert(self, db, level, name, score):
+        """inserts a score and updates the level's top list"""
+        cursor = db.execute("INSERT INTO scores (level, name, score) VALUES (?, ?, ?)", (level, name, score))
+        count, worst = db.execute("SELECT COUNT(*), MAX(score) FROM top WHERE level = ?", (level,)).fetchone()
+        # ties keep the earlier score in front, like a stable sort would
+        if count < self.k or score < worst:
+            db.execute("INSERT INTO top (level, score, id, name) VALUES (?, ?, ?, ?)",
+                       (level, score, cursor.lastrowid, name))
+            if count >= self.k:
+                db.execute("DELETE FROM top WHERE level = ? AND (score, id) = "
+                           "(SELECT score, id FROM top WHERE level = ? ORDER BY score DESC, id DESC LIMIT 1)",
+                           (level, level))
+
+    def top(self, level):
+        """the best scores of a level as [name, score] lists, best first"""
+        rows = self.connection().execute("SELECT name, score FROM top WHERE level = ? ORDER BY score, id",
+                                         (level,)).fetchall()
+        return [[name, score] for name, score in rows]
+
+    def best_scores(self):
+        """the best score of every level with scores, as a dict by level name"""
+        return dict(self.connection().execute("SELECT level, MIN(score) FROM top GROUP BY level"))
+
+    def import_txt(self, file, level=None):
+        """imports an old style '[name] [score]' highscore file once,
+        returns the number of scores imported. A level is only marked as
+        imported once its file was read, a file that shows up later still
+        counts"""
+        level = level or level_key(file)
+        if self.connection().execute("SELECT 1 FROM imported WHERE level = ?", (level,)).fetchone():
+            return 0
+        try:
+            with open(file, "rt") as f:
+                entries = [line.rstrip("\n").split(" ") for line in f if line.strip()]
+        except FileNotFoundError:
+            return 0
+
+        with self.transaction() as db:
+            if db.execute("SELECT 1 FROM imported WHERE level = ?", (level,)).fetchone():
+                return 0
+            for entry in entries:
+                self.insert(db, level, entry[0], int(entry[1]))
+            db.execute("INSERT INTO imported (level) VALUES (?)", (level,))
+        return len(entries)
+
+    def move_scores(self, source, target):
+        """moves every score of one level to another, for levels that turned
+        out to be copies, returns the number of scores moved"""
+        with self.transaction() as db:
+            rows = db.execute("SELECT name, score FROM scores WHERE level = ? ORDER BY id", (source,)).fetchall()
+            for name, score in rows:
+                self.insert(db, target, name, score)
+            db.execute("DELETE FROM scores WHERE level = ?", (source,))
+            db.execute("DELETE FROM top WHERE level = ?", (source,))
+        return len(rows)
+
+    def import_folder(self, folder):
+        """imports every old style highscore file of a folder"""
+        total = 0
+        for entry in os.scandir(folder):
+            if entry.is_file() and entry.name.endswith(".txt"):
+                total += self.import_txt(entry.path)
+        return total
+
+
+class MemoryStore:
+    """highscore store kept in memory, for test servers, with the same
+    add_many and top as ScoreStore"""
+    def __init__(self, top=TOP):
+        self.k = top
+        self.levels = {}
+        self.lock = threading.Lock()
+
+    def add(self, level, name, score):
+        self.add_many([(level, name, score)])
+
+    def add_many(self, entries):
+        with self.lock:
+            for level, name, score in entries:
+                best = self.levels.setdefault(level, [])
+                # after the equal scores, like the ids order them in ScoreStore
+                index = len(best)
+                while index and best[index - 1][1] > score:
+                    index -= 1
+                best.insert(index, [name, score])
+                del best[self.k:]
+
+    def top(self, level):
+        with self.lock:
+            return [list(entry) for entry in self.levels.get(level, [])]
+
+    def best_scores(self):
+        with self.lock:
+            return {level: best[0][1] for level, best in self.levels.items() if best}
+
+
+class Transaction:
+    """context manager for an immediate transaction, rolled back on errors"""
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        # take the write lock up front so concurrent writers wait instead of failing
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+# the store is created on first use
+store = None
+
+
+def get_store():
+    """returns the shared highscore store"""
+    global store
+    if store is None:
+        store = ScoreStore()
+    return store
+
+
+def peek_top(level, path=DATABASE):
+    """the top list of a level read without creating or changing the
+    database, empty when there is no database yet"""
+    if not os.path.exists(path):
+        return []
+    try:
+        db = sqlite3.connect("file:{}?mode=ro".format(os.path.abspath(path)), uri=True)
+        try:
+            rows = db.execute("SELECT name, score FROM top WHERE level = ? ORDER BY score, id", (level,)).fetchall()
+        finally:
+            db.close()
+    except sqlite3.Error:
+        return []
+    return [[name, score] for name, score in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="manage the highscore database")
+    parser.add_argument("folder", nargs="?", default="./assets/highscores/",
+                        help="folder of old style .txt highscore files to import")
+    args = parser.parse_args()
+    print("imported {} scores".format(get_store().import_folder(args.folder)))
+
+
+if __name__ == '__main__':
+    main()
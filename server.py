@@ -0,0 +1,129 @@
+# imports
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+import scores
+import verifier
+
+
+# GLOBALS
+HOST = "127.0.0.1"
+PORT = 8766
+# longest request line accepted, a batch of a few thousand replays fits
+LINE_LIMIT = 16 * 1024 * 1024
+# pending connections the listening socket queues up
+BACKLOG = 4096
+# threads running the store and the verifier off the event loop
+THREADS = 8
+
+
+class HighscoreServer:
+    """asyncio highscore service shared by the clients of a venue
+
+    clients keep their connections open and send one JSON request per line,
+    each answered by one JSON line:
+    - {"op": "submit", "entries": [...]} verifies the runs like verifier.py
+      and stores the valid ones, answers {"ok": true, "results": [...]}
+      with None or the reason of the rejection for each entry
+    - {"op": "top", "level": file} answers {"ok": true, "top": [[name, score], ...]}
+    - {"op": "best"} answers {"ok": true, "best": {level: score, ...}} with
+      the best score of every level that has one
+    - {"op": "ping"} answers {"ok": true}
+    each connection is a coroutine, and the blocking store and verifier
+    calls run on a thread pool, so thousands of idle connections cost
+    little more than their sockets"""
+    def __init__(self, store, folder=verifier.LEVEL_FOLDER, workers=None):
+        self.store = store
+        self.verifier = verifier.Verifier(folder, workers, store)
+        self.threads = ThreadPoolExecutor(max_workers=THREADS)
+        self.connections = 0
+
+    async def start(self, host=HOST, port=PORT):
+        self.server = await asyncio.start_server(self.handle, host, port, limit=LINE_LIMIT, backlog=BACKLOG)
+        return self.server
+
+    async def handle(self, reader, writer):
+        """answers the requests of one connection until it is closed"""
+        self.connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = await self.request(line)
+                writer.write((json.dumps(reply) + "\n").encode())
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            # dropped connections and overlong lines end the connection
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def request(self, line):
+        request = verifier.parse(line)
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "bad request"}
+        loop = asyncio.get_running_loop()
+        op = request.get("op")
+        if op == "submit":
+            entries = request.get("entries")
+            if not isinstance(entries, list):
+                return {"ok": False, "error": "no entries"}
+            results = await loop.run_in_executor(self.threads, self.verifier.process, entries)
+            return {"ok": True, "results": results}
+        if op == "top":
+            level = request.get("level")
+            if not isinstance(level, str):
+                return {"ok": False, "error": "no level"}
+            top = await loop.run_in_executor(self.threads, self.store.top, scores.level_key(level))
+            return {"ok": True, "top": top}
+        if op == "best":
+            best = await loop.run_in_executor(self.threads, self.store.best_scores)
+            return {"ok": True, "best": best}
+        if op == "ping":
+            return {"ok": True}
+        return {"ok": False, "error": "unknown op"}
+
+    def close(self):
+        self.threads.shutdown()
+        self.verifier.close()
+
+
+def stub(folder=verifier.LEVEL_FOLDER):
+    """a server with an in memory store that checks replays without worker
+    processes, for running the clients against in tests"""
+    return HighscoreServer(scores.MemoryStore(), folder, workers=0)
+
+
+async def serve(server, host, port):
+    listener = await server.start(host, port)
+    print("highscore server on {}:{}".format(host, port))
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="highscore server for sharing leaderboards on a network")
+    parser.add_argument("--host", default=HOST, help="address to listen on, 0.0.0.0 for the whole LAN")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--levels", default=verifier.LEVEL_FOLDER, help="folder of the levels scores can be submitted for")
+    parser.add_argument("--workers", type=int, default=None, help="replay verification processes")
+    parser.add_argument("--stub", action="store_true", help="keep the scores in memory, for tests")
+    args = parser.parse_args()
+
+    if args.stub:
+        server = stub(args.levels)
+    else:
+        server = HighscoreServer(scores.get_store(), args.levels, args.workers)
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
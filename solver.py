@@ -0,0 +1,423 @@
+# imports
+import argparse
+import heapq
+import os
+import random
+import time
+from collections import deque
+from itertools import islice
+import scores
+from engine import Engine, read_xsb, list_levels, WALL, LETTERS
+
+
+# GLOBALS
+# distance used for unreachable cells
+INF = 1 << 20
+# rough size of one transposition table entry in bytes (key, value and dict slot)
+ENTRY_SIZE = 120
+# rough size of a search node in bytes, its heap entry included, plus its
+# frozenset of crates for each crate
+NODE_SIZE = 300
+CRATE_SIZE = 40
+# rough size of one heuristic cache entry, its key is shared with a node
+HEURISTIC_SIZE = 100
+# share of the memory budget the heuristic cache may use
+HEURISTIC_SHARE = 0.25
+MB = 1024 * 1024
+
+
+class TranspositionTable:
+    """zobrist hashed table of the best known cost of each visited state,
+    capped to a memory budget by evicting the oldest entries"""
+    def __init__(self, cells, max_memory=64, seed=0):
+        # one random 64 bit key per cell for crates and one for the player
+        rng = random.Random(seed)
+        self.crate_keys = [rng.getrandbits(64) for _ in range(cells)]
+        self.player_keys = [rng.getrandbits(64) for _ in range(cells)]
+
+        # memory budget in megabytes converted to a number of entries
+        self.max_entries = max(1, int(max_memory * MB) // ENTRY_SIZE)
+        self.entries = {}
+        self.peak = 0
+        self.evictions = 0
+
+    def hash(self, player, crates):
+        """computes the full zobrist hash of a state"""
+        key = self.player_keys[player]
+        for crate in crates:
+            key ^= self.crate_keys[crate]
+        return key
+
+    def update(self, key, player, crate, behind):
+        """updates a hash for a push of the crate by the player"""
+        return (key ^ self.player_keys[player] ^ self.player_keys[crate]
+                ^ self.crate_keys[crate] ^ self.crate_keys[behind])
+
+    def get(self, key, default=None):
+        return self.entries.get(key, default)
+
+    def store(self, key, cost):
+        """stores the cost of a state, evicting old entries when full"""
+        entries = self.entries
+        entries[key] = cost
+        if len(entries) > self.peak:
+            self.peak = len(entries)
+        if len(entries) > self.max_entries:
+            self.evict()
+
+    def evict(self):
+        """drops the oldest quarter of the table"""
+        drop = max(1, len(self.entries) // 4)
+        for key in list(islice(self.entries, drop)):
+            del self.entries[key]
+        self.evictions += drop
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class Result:
+    """outcome of a solver run, peak is the most memory the search used in
+    bytes, as estimated from the sizes of its tables"""
+    def __init__(self, status, solution="", nodes=0, elapsed=0.0, peak=0, optimal=False):
+        self.status = status
+        self.solution = solution
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.peak = peak
+        self.optimal = optimal
+
+    @property
+    def moves(self):
+        return len(self.solution)
+
+    @property
+    def pushes(self):
+        return sum(1 for letter in self.solution if letter.isupper())
+
+    @property
+    def nodes_per_sec(self):
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return "Result({}, moves={}, pushes={}, nodes={}, {:.0f} nodes/s, peak={:.1f}MB, {:.2f}s)".format(
+            self.status, self.moves, self.pushes, self.nodes, self.nodes_per_sec, self.peak / MB, self.elapsed)
+
+
+class Solver:
+    """A* search over push states, returns a move optimal LURD solution
+
+    every edge of the search is a walk to a crate and one push, costing the
+    length of the walk plus one, so with the admissible matching heuristic
+    the first solution popped is optimal in moves. a weight above 1 trades
+    optimality for speed
+
+    max_memory caps everything the search keeps, in MB: the transposition
+    table, the open nodes with the expanded ones they hold on to as
+    parents, and the heuristic cache. The table gives way when the budget
+    is used up, and the search stops with status 'memory' once the nodes
+    alone don't fit"""
+    def __init__(self, level, max_memory=64, time_limit=None, weight=1):
+        self.engine = Engine(level)
+        self.max_memory = max_memory
+        self.time_limit = time_limit
+        self.weight = weight
+
+        # static analysis of the level
+        self.goals = sorted(self.engine.goals)
+        self.push_distances = self.compute_push_distances()
+        self.deadlocks = self.engine.deadlocks
+        self.heuristics = {}
+        self.max_heuristics = max(1, int(max_memory * MB * HEURISTIC_SHARE) // HEURISTIC_SIZE)
+
+    def compute_push_distances(self):
+        """for each goal the number of pushes needed to get a crate there
+        from every cell, ignoring other crates (reverse search by pulling)"""
+        grid = self.engine.grid
+        steps = list(self.engine.offsets.values())
+        distances = []
+        for goal in self.goals:
+            dist = [INF] * len(grid)
+            dist[goal] = 0
+            queue = deque([goal])
+            while queue:
+                cell = queue.popleft()
+                for step in steps:
+                    # pull the crate one step, the player stands behind it
+                    to = cell + step
+                    if grid[to] != WALL and grid[to + step] != WALL and dist[to] == INF:
+                        dist[to] = dist[cell] + 1
+                        queue.append(to)
+            distances.append(dist)
+        return distances
+
+    def heuristic(self, crates):
+        """minimum cost matching of goals to crates by push distance"""
+        h = self.heuristics.get(crates)
+        if h is None:
+            crate_list = list(crates)
+            cost = [[dist[crate] for crate in crate_list] for dist in self.push_distances]
+            h = min_cost_matching(cost)
+            # keep the cache within its share of the memory budget
+            if len(self.heuristics) >= self.max_heuristics:
+                self.heuristics.clear()
+            self.heuristics[crates] = h
+        return h
+
+    def memory(self, table, heap, nodes, node_size):
+        """estimated bytes the search uses: the transposition table, the
+        open nodes and the expanded nodes, which stay alive as parents,
+        and the heuristic cache"""
+        return (len(table) * ENTRY_SIZE + (len(heap) + nodes) * node_size
+                + len(self.heuristics) * HEURISTIC_SIZE)
+
+    def over_budget(self, table, heap, nodes, node_size):
+        """makes room in the transposition table when the search uses more
+        than max_memory, returns the bytes used, None when the nodes alone
+        are over the budget and the search has to stop"""
+        budget = self.max_memory * MB
+        used = self.memory(table, heap, nodes, node_size)
+        if used > budget:
+            if (len(heap) + nodes) * node_size > budget:
+                return None
+            table.evict()
+        return used
+
+    def reachable(self, player, crates):
+        """breadth first walk distances from the player around the crates"""
+        grid = self.engine.grid
+        steps = list(self.engine.offsets.values())
+        dist = {player: 0}
+        queue = deque([player])
+        while queue:
+            cell = queue.popleft()
+            d = dist[cell] + 1
+            for step in steps:
+                to = cell + step
+                if to not in dist and grid[to] != WALL and to not in crates:
+                    dist[to] = d
+                    queue.append(to)
+        return dist
+
+    def successors(self, player, crates):
+        """yields (walk cost + push, crate, behind) for every possible push"""
+        grid = self.engine.grid
+        steps = list(self.engine.offsets.values())
+        dead = self.deadlocks.dead
+        dist = self.reachable(player, crates)
+        for crate in crates:
+            for step in steps:
+                stand = crate - step
+                if stand not in dist:
+                    continue
+                behind = crate + step
+                if grid[behind] == WALL or behind in crates or dead[behind]:
+                    continue
+                yield dist[stand] + 1, crate, behind
+
+    def solve(self):
+        """runs the search, returns a Result"""
+        start_time = time.perf_counter()
+        engine = self.engine
+        goals = engine.goals
+        table = TranspositionTable(len(engine.grid), self.max_memory)
+        weight = self.weight
+
+        crates = frozenset(engine.crates)
+        if len(goals) > len(crates):
+            return Result("unsolvable", elapsed=time.perf_counter() - start_time)
+        h = self.heuristic(crates)
+        if h >= INF:
+            return Result("unsolvable", elapsed=time.perf_counter() - start_time)
+
+        key = table.hash(engine.player, crates)
+        table.store(key, 0)
+        # nodes are (player, crates, hash, parent node, push)
+        node = (engine.player, crates, key, None, None)
+        heap = [(weight * h, 0, 0, node)]
+        seq = 0
+        nodes = 0
+        node_size = NODE_SIZE + CRATE_SIZE * len(crates)
+        peak = 0
+
+        while heap:
+            f, neg_g, _, node = heapq.heappop(heap)
+            g = -neg_g
+            player, crates, key, parent, push = node
+            # skip stale entries that were reached cheaper later
+            if table.get(key, g) < g:
+                continue
+
+            if goals <= crates:
+                solution = self.reconstruct(node)
+                return Result("solved", solution, nodes, time.perf_counter() - start_time,
+                              peak, weight == 1)
+
+            # the clock is read on every node, big levels expand only a few
+            # dozen a second
+            nodes += 1
+            if self.time_limit is not None and time.perf_counter() - start_time > self.time_limit:
+                return Result("timeout", "", nodes, time.perf_counter() - start_time, peak)
+            used = self.over_budget(table, heap, nodes, node_size)
+            if used is None:
+                return Result("memory", "", nodes, time.perf_counter() - start_time, peak)
+            peak = max(peak, used)
+
+            for cost, crate, behind in self.successors(player, crates):
+                new_g = g + cost
+                new_key = table.update(key, player, crate, behind)
+                if table.get(new_key, INF) <= new_g:
+                    continue
+                new_crates = crates.difference((crate,)).union((behind,))
+                # prune pushes that freeze crates off their goals
+                if self.deadlocks.check(new_crates, behind):
+                    continue
+                h = self.heuristic(new_crates)
+                if h >= INF:
+                    continue
+                table.store(new_key, new_g)
+                seq += 1
+                child = (crate, new_crates, new_key, node, (crate, behind - crate))
+                heapq.heappush(heap, (new_g + weight * h, -new_g, seq, child))
+
+        return Result("unsolvable", "", nodes, time.perf_counter() - start_time, peak, weight == 1)
+
+    def reconstruct(self, node):
+        """turns the chain of pushes into a LURD string"""
+        root, pushes = self.chain(node)
+        return self.lurd(root[0], root[1], pushes)
+
+    def chain(self, node):
+        """the first node of a chain and its (crate, step) pushes in order"""
+        pushes = []
+        while node[3] is not None:
+            pushes.append(node[4])
+            node = node[3]
+        pushes.reverse()
+        return node, pushes
+
+    def lurd(self, player, crates, pushes):
+        """the LURD string of walking to and making each of a list of pushes"""
+        letters = {self.engine.offsets[vector]: letter for vector, letter in LETTERS.items()}
+        crates = set(crates)
+        solution = []
+        for crate, step in pushes:
+            solution.append(self.walk(player, crate - step, crates, letters))
+            solution.append(letters[step].upper())
+            crates.remove(crate)
+            crates.add(crate + step)
+            player = crate
+        return "".join(solution)
+
+    def walk(self, player, target, crates, letters):
+        """shortest walk between two cells as a lowercase LURD string"""
+        grid = self.engine.grid
+        came_from = {player: None}
+        queue = deque([player])
+        while queue:
+            cell = queue.popleft()
+            if cell == target:
+                break
+            for step in letters:
+                to = cell + step
+                if to not in came_from and grid[to] != WALL and to not in crates:
+                    came_from[to] = cell
+                    queue.append(to)
+
+        path = []
+        cell = target
+        while came_from[cell] is not None:
+            path.append(letters[cell - came_from[cell]])
+            cell = came_from[cell]
+        return "".join(reversed(path))
+
+
+def min_cost_matching(cost):
+    """hungarian algorithm on a rows <= columns cost matrix, returns the
+    minimal total cost of assigning every row to a different column"""
+    n = len(cost)
+    if n == 0:
+        return 0
+    m = len(cost[0])
+    u = [0] * (n + 1)
+    v = [0] * (m + 1)
+    match = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for row in range(1, n + 1):
+        match[0] = row
+        col0 = 0
+        minv = [INF * INF] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[col0] = True
+            row0 = match[col0]
+            delta = INF * INF
+            col1 = 0
+            cost_row = cost[row0 - 1]
+            u_row = u[row0]
+            for col in range(1, m + 1):
+                if not used[col]:
+                    current = cost_row[col - 1] - u_row - v[col]
+                    if current < minv[col]:
+                        minv[col] = current
+                        way[col] = col0
+                    if minv[col] < delta:
+                        delta = minv[col]
+                        col1 = col
+            for col in range(m + 1):
+                if used[col]:
+                    u[match[col]] += delta
+                    v[col] -= delta
+                else:
+                    minv[col] -= delta
+            col0 = col1
+            if match[col0] == 0:
+                break
+        while col0:
+            col1 = way[col0]
+            match[col0] = match[col1]
+            col0 = col1
+
+    total = sum(cost[match[col] - 1][col - 1] for col in range(1, m + 1) if match[col])
+    return min(total, INF)
+
+
+def solve_file(path, **options):
+    """solves a level file, options are passed to the Solver"""
+    return Solver(read_xsb(path), **options).solve()
+
+
+def best_score(path):
+    """lowest recorded highscore of a level file, None if there is none,
+    only reads the highscore database, so solving never creates it"""
+    top = scores.peek_top(scores.level_key(path))
+    return top[0][1] if top else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="solve sokoban levels")
+    parser.add_argument("paths", nargs="+", help="level files or folders of .xsb files")
+    parser.add_argument("--memory", type=float, default=64, help="memory cap of the search in MB")
+    parser.add_argument("--time", type=float, default=None, help="time limit per level in seconds")
+    parser.add_argument("--weight", type=float, default=1, help="heuristic weight, above 1 is faster but not optimal")
+    args = parser.parse_args()
+
+    files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            files.extend(sorted(list_levels(path)))
+        else:
+            files.append(path)
+
+    for file in files:
+        result = solve_file(file, max_memory=args.memory, time_limit=args.time, weight=args.weight)
+        best = best_score(file)
+        print("{} {} moves={} pushes={} nodes={} nodes/s={:.0f} peak={:.1f}MB time={:.2f}s best={}".format(
+            file, result.status, result.moves, result.pushes, result.nodes, result.nodes_per_sec,
+            result.peak / MB, result.elapsed, best if best is not None else "-"))
+        if result.status == "solved":
+            print(result.solution)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+# imports
+import os
+import sys
+import pytest
+
+# the modules live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import scores
+
+
+# GLOBALS
+# solved by pushing right once, with room to walk about first
+SMALL = ["#####",
+         "#   #",
+         "#@$.#",
+         "#####"]
+
+
+def write_level(folder, name, rows):
+    """writes a level file and returns its path"""
+    path = os.path.join(str(folder), name)
+    with open(path, "wt") as f:
+        f.write("\n".join(rows) + "\n")
+    return path
+
+
+@pytest.fixture
+def levels(tmp_path):
+    """a level folder holding one small level"""
+    folder = tmp_path / "levels"
+    folder.mkdir()
+    write_level(folder, "small.xsb", SMALL)
+    return str(folder)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """a highscore database of the test's own as the shared store"""
+    store = scores.ScoreStore(str(tmp_path / "highscores.db"))
+    monkeypatch.setattr(scores, "store", store)
+    return store
@@ -0,0 +1,98 @@
+# imports
+import json
+import os
+import sys
+import pytest
+import batch
+from conftest import SMALL, write_level
+from test_solver import LEVELS
+
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / "levels"
+    folder.mkdir()
+    write_level(folder, "a.xsb", SMALL)
+    write_level(folder, "b.xsb", LEVELS["two crates"])
+    # no player, so it can't be read
+    write_level(folder, "c.xsb", ["#####", "# $.#", "#####"])
+    return str(folder)
+
+
+def run(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["batch.py", "--workers", "1"] + [str(arg) for arg in args])
+    batch.main()
+
+
+def by_level(path):
+    records = batch.read_records(path)
+    return {os.path.basename(record["level"]): record for record in records}, len(records)
+
+
+def test_solve(folder, tmp_path, monkeypatch):
+    output = tmp_path / "results.jsonl"
+    run(monkeypatch, folder, "--output", output)
+    records, count = by_level(str(output))
+    assert count == 3
+    assert (records["a.xsb"]["status"], records["a.xsb"]["solution"]) == ("solved", "R")
+    assert records["b.xsb"]["status"] == "solved"
+    # a level that fails doesn't end the run
+    assert records["c.xsb"]["status"] == "error"
+    assert "ValueError" in records["c.xsb"]["reason"]
+
+
+def test_timeout(folder, tmp_path, monkeypatch):
+    output = tmp_path / "results.jsonl"
+    run(monkeypatch, folder, "--output", output, "--timeout", 0)
+    records, _ = by_level(str(output))
+    assert records["b.xsb"]["status"] == "timeout"
+
+
+def test_resume(folder, tmp_path, monkeypatch):
+    output = str(tmp_path / "results.jsonl")
+    a = os.path.join(folder, "a.xsb")
+    with open(output, "wt") as f:
+        f.write(json.dumps({"level": a, "status": "solved", "moves": 1, "solution": "R"}) + "\n")
+        f.write(json.dumps({"level": os.path.join(folder, "c.xsb"), "status": "error", "reason": "old"}) + "\n")
+        # cut off by a killed run
+        f.write('{"level": "' + os.path.join(folder, "b.xsb"))
+    run(monkeypatch, folder, "--output", output, "--resume")
+    records, count = by_level(output)
+    # one record per level, the solved one kept and the others run again
+    assert count == 3
+    assert records["a.xsb"] == {"level": a, "status": "solved", "moves": 1, "solution": "R"}
+    assert records["b.xsb"]["status"] == "solved"
+    assert records["c.xsb"]["status"] == "error"
+    assert records["c.xsb"]["reason"] != "old"
+
+    # nothing is left to do
+    run(monkeypatch, folder, "--output", output, "--resume")
+    assert by_level(output)[1] == 3
+
+
+def test_verify(folder, tmp_path, monkeypatch):
+    solutions = str(tmp_path / "solutions.jsonl")
+    run(monkeypatch, folder, "--output", solutions)
+    records = batch.read_records(solutions)
+    for record in records:
+        if record["level"].endswith("b.xsb"):
+            record["solution"] = record["solution"][:-1]
+    with open(solutions, "wt") as f:
+        f.writelines(json.dumps(record) + "\n" for record in records)
+
+    output = str(tmp_path / "verified.jsonl")
+    run(monkeypatch, folder, "--verify", solutions, "--output", output)
+    records, count = by_level(output)
+    assert count == 2
+    assert records["a.xsb"]["status"] == "verified"
+    assert records["b.xsb"]["status"] == "invalid"
+
+
+def test_truncate_partial(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    with open(path, "wt") as f:
+        f.write('{"level": "a"}\n{"lev')
+    batch.truncate_partial(path)
+    with open(path, "rt") as f:
+        assert f.read() == '{"level": "a"}\n'
+    batch.truncate_partial(str(tmp_path / "missing.jsonl"))
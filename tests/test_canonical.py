@@ -0,0 +1,72 @@
+# imports
+import pytest
+from canonical import level_hash, canonical_rows
+
+
+# GLOBALS
+LEVEL = ["#######",
+         "#.  $ #",
+         "# #@  #",
+         "#  $* #",
+         "#######"]
+
+
+def rotate(rows):
+    """quarter turn clockwise"""
+    width = max(len(row) for row in rows)
+    rows = [row.ljust(width) for row in rows]
+    return ["".join(rows[y][x] for y in reversed(range(len(rows)))) for x in range(width)]
+
+
+def mirror(rows):
+    width = max(len(row) for row in rows)
+    return [row.ljust(width)[::-1] for row in rows]
+
+
+def turns(rows):
+    """the 8 rotations and mirror images of a level"""
+    result = []
+    for flipped in (rows, mirror(rows)):
+        for _ in range(4):
+            result.append(flipped)
+            flipped = rotate(flipped)
+    return result
+
+
+@pytest.mark.parametrize("index", range(8))
+def test_symmetries(index):
+    assert level_hash(turns(LEVEL)[index]) == level_hash(LEVEL)
+
+
+def test_padding_and_decoration():
+    padded = ["", "   #########", "   # ##### #"] + ["   ##" + row + "#" for row in LEVEL] + ["   #########", ""]
+    assert level_hash(padded) == level_hash(LEVEL)
+
+
+def test_floor_symbols():
+    assert level_hash([row.replace(" ", "-") for row in LEVEL]) == level_hash(LEVEL)
+
+
+def test_player_anywhere_in_its_area():
+    moved = [row.replace("@", " ") for row in LEVEL]
+    moved[1] = "#.@ $ #"
+    assert level_hash(moved) == level_hash(LEVEL)
+    # or on the other side of a crate, walking round it
+    boxed = [row.replace("@", " ") for row in LEVEL]
+    boxed[1] = "#.  $@#"
+    assert level_hash(boxed) == level_hash(LEVEL)
+
+
+def test_different_levels():
+    moved_crate = [row.replace("$", " ", 1) for row in LEVEL]
+    moved_crate[2] = "# #@ $#"
+    moved_goal = [row.replace(".", " ") for row in LEVEL]
+    moved_goal[3] = "#. $* #"
+    hashes = {level_hash(rows) for rows in (LEVEL, moved_crate, moved_goal)}
+    assert len(hashes) == 3
+
+
+def test_canonical_rows_are_a_level():
+    rows = canonical_rows(LEVEL)
+    assert "".join(rows).count("@") + "".join(rows).count("+") == 1
+    assert canonical_rows(rows) == rows
@@ -0,0 +1,119 @@
+# imports
+import os
+import pytest
+import collection
+import scores
+from collection import Collection
+from engine import read_xsb, list_levels
+
+
+# GLOBALS
+PACK = """; a pack of three
+Title: First
+#####
+#@$.#
+#####
+Author: someone
+
+Level two
+######
+#@-$.#
+######
+
+####
+#.$@#
+####
+; the last one
+Title: Third
+"""
+
+
+@pytest.fixture
+def pack(tmp_path):
+    path = str(tmp_path / "pack.sok")
+    with open(path, "wt") as f:
+        f.write(PACK)
+    return path
+
+
+def test_levels(pack):
+    levels = Collection(pack)
+    assert len(levels) == 3
+    assert levels.level(0) == [list("#####"), list("#@$.#"), list("#####")]
+    # dashes are floor
+    assert levels.level(1)[1] == list("#@ $.#")
+    assert levels.level(2)[1] == list("#.$@#")
+    assert [levels.title(index) for index in range(3)] == ["First", "Level two", "Third"]
+    assert levels.metadata(0) == {"text": "a pack of three", "title": "First", "author": "someone"}
+
+
+def test_index_round_trip(pack):
+    built = Collection(pack)
+    assert os.path.exists(pack + ".idx")
+    loaded = Collection(pack)
+    assert loaded.load_index() is not None
+    assert list(loaded.entries) == list(built.entries)
+    assert [loaded.level(index) for index in range(3)] == [built.level(index) for index in range(3)]
+
+
+def test_changed_file_rebuilds_index(pack):
+    Collection(pack)
+    with open(pack, "at") as f:
+        f.write("\n#####\n#@*.#\n#####\n")
+    levels = Collection(pack)
+    assert len(levels) == 4
+    assert levels.level(3)[1] == list("#@*.#")
+    assert Collection(pack).load_index() is not None
+
+
+def test_broken_index_rebuilds(pack):
+    Collection(pack)
+    with open(pack + ".idx", "r+b") as f:
+        f.truncate(40)
+    levels = Collection(pack)
+    assert len(levels) == 3
+    assert os.path.getsize(pack + ".idx") > 40
+
+
+def test_crlf(tmp_path):
+    path = str(tmp_path / "pack.txt")
+    with open(path, "wb") as f:
+        f.write(PACK.replace("\n", "\r\n").encode())
+    levels = Collection(path)
+    assert len(levels) == 3
+    assert levels.level(0)[1] == list("#@$.#")
+    assert levels.title(1) == "Level two"
+
+
+def test_refs(pack, tmp_path):
+    refs = list_levels(str(tmp_path))
+    assert refs == [pack + "#0", pack + "#1", pack + "#2"]
+    assert collection.split_ref(refs[1]) == (pack, 1)
+    assert collection.split_ref(pack) == (pack, None)
+    assert read_xsb(refs[2]) == Collection(pack).level(2)
+    assert collection.level_name(refs[1]) == "pack.sok 2: Level two"
+
+
+def test_empty(tmp_path):
+    path = str(tmp_path / "empty.sok")
+    open(path, "wb").close()
+    assert len(Collection(path)) == 0
+
+
+def test_reopen_closes_old_map(pack):
+    old = collection.open_collection(pack)
+    assert collection.open_collection(pack) is old
+    with open(pack, "at") as f:
+        f.write("\n#####\n#@*.#\n#####\n")
+    new = collection.open_collection(pack)
+    assert new is not old
+    assert old.data.closed
+    assert len(new) == 4
+
+
+def test_level_keys(tmp_path):
+    sok = str(tmp_path / "pack.sok")
+    txt = str(tmp_path / "pack.txt")
+    assert scores.level_key(collection.make_ref(sok, 1)) == "pack.sok#1"
+    assert scores.level_key(collection.make_ref(sok, 1)) != scores.level_key(collection.make_ref(txt, 1))
+    assert scores.level_key(str(tmp_path / "pack.xsb")) == "pack"
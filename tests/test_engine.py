@@ -0,0 +1,120 @@
+# imports
+import pytest
+from engine import Engine, BLOCKED, WALK, PUSH, DIRECTIONS
+
+
+# GLOBALS
+LEFT, UP, RIGHT, DOWN = (DIRECTIONS[letter] for letter in "lurd")
+# two crates, the right one starts on its goal
+LEVEL = ["#######",
+         "#     #",
+         "# @$. #",
+         "#   * #",
+         "#######"]
+
+
+@pytest.fixture
+def engine():
+    return Engine([list(row) for row in LEVEL])
+
+
+def test_parse(engine):
+    assert engine.player_pos == (2, 2)
+    assert sorted(engine.crate_positions) == [(3, 2), (4, 3)]
+    assert engine.goal_count == 2
+    assert engine.on_goal == 1
+    assert not engine.finished
+
+
+def test_no_player():
+    with pytest.raises(ValueError):
+        Engine([list("#$.#")])
+
+
+def test_moves(engine):
+    assert engine.move(UP) == WALK
+    assert engine.move(UP) == BLOCKED
+    assert engine.move(DOWN) == WALK
+    assert engine.move(RIGHT) == PUSH
+    assert engine.player_pos == (3, 2)
+    assert (4, 2) in engine.crate_positions
+    assert engine.finished
+    assert (engine.counter, engine.pushes) == (3, 1)
+    assert engine.lurd == "udR"
+
+
+def test_blocked_push(engine):
+    assert engine.move(RIGHT) == PUSH
+    assert engine.move(RIGHT) == PUSH
+    # into the wall
+    assert engine.move(RIGHT) == BLOCKED
+    assert engine.player_pos == (4, 2)
+
+
+def test_two_crates_block(engine):
+    engine.play("urD")
+    engine.play("ld")
+    # the crate pushed down now has the one on the goal behind it
+    assert engine.move(RIGHT) == BLOCKED
+    assert engine.player_pos == (2, 3)
+    assert engine.lurd == "urDld"
+
+
+def test_undo_redo(engine):
+    engine.play("rurrdl")
+    assert engine.lurd == "RurrdL"
+    assert engine.pushes == 2
+    assert not engine.finished
+    assert engine.undo() == "L"
+    assert engine.finished
+    assert engine.player_pos == (5, 2)
+    while engine.undo() != "R":
+        pass
+    assert engine.player_pos == (2, 2)
+    assert sorted(engine.crate_positions) == [(3, 2), (4, 3)]
+    assert (engine.counter, engine.pushes, engine.on_goal) == (0, 0, 1)
+    assert engine.lurd == ""
+    assert engine.undo() is None
+
+    assert engine.redo() == "R"
+    assert engine.finished
+    while engine.redo():
+        pass
+    assert engine.lurd == "RurrdL"
+    assert engine.player_pos == (4, 2)
+    assert (engine.counter, engine.pushes, engine.on_goal) == (6, 2, 1)
+
+
+def test_new_move_truncates_journal(engine):
+    engine.play("rurrdl")
+    engine.undo()
+    engine.undo()
+    # a different move drops the moves that could have been redone
+    assert engine.move(LEFT) == WALK
+    assert engine.lurd == "Rurrl"
+    assert bytes(engine.journal) == b"Rurrl"
+    assert engine.redo() is None
+    # so does the same move as the one undone
+    engine.undo()
+    engine.undo()
+    engine.move(RIGHT)
+    assert bytes(engine.journal) == b"Rurr"
+
+
+def test_undo_clears_deadlock(engine):
+    # the second push leaves the crate against the left wall, away from the goals
+    engine.play("urrdll")
+    assert engine.deadlocked
+    engine.undo()
+    assert not engine.deadlocked
+    engine.redo()
+    assert engine.deadlocked
+
+
+def test_restart(engine):
+    engine.play("rurrdl")
+    engine.restart()
+    assert engine.player_pos == (2, 2)
+    assert sorted(engine.crate_positions) == [(3, 2), (4, 3)]
+    assert (engine.counter, engine.pushes, engine.on_goal) == (0, 0, 1)
+    assert engine.redo() is None
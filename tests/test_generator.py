@@ -0,0 +1,46 @@
+# imports
+import pytest
+import generator
+from engine import Engine
+
+
+# GLOBALS
+# seed, width, height, crates, candidates, pulls, optimal
+SETTINGS = (5, 6, 6, 2, 4, 40, 0)
+
+
+def test_deterministic():
+    record = generator.generate(*SETTINGS)
+    assert record is not None
+    assert generator.generate(*SETTINGS) == record
+    assert record["seed"] == SETTINGS[0]
+    other = generator.generate(SETTINGS[0] + 1, *SETTINGS[1:])
+    assert other["rows"] != record["rows"]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_solution_solves(seed):
+    record = generator.generate(seed, *SETTINGS[1:])
+    rows = record["rows"]
+    stats = generator.score(rows, record["solution"])
+    assert stats is not None
+    assert {name: record[name] for name in stats} == stats
+    assert record["pushes"] == sum(1 for letter in record["solution"] if letter.isupper())
+    engine = Engine([list(row) for row in rows])
+    # the level doesn't start solved
+    assert not engine.finished
+    assert engine.play(record["solution"])
+    assert engine.finished
+
+
+def test_optimal_is_no_longer():
+    plain = generator.generate(*SETTINGS)
+    shortened = generator.generate(*SETTINGS[:-1], 5)
+    assert shortened["rows"] == plain["rows"]
+    assert shortened["moves"] <= plain["moves"]
+    assert generator.score(shortened["rows"], shortened["solution"]) is not None
+
+
+def test_score_rejects_a_wrong_solution():
+    rows = generator.generate(*SETTINGS)["rows"]
+    assert generator.score(rows, "") is None
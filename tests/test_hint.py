@@ -0,0 +1,146 @@
+# imports
+import pytest
+import hint
+from conftest import write_level
+from hint import Hinter
+from solver import ENTRY_SIZE, CRATE_SIZE
+from test_solver import LEVELS
+
+
+@pytest.fixture
+def path(tmp_path):
+    return write_level(tmp_path, "room.xsb", LEVELS["room"])
+
+
+def pushed(hinter, pushes):
+    """the state after pushes given as (crate, target) level positions,
+    the player stands where the last crate was"""
+    engine = hinter.engine
+    player, crates = engine.player, set(engine.crates)
+    for crate, target in pushes:
+        player = engine.index(crate)
+        crates.remove(player)
+        crates.add(engine.index(target))
+    return player, frozenset(crates)
+
+
+def first_push(moves):
+    """the moves up to and including the first push"""
+    return moves[:next(index for index, letter in enumerate(moves) if letter.isupper()) + 1]
+
+
+def solves(hinter, result):
+    engine = hinter.engine
+    return engine.play(result["moves"]) and engine.finished
+
+
+def known_bytes(hinter):
+    """the bytes the known states and solutions should count"""
+    total = sum(ENTRY_SIZE + hint.PUSH_SIZE * len(pushes) for pushes, _ in hinter.solutions.values())
+    for state, entries in hinter.known.items():
+        total += ENTRY_SIZE + CRATE_SIZE * len(state) + ENTRY_SIZE * len(entries)
+    return total
+
+
+def check_references(hinter):
+    """every stored solution is used by as many states as it counts"""
+    used = {}
+    for entries in hinter.known.values():
+        for _, number, _ in entries.values():
+            used[number] = used.get(number, 0) + 1
+    assert used == {number: solution[1] for number, solution in hinter.solutions.items()}
+
+
+def test_follow_the_hint(path):
+    hinter = Hinter(path)
+    engine = hinter.engine
+    result = hinter.search(engine.player, engine.crates)
+    assert (result["status"], result["reused"]) == ("solved", False)
+    assert result["nodes"] > 0
+    moves = result["moves"]
+
+    engine.play(first_push(moves))
+    again = hinter.search(engine.player, engine.crates)
+    assert (again["status"], again["nodes"], again["reused"]) == ("solved", 0, True)
+    assert again["moves"] == moves[len(first_push(moves)):]
+    assert again["pushes"] == result["pushes"] - 1
+    assert solves(hinter, again)
+
+
+def test_stray_and_come_back(path):
+    hinter = Hinter(path)
+    engine = hinter.engine
+    hinter.search(engine.player, engine.crates)
+    # walking about keeps the player in the same area
+    engine.restart()
+    engine.play("l")
+    result = hinter.search(engine.player, engine.crates)
+    assert (result["nodes"], result["reused"]) == (0, True)
+    assert solves(hinter, result)
+    # so does taking back a push made elsewhere
+    engine.restart()
+    engine.play("rl")
+    engine.undo()
+    engine.undo()
+    result = hinter.search(engine.player, engine.crates)
+    assert (result["nodes"], result["reused"]) == (0, True)
+
+
+def test_known_states_end_the_search(path):
+    hinter = Hinter(path)
+    engine = hinter.engine
+    hinter.search(engine.player, engine.crates)
+    # pushed back and on past where the solution goes
+    player, crates = pushed(hinter, [((3, 2), (4, 2)), ((4, 2), (3, 2)), ((3, 2), (2, 2))])
+    assert hinter.lookup(player, crates) is None
+    fresh = Hinter(path).search(player, crates)
+    result = hinter.search(player, crates)
+    assert result["status"] == "solved"
+    assert result["reused"]
+    assert 0 < result["nodes"] < fresh["nodes"]
+    assert len(result["moves"]) <= len(fresh["moves"]) * hint.SLACK
+    engine.player, engine.crates = player, set(crates)
+    assert engine.play(result["moves"]) and engine.on_goal == len(engine.goals)
+
+
+def test_known_bytes(path):
+    hinter = Hinter(path)
+    engine = hinter.engine
+    hinter.search(engine.player, engine.crates)
+    hinter.search(*pushed(hinter, [((3, 2), (4, 2)), ((4, 2), (3, 2)), ((3, 2), (2, 2))]))
+    assert len(hinter.solutions) == 2
+    assert hinter.known_bytes == known_bytes(hinter)
+    check_references(hinter)
+
+
+def test_eviction(path):
+    hinter = Hinter(path)
+    engine = hinter.engine
+    hinter.search(engine.player, engine.crates)
+    full = hinter.known_bytes
+    hinter.max_known = full // 2
+    hinter.search(*pushed(hinter, [((3, 2), (4, 2)), ((4, 2), (3, 2)), ((3, 2), (2, 2))]))
+    assert hinter.known_bytes <= hinter.max_known
+    assert hinter.known_bytes == known_bytes(hinter)
+    check_references(hinter)
+    # the oldest states went first, the start of the first solution among them
+    assert hinter.lookup(engine.player, frozenset(engine.crates)) is None
+    # nothing fits at all
+    hinter.max_known = 0
+    hinter.remember(engine.player, frozenset(engine.crates), [])
+    assert (hinter.known, hinter.solutions, hinter.known_bytes) == ({}, {}, 0)
+
+
+def test_statuses(path):
+    hinter = Hinter(path, time_limit=0)
+    engine = hinter.engine
+    result = hinter.search(engine.player, engine.crates)
+    assert result["status"] == "partial"
+    assert not hinter.known
+
+    hinter = Hinter(path)
+    assert hinter.search(engine.player, engine.crates, lambda: True)["status"] == "cancelled"
+    # a crate left in a corner off the goals
+    stuck = hinter.search(*pushed(hinter, [((3, 2), (4, 2)), ((4, 6), (4, 7)), ((3, 6), (3, 7))]))
+    assert (stuck["status"], stuck["moves"], stuck["crate"]) == ("stuck", "", None)
+    assert hinter.search(*pushed(hinter, [((3, 2), (4, 2)), ((4, 2), (5, 2))]))["status"] == "stuck"
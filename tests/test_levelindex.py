@@ -0,0 +1,96 @@
+# imports
+import json
+import os
+import pytest
+import client
+import levelindex
+import scores
+from canonical import level_hash
+from conftest import SMALL, write_level
+from levelindex import LevelIndex
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    return str(tmp_path / "cache" / "levels.json")
+
+
+def test_records(levels, store, index_path):
+    write_level(levels, "big.xsb", ["#######", "#@$ $.#", "#  .  #", "#######"])
+    store.add("small", "ANNA", 3)
+    records = LevelIndex(index_path).refresh(levels)
+    by_name = {record["name"]: record for record in records}
+    assert set(by_name) == {"small.xsb", "big.xsb"}
+    assert by_name["big.xsb"]["crates"] == 2
+    assert (by_name["big.xsb"]["width"], by_name["big.xsb"]["height"]) == (7, 4)
+    assert by_name["small.xsb"]["hash"] == level_hash(SMALL)
+    assert by_name["small.xsb"]["best"] == 3
+    assert by_name["big.xsb"]["best"] is None
+    assert [record["name"] for record in levelindex.query(records, "crates>1")] == ["big.xsb"]
+    assert [record["name"] for record in levelindex.query(records, "solved")] == ["small.xsb"]
+
+
+def test_saved_and_loaded(levels, store, index_path):
+    first = LevelIndex(index_path).refresh(levels)
+    with open(index_path, "rt") as f:
+        assert json.load(f)["version"] == levelindex.VERSION
+    assert LevelIndex(index_path).refresh(levels) == first
+
+
+@pytest.mark.parametrize("saved", [
+    lambda records: records,
+    lambda records: {"version": levelindex.VERSION - 1, "levels": records},
+])
+def test_other_version_is_rebuilt(levels, store, index_path, saved):
+    LevelIndex(index_path).refresh(levels)
+    with open(index_path, "rt") as f:
+        records = json.load(f)["levels"]
+    # an index of an older format, with a hash that is no longer right
+    for record in records.values():
+        record["hash"] = "old"
+    with open(index_path, "wt") as f:
+        json.dump(saved(records), f)
+
+    index = LevelIndex(index_path)
+    assert index.records == {}
+    assert index.refresh(levels)[0]["hash"] == level_hash(SMALL)
+
+
+def test_removed_levels_are_dropped(levels, store, index_path, tmp_path):
+    pack = os.path.join(levels, "pack.sok")
+    with open(pack, "wt") as f:
+        f.write("\n\n".join("\n".join(SMALL) for _ in range(3)) + "\n")
+    other = tmp_path / "other"
+    other.mkdir()
+    write_level(other, "kept.xsb", SMALL)
+    index = LevelIndex(index_path)
+    index.refresh(str(other))
+    assert len(index.refresh(levels)) == 4
+
+    # the collection loses a level and a level file goes
+    with open(pack, "wt") as f:
+        f.write("\n\n".join("\n".join(SMALL) for _ in range(2)) + "\n")
+    os.remove(os.path.join(levels, "small.xsb"))
+    assert [record["path"] for record in index.refresh(levels)] == [pack + "#0", pack + "#1"]
+    assert sorted(index.records) == sorted([pack + "#0", pack + "#1", os.path.join(str(other), "kept.xsb")])
+    # and stay dropped in the saved index
+    assert sorted(LevelIndex(index_path).records) == sorted(index.records)
+
+
+class Server:
+    """stands in for the highscore client"""
+    def __init__(self, best):
+        self.best = best
+
+    def best_scores(self):
+        return self.best
+
+
+@pytest.mark.parametrize("best, shown", [({"small": 4}, 4), ({}, None), (None, None)])
+def test_server_scores(levels, index_path, monkeypatch, best, shown):
+    monkeypatch.setattr(client, "client", Server(best))
+    monkeypatch.setattr(scores, "store", None)
+    records = LevelIndex(index_path).refresh(levels)
+    assert records[0]["best"] == shown
+    # the local database isn't made in server mode
+    assert scores.store is None
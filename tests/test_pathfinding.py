@@ -0,0 +1,146 @@
+# imports
+from collections import deque
+import pytest
+from engine import Engine, BLOCKED, WALK, PUSH, WALL, LETTERS, DIRECTIONS
+from pathfinding import Navigator
+
+
+# GLOBALS
+LEVEL = ["#########",
+         "#   #   #",
+         "# @$  $ #",
+         "#   # . #",
+         "### #   #",
+         "#.    ###",
+         "#########"]
+
+
+def engine():
+    return Engine([list(row) for row in LEVEL])
+
+
+def floor_cells(game):
+    return [cell for cell in range(len(game.grid)) if game.grid[cell] != WALL]
+
+
+def neighbours(game, player, crates):
+    """the states one move away, with whether the move pushed"""
+    for vector in LETTERS:
+        game.player, game.crates = player, set(crates)
+        result = game.step(vector)
+        if result != BLOCKED:
+            yield game.player, frozenset(game.crates), result == PUSH
+
+
+def plain_walks(game):
+    """fewest moves to every cell the player reaches without pushing"""
+    start, crates = game.player, frozenset(game.crates)
+    scratch = engine()
+    distance = {start: 0}
+    queue = deque([start])
+    while queue:
+        player = queue.popleft()
+        for to, _, pushed in neighbours(scratch, player, crates):
+            if not pushed and to not in distance:
+                distance[to] = distance[player] + 1
+                queue.append(to)
+    return distance
+
+
+def plain_pushes(game, crate):
+    """fewest pushes, then fewest moves, that take one crate to each cell
+    with the other crates staying put, by a search over every move"""
+    start = (game.player, frozenset(game.crates))
+    others = start[1] - {crate}
+    scratch = engine()
+    best = {start: (0, 0)}
+    queue = deque([start])
+    while queue:
+        state = queue.popleft()
+        pushes, moves = best[state]
+        for player, crates, pushed in neighbours(scratch, *state):
+            if not others <= crates:
+                continue
+            cost = (pushes + pushed, moves + 1)
+            if cost < best.get((player, crates), (float("inf"),)):
+                best[(player, crates)] = cost
+                # walks are searched before the pushes that follow them
+                if pushed:
+                    queue.append((player, crates))
+                else:
+                    queue.appendleft((player, crates))
+    result = {}
+    for (_, crates), cost in best.items():
+        cell = next(iter(crates - others))
+        result[cell] = min(result.get(cell, cost), cost)
+    return result
+
+
+def test_walk_to():
+    game = engine()
+    navigator = Navigator(game)
+    walks = plain_walks(game)
+    assert any(cell not in walks for cell in floor_cells(game))
+    for cell in floor_cells(game):
+        moves = navigator.walk_to(cell)
+        if cell not in walks:
+            assert moves is None
+            assert not navigator.reachable(cell)
+            continue
+        assert len(moves) == walks[cell]
+        for vector in moves:
+            assert game.move(vector) == WALK
+        assert game.player == cell
+        game.restart()
+
+
+@pytest.mark.parametrize("crate", [(3, 2), (6, 2)])
+def test_push_to(crate):
+    game = engine()
+    crate = game.index(crate)
+    fewest = plain_pushes(game, crate)
+    dead = game.deadlocks.dead
+    found = missing = 0
+    for target in floor_cells(game):
+        # the navigator never pushes through cells a crate can't leave alive
+        if dead[target] or target == crate:
+            continue
+        moves = Navigator(game).push_to(crate, target)
+        if target not in fewest:
+            assert moves is None
+            missing += 1
+            continue
+        pushes = sum(1 for vector in moves if game.move(vector) == PUSH)
+        assert pushes == fewest[target][0]
+        assert len(moves) >= fewest[target][1]
+        assert target in game.crates
+        assert game.counter == len(moves)
+        found += 1
+        game.restart()
+    assert found and missing
+
+
+def test_not_a_crate():
+    game = engine()
+    assert Navigator(game).push_to(game.index((2, 1)), game.index((2, 2))) is None
+    assert Navigator(game).push_to(game.index((3, 2)), game.index((3, 2))) == []
+
+
+def test_budget():
+    game = engine()
+    navigator = Navigator(game)
+    crate, target = game.index((3, 2)), game.index((5, 2))
+    assert navigator.push_to(crate, target, budget=-1) is None
+    assert navigator.push_to(crate, target) is not None
+
+
+def test_reach_follows_moves():
+    game = engine()
+    navigator = Navigator(game)
+    before = {cell for cell in floor_cells(game) if navigator.reachable(cell)}
+    assert before == set(plain_walks(game))
+    game.move(DIRECTIONS["r"])
+    # the search is made again for the state after the push
+    after = {cell for cell in floor_cells(game) if navigator.reachable(cell)}
+    assert after == set(plain_walks(game))
+    assert after != before
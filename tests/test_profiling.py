@@ -0,0 +1,37 @@
+# imports
+import json
+import pytest
+import fonts
+import profiling
+
+
+@pytest.mark.parametrize("value, mode", [
+    ("", None), ("0", None), ("off", None), ("1", "stages"),
+    ("stages", "stages"), (" CProfile ", "cprofile"), ("sample", "sample"),
+])
+def test_from_environment(monkeypatch, value, mode):
+    monkeypatch.setenv(profiling.ENV_VAR, value)
+    assert profiling.from_environment() == mode
+
+
+def test_unknown_mode_is_off(monkeypatch, capsys):
+    monkeypatch.setenv(profiling.ENV_VAR, "everything")
+    assert profiling.from_environment() is None
+    assert "everything" in capsys.readouterr().err
+
+
+def test_text_cache_reported(tmp_path, monkeypatch, capsys):
+    cache = fonts.TextCache()
+    cache.hits, cache.misses = 3, 1
+    monkeypatch.setattr(fonts, "cache", cache)
+    trace = str(tmp_path / "trace.json")
+    profiler = profiling.Profiler("stages", trace)
+    with profiler.stage("draw"):
+        pass
+    profiler.stop()
+    with open(trace, "rt") as f:
+        saved = json.load(f)
+    assert saved["text_cache"]["hits"] == 3
+    assert saved["text_cache"]["misses"] == 1
+    assert "draw" in saved["histograms"]
+    assert "3 hits, 1 misses (75% hit rate)" in capsys.readouterr().out
@@ -0,0 +1,40 @@
+# imports
+import scores
+
+
+def test_top(store):
+    for name, score in (("ANNA", 30), ("BEN", 20), ("CARL", 30), ("DORA", 10)):
+        store.add("level", name, score)
+    # ties keep the earlier score in front
+    assert store.top("level") == [["DORA", 10], ["BEN", 20], ["ANNA", 30], ["CARL", 30]]
+    assert store.best_scores() == {"level": 10}
+
+
+def test_top_is_bounded(store):
+    store.add_many([("level", "ANNA", score) for score in range(scores.TOP + 5, 0, -1)])
+    assert [score for _, score in store.top("level")] == list(range(1, scores.TOP + 1))
+
+
+def test_import_txt_once(store, tmp_path):
+    legacy = tmp_path / "level.txt"
+    legacy.write_text("ANNA 12\nBEN 9\n")
+    assert store.import_txt(str(legacy)) == 2
+    assert store.import_txt(str(legacy)) == 0
+    assert store.top("level") == [["BEN", 9], ["ANNA", 12]]
+
+
+def test_import_txt_missing_file(store, tmp_path):
+    legacy = tmp_path / "level.txt"
+    assert store.import_txt(str(legacy)) == 0
+    # the file appearing later is still imported
+    legacy.write_text("ANNA 12\n")
+    assert store.import_txt(str(legacy)) == 1
+    assert store.top("level") == [["ANNA", 12]]
+
+
+def test_move_scores(store):
+    store.add("copy", "ANNA", 12)
+    store.add("kept", "BEN", 10)
+    assert store.move_scores("copy", "kept") == 1
+    assert store.top("kept") == [["BEN", 10], ["ANNA", 12]]
+    assert store.top("copy") == []
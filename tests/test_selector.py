@@ -0,0 +1,48 @@
+# imports
+import pytest
+import workers
+from level_selector import Pages, Selector
+
+
+@pytest.fixture
+def selector(monkeypatch):
+    # the levels are handed over by the tests instead of read in the background
+    monkeypatch.setattr(workers, "io", lambda callback, function, *args: None)
+    return Selector("levels")
+
+
+def show(selector, count):
+    selector.pages = Pages(["{}.xsb".format(index) for index in range(count)], {})
+
+
+@pytest.mark.parametrize("count, pages", [(0, 1), (1, 1), (6, 1), (7, 2), (12, 2), (13, 3)])
+def test_page_count(count, pages):
+    assert len(Pages(list(range(count)), {})) == pages
+
+
+def test_full_last_page(selector):
+    show(selector, 6)
+    for _ in range(6):
+        selector.move(1)
+    assert (selector.pagenum, selector.current) == (0, 5)
+    assert selector.select().file == "5.xsb"
+    selector.move(-1)
+    assert selector.select().file == "4.xsb"
+
+
+def test_paging(selector):
+    show(selector, 8)
+    for _ in range(10):
+        selector.move(1)
+    assert (selector.pagenum, selector.current) == (1, 1)
+    assert selector.select().file == "7.xsb"
+    for _ in range(3):
+        selector.move(-1)
+    assert (selector.pagenum, selector.current) == (0, 4)
+
+
+def test_no_levels(selector):
+    selector.move(1)
+    selector.move(-1)
+    assert (selector.pagenum, selector.current) == (0, 0)
+    assert selector.select() is None
@@ -0,0 +1,148 @@
+# imports
+import asyncio
+import os
+import threading
+import time
+import pytest
+import client
+import server
+
+
+class Running:
+    """a stub highscore server on an event loop in a thread of its own"""
+    def __init__(self, folder, port=0):
+        self.server = server.stub(folder)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        listener = self.call(self.server.start("127.0.0.1", port))
+        self.port = listener.sockets[0].getsockname()[1]
+
+    def call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(5)
+
+    def stop(self):
+        """closes the listener and every open connection"""
+        async def finish():
+            self.server.server.close()
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self.call(finish())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.server.close()
+
+
+@pytest.fixture
+def running(levels):
+    running = Running(levels)
+    yield running
+    if running.loop.is_running():
+        running.stop()
+
+
+@pytest.fixture
+def connected(running):
+    connected = client.HighscoreClient("127.0.0.1", running.port, delay=0.05, timeout=2)
+    yield connected
+    connected.close()
+
+
+def entry(levels, name, replay="R"):
+    return {"level": os.path.join(levels, "small.xsb"), "name": name, "score": len(replay), "replay": replay}
+
+
+def wait_for(condition, seconds=5):
+    end = time.monotonic() + seconds
+    while not condition():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.01)
+
+
+def test_submit_and_top(levels, running, connected):
+    connected.submit(entry(levels, "ANNA"))
+    # the level's queued score is sent before its top list is asked for
+    assert connected.top(os.path.join(levels, "small.xsb")) == [["ANNA", 1]]
+    assert running.server.store.top("small") == [["ANNA", 1]]
+
+
+def test_rejected_runs_are_kept(levels, running, connected):
+    connected.submit(entry(levels, "ANNA", "RL"))
+    connected.submit(entry(levels, "anna"))
+    assert connected.top(os.path.join(levels, "small.xsb")) == []
+    assert [reason for _, reason in connected.rejected] == ["pushes don't match the replay", "bad name"]
+
+
+def test_submissions_are_batched(levels, running, connected):
+    batches = []
+    process = running.server.verifier.process
+    running.server.verifier.process = lambda entries: batches.append(len(entries)) or process(entries)
+    for name in ("ANNA", "BEN", "CARL", "DORA"):
+        connected.submit(entry(levels, name))
+    wait_for(lambda: batches)
+    assert batches == [4]
+    assert len(running.server.store.top("small")) == 4
+
+
+def test_top_is_cached(levels, running, connected):
+    level = os.path.join(levels, "small.xsb")
+    assert connected.top(level) == []
+    running.server.store.add("small", "ANNA", 1)
+    assert connected.top(level) == []
+    # a submission of the level drops its cached list
+    connected.submit(entry(levels, "BEN"))
+    assert connected.top(level) == [["ANNA", 1], ["BEN", 1]]
+
+
+def test_reconnect_after_restart(levels, running, connected):
+    level = os.path.join(levels, "small.xsb")
+    connected.submit(entry(levels, "ANNA"))
+    assert connected.top(level) == [["ANNA", 1]]
+    # the pooled connection dies with the server, a new server takes its port
+    running.stop()
+    restarted = Running(levels, running.port)
+    try:
+        connected.cache.clear()
+        connected.submit(entry(levels, "BEN"))
+        assert connected.top(level) == [["BEN", 1]]
+    finally:
+        restarted.stop()
+
+
+def test_scores_wait_for_the_server(levels, running, monkeypatch):
+    monkeypatch.setattr(client, "RETRY", 0.1)
+    port = running.port
+    running.stop()
+    offline = client.HighscoreClient("127.0.0.1", port, delay=0.01, timeout=1)
+    try:
+        offline.submit(entry(levels, "ANNA"))
+        # the first batch failed and waits to be sent again
+        wait_for(lambda: offline.pending)
+        restarted = Running(levels, port)
+        try:
+            wait_for(lambda: restarted.server.store.top("small") == [["ANNA", 1]])
+        finally:
+            restarted.stop()
+    finally:
+        offline.close()
+
+
+def test_best_scores(levels, running, connected):
+    assert connected.best_scores() == {}
+    connected.submit(entry(levels, "ANNA", "udR"))
+    connected.submit(entry(levels, "BEN"))
+    # queued scores are sent first, and the cached answer is dropped
+    assert connected.best_scores() == {"small": 1}
+
+
+def test_best_scores_offline(levels, running):
+    port = running.port
+    running.stop()
+    offline = client.HighscoreClient("127.0.0.1", port, timeout=1)
+    try:
+        assert offline.best_scores() is None
+    finally:
+        offline.close()
@@ -0,0 +1,90 @@
+# imports
+from collections import deque
+import pytest
+from engine import Engine, BLOCKED, DIRECTIONS
+from solver import Solver
+
+
+# GLOBALS
+LEVELS = {
+    "one push": ["#####",
+                 "#@$.#",
+                 "#####"],
+    "walk around": ["########",
+                    "#      #",
+                    "# @.$  #",
+                    "#      #",
+                    "########"],
+    "two crates": ["########",
+                   "#  .   #",
+                   "# $$ @ #",
+                   "#  .   #",
+                   "########"],
+    "goal in a corner": ["######",
+                         "#.   #",
+                         "# $$ #",
+                         "#.  @#",
+                         "######"],
+    "room": ["  #####",
+             "###   #",
+             "#.@$  #",
+             "### $.#",
+             "#.##$ #",
+             "# # . ##",
+             "#$ *$$.#",
+             "#   .  #",
+             "########"],
+}
+
+
+def shortest(rows):
+    """fewest moves that solve a level, by breadth first search over every
+    move of the player"""
+    engine = Engine([list(row) for row in rows])
+    start = (engine.player, frozenset(engine.crates))
+    seen = {start}
+    queue = deque([(start, 0)])
+    while queue:
+        (player, crates), moves = queue.popleft()
+        if engine.goals <= crates:
+            return moves
+        for direction in DIRECTIONS.values():
+            engine.player, engine.crates = player, set(crates)
+            if engine.step(direction) == BLOCKED:
+                continue
+            state = (engine.player, frozenset(engine.crates))
+            if state not in seen:
+                seen.add(state)
+                queue.append((state, moves + 1))
+    return None
+
+
+@pytest.mark.parametrize("name", [name for name in LEVELS if name != "room"])
+def test_optimal(name):
+    rows = LEVELS[name]
+    result = Solver([list(row) for row in rows]).solve()
+    assert result.status == "solved"
+    assert result.optimal
+    assert result.moves == shortest(rows)
+
+    engine = Engine([list(row) for row in rows])
+    assert engine.play(result.solution)
+    assert engine.finished
+    # the solution marks its pushes like the engine's journal
+    assert engine.lurd == result.solution
+
+
+def test_unsolvable():
+    result = Solver([list("#@$#.#")]).solve()
+    assert result.status == "unsolvable"
+
+
+def test_memory_cap():
+    result = Solver([list(row) for row in LEVELS["room"]], max_memory=0.01).solve()
+    assert result.status == "memory"
+
+
+def test_weight_is_not_optimal():
+    result = Solver([list(row) for row in LEVELS["two crates"]], weight=3).solve()
+    assert result.status == "solved"
+    assert not result.optimal
@@ -0,0 +1,119 @@
+# imports
+import random
+import numpy as np
+import pytest
+import vecenv
+from conftest import write_level
+from engine import Engine, read_xsb, BLOCKED, PUSH, DIRECTIONS
+from vecenv import VecEnv
+
+
+# GLOBALS
+# crates next to walls and to each other, so blocked pushes of both kinds come up
+LEVELS = {
+    "row.xsb": ["#######",
+                "#@$$. #",
+                "#  .  #",
+                "#######"],
+    "room.xsb": ["  #####",
+                 "###   #",
+                 "#.@$  #",
+                 "### $.#",
+                 "#.##$ #",
+                 "# # . ##",
+                 "#$ *$$.#",
+                 "#   .  #",
+                 "########"],
+    "small.xsb": ["#####",
+                  "#@$.#",
+                  "#####"],
+}
+# vecenv actions in LURD order, as engine directions
+ACTIONS = [DIRECTIONS[letter] for letter in "lurd"]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return [write_level(tmp_path, name, rows) for name, rows in LEVELS.items()]
+
+
+def state(env, engines, index):
+    """the state of a game of the environment in the engine's terms"""
+    engine = engines[index]
+    to_canvas = {cell: env.convert(engine, cell) for cell in range(len(engine.grid))}
+    crates = {to_canvas[cell] for cell in engine.crates}
+    return to_canvas[engine.player], crates
+
+
+def test_steps_match_engine(paths):
+    rng = random.Random(1)
+    env = VecEnv(paths, n=6)
+    engines = [Engine(read_xsb(paths[i % len(paths)])) for i in range(6)]
+    blocked = pushes = 0
+    for _ in range(600):
+        actions = [rng.randrange(4) for _ in range(6)]
+        before = [engine.on_goal for engine in engines]
+        _, rewards, done = env.step(actions)
+        for i, engine in enumerate(engines):
+            result = engine.move(ACTIONS[actions[i]])
+            blocked += result == BLOCKED
+            pushes += result == PUSH
+            expected = vecenv.STEP_REWARD + vecenv.ON_GOAL_REWARD * (engine.on_goal - before[i])
+            if engine.finished:
+                expected += vecenv.SOLVED_REWARD
+            player, crates = state(env, engines, i)
+            assert env.player[i] == player
+            assert set(np.flatnonzero(env.crates[i])) == crates
+            assert env.on_goal[i] == engine.on_goal
+            assert rewards[i] == pytest.approx(expected)
+            assert done[i] == engine.finished
+        # solved games start over on both sides
+        finished = [i for i, engine in enumerate(engines) if engine.finished]
+        if finished:
+            env.reset(finished)
+            for i in finished:
+                engines[i].restart()
+    assert blocked and pushes
+
+
+def test_done_games_wait_for_reset(paths):
+    env = VecEnv(paths[2:], n=2)
+    _, rewards, done = env.step([vecenv.RIGHT, vecenv.LEFT])
+    assert list(done) == [True, False]
+    assert rewards[0] == pytest.approx(vecenv.STEP_REWARD + vecenv.ON_GOAL_REWARD + vecenv.SOLVED_REWARD)
+    assert rewards[1] == pytest.approx(vecenv.STEP_REWARD)
+    player = env.player[0]
+    # a done game ignores its action and earns nothing
+    _, rewards, done = env.step([vecenv.LEFT, vecenv.RIGHT])
+    assert env.player[0] == player
+    assert rewards[0] == 0
+    assert list(done) == [True, True]
+
+
+def test_reset_some(paths):
+    env = VecEnv(paths, n=3)
+    start = (env.player.copy(), env.crates.copy())
+    env.step([vecenv.RIGHT] * 3)
+    moved = env.player.copy()
+    observations = env.reset([0, 2])
+    assert env.player[0] == start[0][0] and env.player[2] == start[0][2]
+    assert env.player[1] == moved[1]
+    assert (env.crates[0] == start[1][0]).all()
+    assert not env.done[0] and not env.done[2]
+    assert list(env.steps) == [0, 1, 0]
+    assert observations[0, 3].sum() == 1
+    assert observations.shape == (3, 4, env.h, env.w)
+
+
+def test_max_steps(paths):
+    env = VecEnv(paths[:2], max_steps=3)
+    for step in range(3):
+        _, _, done = env.step([vecenv.UP, vecenv.DOWN])
+        assert list(done) == [step == 2] * 2
+    player = env.player.copy()
+    _, rewards, _ = env.step([vecenv.DOWN, vecenv.UP])
+    assert (env.player == player).all()
+    assert (rewards == 0).all()
+    env.reset()
+    assert not env.done.any()
+    assert (env.steps == 0).all()
@@ -0,0 +1,94 @@
+# imports
+import json
+import os
+import pytest
+import scores
+import verifier
+from conftest import write_level
+from verifier import Verifier, check
+
+
+@pytest.fixture
+def level(levels):
+    return os.path.join(levels, "small.xsb")
+
+
+@pytest.fixture
+def checker(levels):
+    checker = Verifier(levels, workers=0, store=scores.MemoryStore())
+    yield checker
+    checker.close()
+
+
+def entry(level, name="ANNA", replay="R", score=None):
+    return {"level": level, "name": name, "score": len(replay) if score is None else score, "replay": replay}
+
+
+def test_valid(level):
+    assert check(entry(level)) is None
+    # walking about first is still a valid run
+    assert check(entry(level, replay="udR")) is None
+
+
+@pytest.mark.parametrize("changes, reason", [
+    ({"name": "anna"}, "bad name"),
+    ({"name": ""}, "bad name"),
+    ({"name": "ABCDEFGHIJK"}, "bad name"),
+    ({"name": 5}, "bad name"),
+    ({"replay": "Rx", "score": 2}, "not a LURD replay"),
+    ({"replay": None}, "not a LURD replay"),
+    ({"score": 2}, "score doesn't match the replay"),
+    ({"score": "1"}, "score doesn't match the replay"),
+    ({"score": True}, "score doesn't match the replay"),
+    ({"replay": "lR", "score": 2}, "blocked move"),
+    ({"replay": "r"}, "pushes don't match the replay"),
+    ({"replay": "RL", "score": 2}, "pushes don't match the replay"),
+    ({"replay": "", "score": 0}, "level not solved"),
+])
+def test_rejected(level, changes, reason):
+    assert check(dict(entry(level), **changes)) == reason
+
+
+def test_unknown_level(levels, checker):
+    assert check(entry(os.path.join(levels, "missing.xsb"))) == "unknown level"
+    # levels outside the folder are never read
+    outside = os.path.join(os.path.dirname(levels), "other.xsb")
+    assert checker.verify([entry(outside), "text"]) == ["unknown level", "not an entry"]
+
+
+def test_process(level, checker):
+    reasons = checker.process([entry(level, "ANNA", "udR"), entry(level, "BEN"), entry(level, "CARL", "r")])
+    assert reasons == [None, None, "pushes don't match the replay"]
+    assert checker.store.top("small") == [["BEN", 1], ["ANNA", 3]]
+
+
+def test_process_queue(levels, level, checker, tmp_path):
+    queue = tmp_path / "queue"
+    queue.mkdir()
+    with open(str(queue / "1.jsonl"), "wt") as f:
+        f.write(json.dumps(entry(level)) + "\n" + json.dumps(entry(level, "BEN", "r")) + "\n")
+    assert checker.process_queue(str(queue)) == (1, 1)
+    assert checker.store.top("small") == [["ANNA", 1]]
+    with open(str(queue / verifier.REJECTED), "rt") as f:
+        rejected = [json.loads(line) for line in f]
+    assert [(item["name"], item["reason"]) for item in rejected] == [("BEN", "pushes don't match the replay")]
+    assert sorted(os.listdir(str(queue))) == [verifier.REJECTED]
+
+
+def test_edited_level_is_parsed_again(levels, level):
+    assert check(entry(level)) is None
+    # the goal moves one cell to the right, and the file's size changes
+    write_level(levels, "small.xsb", ["######", "#    #", "#@$ .#", "######"])
+    assert check(entry(level)) == "level not solved"
+    assert check(entry(level, replay="RR")) is None
+
+
+def test_reclaim(levels, level, checker, tmp_path):
+    queue = tmp_path / "queue"
+    queue.mkdir()
+    # claimed by a verifier that stopped before finishing it
+    with open(str(queue / "1.jsonl.work"), "wt") as f:
+        f.write(json.dumps(entry(level)) + "\n")
+    assert checker.reclaim(str(queue)) == 1
+    assert checker.process_queue(str(queue)) == (1, 0)
+    assert os.listdir(str(queue)) == []
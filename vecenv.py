@@ -0,0 +1,125 @@
+# imports
+import numpy as np
+from engine import Engine, read_xsb, WALL, GOAL
+
+
+# GLOBALS
+# actions in LURD order
+LEFT, UP, RIGHT, DOWN = 0, 1, 2, 3
+# rewards
+STEP_REWARD = -0.1
+ON_GOAL_REWARD = 1.0
+SOLVED_REWARD = 10.0
+
+
+class VecEnv:
+    """N sokoban games stepped in lockstep with numpy, without pygame
+
+    every level is parsed with the engine and copied onto a common canvas
+    with a wall border, so a position is one flat index and the four move
+    offsets are the same for all games:
+    - static: (N, cells) uint8 grid of FLOOR, WALL and GOAL codes
+    - crates: (N, cells) bool crate occupancy
+    - player: (N,) flat player positions"""
+    def __init__(self, levels, n=None, max_steps=None):
+        # level files are cycled through when there are more games than levels
+        engines = [Engine(read_xsb(path)) for path in levels]
+        n = n or len(engines)
+        self.n = n
+        self.max_steps = max_steps
+
+        # common canvas size, including the wall border
+        self.h = max(engine.h for engine in engines) + 2
+        self.w = max(engine.w for engine in engines) + 2
+        cells = self.h * self.w
+        self.offsets = np.array([-1, -self.w, 1, self.w], dtype=np.int64)
+
+        self.static = np.full((n, cells), WALL, dtype=np.uint8)
+        self.start_crates = np.zeros((n, cells), dtype=bool)
+        self.start_player = np.zeros(n, dtype=np.int64)
+        for i in range(n):
+            engine = engines[i % len(engines)]
+            # copy the padded rows of the engine's flat grid onto the canvas
+            grid = np.frombuffer(bytes(engine.grid), dtype=np.uint8).reshape(engine.h + 2, engine.w + 2)
+            canvas = self.static[i].reshape(self.h, self.w)
+            canvas[:engine.h + 2, :engine.w + 2] = grid
+            for crate in engine.start_crates:
+                self.start_crates[i, self.convert(engine, crate)] = True
+            self.start_player[i] = self.convert(engine, engine.start_player)
+
+        self.goals = (self.static == GOAL).sum(axis=1)
+        self.rows = np.arange(n)
+
+        self.crates = self.start_crates.copy()
+        self.player = self.start_player.copy()
+        self.on_goal = np.zeros(n, dtype=np.int64)
+        self.steps = np.zeros(n, dtype=np.int64)
+        self.done = np.zeros(n, dtype=bool)
+        self.reset()
+
+    def convert(self, engine, index):
+        """converts an engine grid index to a canvas index"""
+        return (index // engine.width) * self.w + index % engine.width
+
+    def reset(self, indices=None):
+        """puts the given games (all by default) back to their start,
+        returns the observations of all games"""
+        if indices is None:
+            indices = self.rows
+        indices = np.asarray(indices)
+        self.crates[indices] = self.start_crates[indices]
+        self.player[indices] = self.start_player[indices]
+        self.on_goal[indices] = (self.crates[indices] & (self.static[indices] == GOAL)).sum(axis=1)
+        self.steps[indices] = 0
+        self.done[indices] = False
+        return self.observe()
+
+    def step(self, actions):
+        """makes one move in every game, returns (observations, rewards, done)
+        games that are done ignore their action until they are reset"""
+        rows = self.rows
+        step = self.offsets[np.asarray(actions)]
+        static = self.static
+        crates = self.crates
+        active = ~self.done
+
+        target = self.player + step
+        # the border is wall, so behind only leaves the canvas when target is a wall
+        behind = np.clip(target + step, 0, static.shape[1] - 1)
+
+        target_wall = static[rows, target] == WALL
+        target_crate = crates[rows, target]
+        behind_free = (static[rows, behind] != WALL) & ~crates[rows, behind]
+
+        walk = active & ~target_wall & ~target_crate
+        push = active & target_crate & behind_free
+
+        # move the pushed crates and update the goal occupancy
+        pushed = rows[push]
+        crates[pushed, target[push]] = False
+        crates[pushed, behind[push]] = True
+        onto = push & (static[rows, behind] == GOAL)
+        off = push & (static[rows, target] == GOAL)
+        self.on_goal += onto.astype(np.int64) - off
+
+        moved = walk | push
+        self.player = np.where(moved, target, self.player)
+        self.steps += active
+
+        solved = active & (self.on_goal == self.goals)
+        rewards = np.where(active, STEP_REWARD, 0.0) + ON_GOAL_REWARD * (onto.astype(np.float64) - off)
+        rewards += SOLVED_REWARD * solved
+
+        self.done |= solved
+        if self.max_steps is not None:
+            self.done |= self.steps >= self.max_steps
+        return self.observe(), rewards, self.done.copy()
+
+    def observe(self):
+        """(N, 4, h, w) uint8 planes of walls, goals, crates and the player"""
+        planes = np.zeros((self.n, 4, self.h * self.w), dtype=np.uint8)
+        planes[:, 0] = self.static == WALL
+        planes[:, 1] = self.static == GOAL
+        planes[:, 2] = self.crates
+        planes[self.rows, 3, self.player] = 1
+        return planes.reshape(self.n, 4, self.h, self.w)
@@ -0,0 +1,255 @@
+# imports
+import argparse
+import json
+import os
+import socketserver
+import string
+import time
+from concurrent.futures import ProcessPoolExecutor
+import scores
+from collection import split_ref
+from engine import Engine, read_xsb, list_levels
+
+
+# GLOBALS
+LEVEL_FOLDER = "./assets/levels/"
+# submissions are dropped here as JSON lines files, one entry per line
+QUEUE = "./assets/highscores/queue/"
+# rejected entries are kept here with the reason, for the leaderboard admins
+REJECTED = "rejected.jsonl"
+HOST = "127.0.0.1"
+PORT = 8765
+# entries verified per worker task
+CHUNK = 256
+LURD = set("lurdLURD")
+# names are what the register screen accepts
+NAME_CHARS = set(string.ascii_uppercase)
+NAME_LENGTH = 10
+
+# parsed levels of a worker process, reset between replays, as level ->
+# (modification time and size of its file, engine)
+engines = {}
+
+
+def check(entry):
+    """replays one submission through the engine, returns None when it is
+    valid and the reason it was rejected otherwise
+
+    an entry is a dict with the level file, the player's name, the claimed
+    score and the LURD replay of the run"""
+    level, name, score, replay = (entry.get(key) for key in ("level", "name", "score", "replay"))
+    if not isinstance(name, str) or not 0 < len(name) <= NAME_LENGTH or not set(name) <= NAME_CHARS:
+        return "bad name"
+    if not isinstance(replay, str) or not set(replay) <= LURD:
+        return "not a LURD replay"
+    # bool is an int too
+    if type(score) is not int or score != len(replay):
+        return "score doesn't match the replay"
+
+    # a level edited while the verifier runs is parsed again
+    try:
+        stat = os.stat(split_ref(level)[0])
+    except OSError:
+        return "unknown level"
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = engines.get(level)
+    if cached is not None and cached[0] == stamp:
+        engine = cached[1]
+    else:
+        try:
+            engine = Engine(read_xsb(level))
+        except (OSError, ValueError):
+            return "unknown level"
+        engines[level] = (stamp, engine)
+    engine.restart()
+    if not engine.play(replay):
+        return "blocked move"
+    # the journal has uppercase letters for pushes, so a replay that says
+    # walk where the run pushed, or the other way round, doesn't match
+    if engine.journal != replay.encode():
+        return "pushes don't match the replay"
+    if not engine.finished:
+        return "level not solved"
+    return None
+
+
+def check_chunk(entries):
+    """checks a list of entries in a worker process"""
+    return [check(entry) for entry in entries]
+
+
+class Verifier:
+    """checks submitted runs in a process pool and commits only the ones
+    whose replay solves the level in the claimed number of moves, with 0
+    workers the runs are checked in the calling thread"""
+    def __init__(self, folder=LEVEL_FOLDER, workers=None, store=None):
+        # only the levels we ship can be submitted, so nobody can make us read other files
+        self.levels = {os.path.normpath(path) for path in list_levels(folder)}
+        self.pool = ProcessPoolExecutor(max_workers=workers) if workers != 0 else None
+        self.store = store or scores.get_store()
+
+    def verify(self, entries):
+        """checks a batch of entries, returns the reason for each, None for valid"""
+        reasons = [None] * len(entries)
+        todo = []
+        for index, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                reasons[index] = "not an entry"
+            elif not isinstance(entry.get("level"), str) or os.path.normpath(entry["level"]) not in self.levels:
+                reasons[index] = "unknown level"
+            else:
+                todo.append(index)
+
+        # sorted by level, a chunk mostly replays levels its worker parsed already
+        todo.sort(key=lambda index: entries[index]["level"])
+        chunks = [todo[i:i + CHUNK] for i in range(0, len(todo), CHUNK)]
+        work = [[entries[index] for index in chunk] for chunk in chunks]
+        results = map(check_chunk, work) if self.pool is None else self.pool.map(check_chunk, work)
+        for chunk, result in zip(chunks, results):
+            for index, reason in zip(chunk, result):
+                reasons[index] = reason
+        return reasons
+
+    def process(self, entries):
+        """verifies a batch and commits the valid scores in one transaction,
+        returns the reasons like verify()"""
+        reasons = self.verify(entries)
+        valid = [(scores.level_key(entry["level"]), entry["name"], entry["score"])
+                 for entry, reason in zip(entries, reasons) if reason is None]
+        if valid:
+            self.store.add_many(valid)
+        return reasons
+
+    def process_queue(self, folder=QUEUE):
+        """verifies every queued file, returns (accepted, rejected) counts"""
+        accepted = rejected = 0
+        for entry in sorted(os.scandir(folder), key=lambda entry: entry.name):
+            if not entry.name.endswith(".jsonl") or entry.name == REJECTED:
+                continue
+            # claim the file, so two verifiers never commit it twice
+            claimed = entry.path + ".work"
+            try:
+                os.rename(entry.path, claimed)
+            except OSError:
+                continue
+            with open(claimed, "rt") as f:
+                entries = [parse(line) for line in f if line.strip()]
+            reasons = self.process(entries)
+
+            failed = [dict(entry if isinstance(entry, dict) else {}, reason=reason)
+                      for entry, reason in zip(entries, reasons) if reason is not None]
+            if failed:
+                with open(os.path.join(folder, REJECTED), "at") as f:
+                    f.writelines(json.dumps(entry) + "\n" for entry in failed)
+            os.remove(claimed)
+            accepted += len(entries) - len(failed)
+            rejected += len(failed)
+        return accepted, rejected
+
+    def reclaim(self, folder=QUEUE):
+        """puts files claimed by a verifier that stopped before finishing
+        them back in the queue, returns their number. Run it on startup,
+        while no other verifier works on the folder"""
+        count = 0
+        for entry in os.scandir(folder):
+            if entry.name.endswith(".jsonl.work"):
+                try:
+                    os.rename(entry.path, entry.path[:-len(".work")])
+                except OSError:
+                    continue
+                count += 1
+        return count
+
+    def watch(self, folder=QUEUE, interval=1.0):
+        """processes the queue folder until interrupted"""
+        os.makedirs(folder, exist_ok=True)
+        self.reclaim(folder)
+        while True:
+            accepted, rejected = self.process_queue(folder)
+            if accepted or rejected:
+                print("{} accepted, {} rejected".format(accepted, rejected))
+            time.sleep(interval)
+
+    def serve(self, host=HOST, port=PORT):
+        """accepts JSON lines submissions on a local socket until interrupted"""
+        server = Server((host, port), Handler)
+        server.verifier = self
+        print("verifying submissions on {}:{}".format(host, port))
+        with server:
+            server.serve_forever()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+class Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class Handler(socketserver.StreamRequestHandler):
+    """reads one submission, or a JSON list of them for a bulk batch, per
+    line, and answers each line with {"ok": true} or {"ok": false,
+    "reason": ...} per entry, a list of them for a batch"""
+    def handle(self):
+        verifier = self.server.verifier
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            entries = parse(line)
+            batch = isinstance(entries, list)
+            if not batch:
+                entries = [entries]
+            answers = [{"ok": True} if reason is None else {"ok": False, "reason": reason}
+                       for reason in verifier.process(entries)]
+            self.wfile.write((json.dumps(answers if batch else answers[0]) + "\n").encode())
+
+
+def parse(line):
+    """an entry from a JSON line, None if it isn't JSON"""
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def submit(entries, folder=QUEUE):
+    """writes entries to the queue folder in one file, it only appears once
+    complete so a verifier never reads half of it"""
+    os.makedirs(folder, exist_ok=True)
+    name = "{}-{}-{}.jsonl".format(int(time.time() * 1000), os.getpid(), id(entries))
+    temporary = os.path.join(folder, name + ".tmp")
+    with open(temporary, "wt") as f:
+        f.writelines(json.dumps(entry) + "\n" for entry in entries)
+    os.replace(temporary, os.path.join(folder, name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="verify submitted highscores by replaying them")
+    parser.add_argument("--levels", default=LEVEL_FOLDER, help="folder of the levels scores can be submitted for")
+    parser.add_argument("--queue", default=QUEUE, help="folder of queued submission files")
+    parser.add_argument("--serve", action="store_true", help="take submissions on a local socket instead")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--once", action="store_true", help="process the queue once and exit")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    args = parser.parse_args()
+
+    verifier = Verifier(args.levels, args.workers)
+    try:
+        if args.serve:
+            verifier.serve(args.host, args.port)
+        elif args.once:
+            verifier.reclaim(args.queue)
+            print("{} accepted, {} rejected".format(*verifier.process_queue(args.queue)))
+        else:
+            verifier.watch(args.queue)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        verifier.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# imports
+import multiprocessing
+import traceback
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import pygame
+
+
+# GLOBALS
+# event posted to the main loop when a background task is finished
+TASK_DONE = pygame.event.custom_type()
+
+# pools are started on first use
+threads = None
+processes = None
+
+
+def io(callback, function, *args):
+    """runs an I/O bound function on the background thread, tasks run one
+    after the other in the order they were handed over"""
+    global threads
+    if threads is None:
+        threads = ThreadPoolExecutor(max_workers=1)
+    submit(threads, callback, function, args)
+
+
+def cpu(callback, function, *args):
+    """runs a CPU bound function in a worker process, the function and its
+    arguments must be picklable"""
+    global processes
+    if processes is None:
+        # forking a process with a display open is unsafe, start fresh ones
+        processes = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+    submit(processes, callback, function, args)
+
+
+def submit(pool, callback, function, args):
+    """starts a task, its result is delivered to the callback by the main loop"""
+    future = pool.submit(function, *args)
+    future.add_done_callback(lambda done: pygame.event.post(
+        pygame.event.Event(TASK_DONE, future=done, callback=callback)))
+
+
+class Failed:
+    """result handed to the callback of a task that raised, a broken pool included"""
+    def __init__(self, error):
+        self.error = error
+
+
+def handle(event):
+    """calls the callback of a finished task with its result on the main loop,
+    a task that failed is reported and its callback gets a Failed result"""
+    try:
+        result = event.future.result()
+    except Exception as error:
+        # a failed task must not take the main loop down with it
+        traceback.print_exception(type(error), error, error.__traceback__)
+        result = Failed(error)
+    if event.callback is not None:
+        event.callback(result)
+
+
+def shutdown():
+    """waits for the running tasks, so no highscore is lost on exit"""
+    global threads, processes
+    if threads is not None:
+        threads.shutdown()
+        threads = None
+    if processes is not None:
+        processes.shutdown(cancel_futures=True)
+        processes = None